@@ -584,6 +584,95 @@ print('\nResult:', wg.outputs.result.value)
 assert wg.outputs.result.value == 12
 
 
+# %%
+# Large maps
+# ----------
+#
+# By default, the tasks of all the items are created as soon as the ``Map`` zone runs.
+# For a source with many items, set ``chunk_size`` to create and run the tasks of at most
+# ``chunk_size`` items at the same time. The tasks of the next items are created once the earlier
+# items are finished, thus the number of tasks waiting to run does not grow with the source:
+
+with WorkGraph('AddChunks') as wg:
+    with Map(data, chunk_size=2) as map_zone:
+        added_numbers = add(
+            x=get_value(map_zone.item.value, 'x').result,
+            y=get_value(map_zone.item.value, 'y').result,
+        ).result
+        map_zone.gather({'result': added_numbers})
+    wg.outputs.result = aggregate_sum(map_zone.outputs.result).result
+
+wg.run()
+assert wg.outputs.result.value == 12
+
+# %%
+# When the body of the zone is cheap and works elementwise, creating one task (and one process)
+# per item dominates the cost. Set ``batch_size`` to run the tasks of the zone once per batch of
+# items: ``item.key`` is the list of the keys of the batch, ``item.value`` a data node holding the list
+# of their values, and the gathered results must be sequences of the same length. They are scattered
+# back to the keys of the items, each element as a data node, thus the outputs of the zone are the
+# same as without batches:
+
+
+@task
+def add_all(values: list) -> list:
+    return [value['x'] + value['y'] for value in values]
+
+
+with WorkGraph('AddBatches') as wg:
+    with Map(data, batch_size=2) as map_zone:
+        added_numbers = add_all(map_zone.item.value).result
+        map_zone.gather({'result': added_numbers})
+    wg.outputs.result = aggregate_sum(map_zone.outputs.result).result
+
+wg.run()
+assert wg.outputs.result.value == 12
+
+# %%
+# The results of the items are gathered as soon as the items are finished. A task linked to the
+# ``stream`` outputs of the zone can start on partial results: with ``stream_size``, the ``stream``
+# outputs hold the results of the first ``stream_size`` items of the source, and the task starts once
+# these items are finished, while the other items are still running. Without ``stream_size``, the
+# ``stream`` outputs hold the results of all the items, as the regular outputs:
+
+with WorkGraph('AddStream') as wg:
+    with Map(data, stream_size=2) as map_zone:
+        added_numbers = add(
+            x=get_value(map_zone.item.value, 'x').result,
+            y=get_value(map_zone.item.value, 'y').result,
+        ).result
+        map_zone.gather({'result': added_numbers})
+    wg.outputs.preview = aggregate_sum(map_zone.outputs.stream.result).result
+    wg.outputs.result = aggregate_sum(map_zone.outputs.result).result
+
+wg.run()
+print('\nPreview:', wg.outputs.preview.value, 'Result:', wg.outputs.result.value)
+assert wg.outputs.preview.value == 2
+assert wg.outputs.result.value == 12
+
+# %%
+# To combine the results of many items, ``Reduce`` applies a function of two values in a tree of
+# partial reductions: each group of ``fan_in`` results is reduced by one task as soon as its items are
+# finished, then the partial results are reduced in the same way, until one value is left. The
+# function must be associative and importable from a module, it receives the raw Python values:
+
+import operator
+
+from aiida_workgraph import Reduce
+
+with WorkGraph('AddReduce') as wg:
+    with Map(data, chunk_size=2) as map_zone:
+        added_numbers = add(
+            x=get_value(map_zone.item.value, 'x').result,
+            y=get_value(map_zone.item.value, 'y').result,
+        ).result
+        map_zone.gather({'result': added_numbers})
+    wg.outputs.result = Reduce(map_zone.outputs.result, operator.add, fan_in=2).result
+
+wg.run()
+assert wg.outputs.result.value == 12
+
+
 # %%
 # .. _advanced:context-manager:continue-workflow:
 #
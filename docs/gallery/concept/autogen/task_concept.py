@@ -125,6 +125,53 @@ wg = WorkGraph()
 add1 = wg.add_task(ArithmeticAddCalculation, name='add1')
 
 
+######################################################################
+# Ephemeral tasks
+# ---------------
+#
+# Each Python function task is run as an AiiDA process, and its results are stored as data
+# nodes. For small helper functions, which only prepare the inputs of the next task, set
+# ``ephemeral=True``: the function is called directly by the engine, and its results are kept
+# in memory as raw Python data. They are stored as data nodes only when they are passed to
+# the outputs of the WorkGraph, or to the inputs of an AiiDA process such as a ``calcfunction``
+# or a ``CalcJob``. Hence, there is no provenance of the function itself.
+#
+
+
+@task(ephemeral=True)
+def scale(x, factor):
+    return x * factor
+
+
+wg = WorkGraph()
+scale1 = wg.add_task(scale, name='scale1', x=1, factor=2)
+multiply1 = wg.add_task(multiply, name='multiply1', x=scale1.outputs.result, y=3)
+
+######################################################################
+# Reuse the results of a task
+# ---------------------------
+#
+# AiiDA caching does not apply to the Python function tasks. Set ``cache=True`` to reuse the
+# results of a previous run of the function with the same inputs, also by another WorkGraph:
+# the task then points to the existing process, instead of launching a new one. The function
+# must not have side effects. Editing the function invalidates its cached results, and
+# ``workgraph task clear-cache`` discards all of them. The scope of the reuse and the size of
+# the in-memory cache are set by the ``result_cache`` key of the ``workgraph.json`` config file,
+# see :mod:`aiida_workgraph.engine.result_cache`. The results of the tasks running inline, e.g.
+# the ephemeral ones, are only kept in memory: they are not reused by another daemon worker, or
+# after a restart.
+#
+
+
+@task(cache=True)
+def power(x, n):
+    return x**n
+
+
+wg = WorkGraph()
+power1 = wg.add_task(power, name='power1', x=2, n=10)
+
+
 ######################################################################
 # Define a Task
 # -------------
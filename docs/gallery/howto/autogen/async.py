@@ -18,6 +18,7 @@ set_aiida_loglevel('REPORT')
 # sphinx_gallery_end_ignore
 
 import asyncio
+import time
 
 from aiida import load_profile
 from aiida_workgraph import task
@@ -57,11 +58,50 @@ SumGraph.run(1, 2)
 # Since the ``multiply`` task depends on both, it waits for both to finish before executing (note the timestamps).
 
 
+# %%
+# Run blocking functions in an executor
+# -------------------------------------
+#
+# A regular (synchronous) function is called directly by the engine, thus it blocks all the other
+# branches of the graph until it returns. Set the ``executor_mode`` of the task to run the function
+# in a pool of threads (``'thread'``) or processes (``'process'``) instead, so that it runs
+# concurrently with the other tasks, like the ``async`` functions above:
+
+
+@task(executor_mode='thread')
+def add_blocking(x, y, seconds=5):
+    print(f'Sleeping for {seconds} seconds...')
+    time.sleep(seconds)
+    return x + y
+
+
+@task.graph
+def BlockingSumGraph(x, y):
+    sum1 = add_blocking(x, y, seconds=5).result
+    sum2 = add_blocking(x, y, seconds=5).result
+    return multiply(sum1, sum2).result
+
+
+BlockingSumGraph.run(1, 2)
+
+# %%
+# The process pool is meant for CPU-bound functions: the function, its inputs and its results must be
+# picklable. Only the function itself runs in the executor; its inputs are deserialized and its outputs
+# are stored by the engine, so the provenance is the same as for any other task. The number of workers
+# of the pools is set by the ``executor_max_workers`` key of the ``workgraph.json`` configuration file.
+#
+# The ``executor_mode`` can also be set on a task instance, e.g. ``wg.tasks.add.executor_mode = 'thread'``.
+#
+# A normal task, whose function is not wrapped in a process, only supports the thread pool. When it runs in
+# the thread pool, its function receives the inputs as raw Python data (e.g. ``1`` instead of ``Int(1)``),
+# because the AiiDA nodes can only be loaded by the engine.
+
 # %%
 # Summary
 # -------
 #
-# In this section, we've explored the ``task`` decorator for integrating asynchronous functions within tasks.
+# In this section, we've explored the ``task`` decorator for integrating asynchronous functions within tasks,
+# and the ``executor_mode`` to run blocking functions without blocking the engine.
 
 # sphinx_gallery_start_ignore
 set_aiida_loglevel('ERROR')
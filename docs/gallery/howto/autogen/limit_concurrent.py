@@ -80,6 +80,83 @@ wg.run()
 #     * **AiiDA-Scheduler** (experimental): For powerful, system-wide control over your AiiDA daemon, the `AiiDA-Scheduler <https://github.com/aiidateam/aiida-scheduler>`_ plugin is the recommended tool.
 #
 
+# %%
+# Resource pools
+# --------------
+#
+# ``max_number_jobs`` applies to all the child processes. To set separate limits, e.g. for the jobs running on
+# different computers, declare named resource pools with ``WorkGraph.add_resource_pool``. A task belongs to a pool
+# if it matches all the criteria of the pool: its task type, the computer it runs on, or one of its tags.
+
+wg = many_adds.build(n=5, code=code)
+# at most 2 CalcJobs on localhost
+wg.add_resource_pool('localhost', limit=2, task_types=['CALCJOB'], computers=['localhost'])
+# at most 1 task tagged `heavy`
+wg.add_resource_pool('heavy', limit=1, tags=['heavy'])
+wg.tasks['ArithmeticAddCalculation'].tags = ['heavy']
+wg.run()
+
+# %%
+# The tasks that cannot be launched because a pool is full are reported once, e.g.
+#
+# ``The resource pool localhost is full: 2. Cannot launch the job: ArithmeticAddCalculation2.``
+#
+# and wait in the queue of the pool until another task of the pool finishes.
+#
+# Priority of the waiting tasks
+# -----------------------------
+#
+# By default, the ready tasks are launched in the order in which they were added to the graph. When the jobs are
+# throttled, this can delay a long chain of dependent tasks behind many independent ones. Set
+# ``wg.priority_policy = 'critical_path'`` to launch first the tasks with the longest remaining path to the end of
+# the graph. The length of a path counts one per task, unless ``wg.task_weights`` gives the expected duration of the
+# tasks, e.g. the durations measured in a previous run with ``aiida_workgraph.utils.get_task_durations(pk)``.
+#
+# Frequency of the checkpoints
+# ----------------------------
+#
+# The engine saves a checkpoint at every step, to continue from it after a crash or a restart of the daemon. With
+# many short tasks, these writes can dominate the run time. ``wg.set_checkpoint_policy`` saves them less often:
+# ``'steps'`` every ``steps`` steps, ``'interval'`` every ``interval`` seconds at most, or ``'awaitables'`` only
+# after child processes are submitted. A checkpoint is always saved after child processes are submitted, so they
+# are never submitted twice; the tasks running inside the engine since the last checkpoint run again after a crash.
+# With ``asynchronous=True``, the checkpoints are serialized in a background thread.
+
+wg = many_adds.build(n=5, code=code)
+wg.set_checkpoint_policy('interval', interval=10, asynchronous=True)
+wg.run()
+
+# %%
+# Queueing delay of the tasks
+# ---------------------------
+#
+# The engine records when every task is ready, submitted, running, finished and when its results are applied.
+# ``task.timestamps`` holds these times, and ``task.delays`` derives the time a task waited in the queue of a
+# full pool (``queue_wait``), its ``run_time``, and the time taken by the engine to apply its results
+# (``latency``). The same table is printed by ``workgraph task timing <workgraph_pk>``.
+
+for child in wg.tasks:
+    if child.timestamps:
+        print(child.name, child.delays)
+
+# %%
+# To see where the time goes in a large workgraph, export its timeline, including the nested workgraphs, and open
+# the file with `Perfetto <https://ui.perfetto.dev>`_ or ``chrome://tracing``. Each workgraph is shown as a process
+# and each task as a thread. The same file is written by ``workgraph trace <workgraph_pk>``.
+
+wg.export_trace('many_adds.trace.json')
+
+# %%
+# Overhead of the engine
+# ----------------------
+#
+# The time spent by the engine itself, e.g. to find the ready tasks, gather their inputs, submit them and apply
+# their results, is measured when the ``profiler`` key of the ``workgraph.json`` configuration file is set, e.g.
+# ``{"profiler": {"extra": true, "prometheus": "/tmp/workgraph_{pid}.prom"}}``. The histograms of the durations
+# are stored in the ``_workgraph_profile`` extra of every workgraph process, and the totals of the daemon worker
+# are written to a file in the Prometheus text format, which the node exporter can collect. Custom hooks receive
+# the same measurements, see ``aiida_workgraph.engine.profiler.register_hook``.
+
 
 # sphinx_gallery_start_ignore
 set_aiida_loglevel('ERROR')
@@ -3,7 +3,7 @@ from .task import Task
 from .decorator import task
 from .tasks import TaskPool
 from .tasks.shelljob_task import shelljob
-from .manager import get_current_graph, If, Map, While, Zone
+from .manager import get_current_graph, If, Map, Reduce, While, Zone
 from . import socket_spec as spec
 from .socket_spec import namespace, dynamic, select, meta
 from .collection import group
@@ -18,6 +18,7 @@ __all__ = [
     'Zone',
     'If',
     'Map',
+    'Reduce',
     'While',
     'TaskPool',
     'shelljob',
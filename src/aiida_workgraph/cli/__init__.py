@@ -4,10 +4,10 @@ The commands need to be imported here for them to be registered with the top-lev
 """
 
 from aiida.plugins.entry_point import get_entry_points
-from aiida_workgraph.cli import cmd_task
+from aiida_workgraph.cli import cmd_task, cmd_trace
 
 eps = get_entry_points('workgraph.cmdline')
 for ep in eps:
     ep.load()
 
-__all__ = ['cmd_task']
+__all__ = ['cmd_task', 'cmd_trace']
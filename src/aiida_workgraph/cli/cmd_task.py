@@ -79,3 +79,49 @@ def task_kill(process, tasks, timeout):
         kill_tasks(process.pk, tasks, timeout)
     except control.ProcessTimeoutException as exception:
         echo.echo_critical(f'{exception}\n{REPAIR_INSTRUCTIONS}')
+
+
+@workgraph_task.command('timing')
+@arguments.PROCESS()
+@decorators.with_dbenv()
+def task_timing(process):
+    """Show the lifecycle timestamps and the delays (in seconds) of the tasks.
+
+    The timestamps are relative to the creation of the work graph. The queue wait is the time between
+    ready and submitted, the latency is the time between the end of the task and its results applied.
+    """
+    from tabulate import tabulate
+    from aiida_workgraph.orm.workgraph import WorkGraphNode
+    from aiida_workgraph.utils import get_processes_latest, get_task_delays
+
+    start = process.ctime.timestamp()
+    table = []
+    for name, data in get_processes_latest(process.pk).items():
+        timestamps = data['timestamps']
+        if not timestamps:
+            continue
+        delays = get_task_delays(timestamps)
+        row = [name, data['state']]
+        row.extend(
+            round(timestamps[event] - start, 3) if event in timestamps else None
+            for event in WorkGraphNode.TASK_TIMESTAMP_EVENTS
+        )
+        row.extend(delays[key] for key in ('queue_wait', 'run_time', 'latency'))
+        table.append(row)
+    headers = ['Name', 'State', *(event.capitalize() for event in WorkGraphNode.TASK_TIMESTAMP_EVENTS)]
+    echo.echo(tabulate(table, headers=[*headers, 'Queue wait', 'Run time', 'Latency']))
+
+
+@workgraph_task.command('clear-cache')
+@click.option('-k', '--key', default=None, help='Only discard the results of this fingerprint.')
+@decorators.with_dbenv()
+def task_clear_cache(key):
+    """Discard the cached results of the tasks, they are not reused by the next workgraphs.
+
+    The process nodes of the tasks run with `cache=True` are not reused anymore. Restart the daemon to
+    also discard the results of the tasks running inline, which are kept in the memory of the workers.
+    """
+    from aiida_workgraph.engine.result_cache import clear_result_cache
+
+    count = clear_result_cache(key)
+    echo.echo_success(f'discarded the cached results of {count} processes')
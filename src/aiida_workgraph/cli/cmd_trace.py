@@ -0,0 +1,32 @@
+"""`workgraph trace` command."""
+
+import click
+
+from aiida_workgraph.cli.cmd_workgraph import workgraph
+from aiida.cmdline.params import arguments
+from aiida.cmdline.utils import decorators, echo
+
+
+@workgraph.command('trace')
+@arguments.PROCESS()
+@click.option(
+    '-o',
+    '--output',
+    type=click.Path(dir_okay=False, writable=True),
+    default=None,
+    help='The trace file, by default `workgraph_<pk>.trace.json`.',
+)
+@decorators.with_dbenv()
+def workgraph_trace(process, output):
+    """Export the timeline of a work graph and its nested work graphs.
+
+    The trace event JSON file can be opened with https://ui.perfetto.dev or chrome://tracing.
+    """
+    from aiida_workgraph.utils.trace import export_trace
+
+    output = output or f'workgraph_{process.pk}.trace.json'
+    try:
+        count = export_trace(process.pk, output)
+    except ValueError as exception:
+        echo.echo_critical(str(exception))
+    echo.echo_success(f'wrote {count} events to {output}')
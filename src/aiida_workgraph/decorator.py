@@ -21,7 +21,17 @@ def _spec_for(
     outputs: Optional[SocketSpec] = None,
     catalog: str = None,
     error_handlers: Optional[Dict[str, ErrorHandlerSpec]] = None,
+    executor_mode: Optional[str] = None,
+    ephemeral: bool = False,
+    cache: bool = False,
 ) -> TaskSpec:
+    if executor_mode is not None and (inspect.isclass(obj) or getattr(obj, 'node_class', False)):
+        raise ValueError('The executor mode is only supported by the tasks of plain Python functions.')
+    if ephemeral and (inspect.isclass(obj) or getattr(obj, 'node_class', False)):
+        raise ValueError('Only the tasks of plain Python functions can be ephemeral.')
+    if cache and (inspect.isclass(obj) or getattr(obj, 'node_class', False)):
+        raise ValueError('Only the results of the tasks of plain Python functions can be cached.')
+
     # AiiDA process classes
     if inspect.isclass(obj) and issubclass(obj, (CalcJob, WorkChain)):
         return AiiDAProcessTask.build(obj, attached_error_handlers=error_handlers)
@@ -46,6 +56,9 @@ def _spec_for(
             out_spec=outputs,
             error_handlers=error_handlers,
             catalog=catalog or 'Others',
+            executor_mode=executor_mode,
+            ephemeral=ephemeral,
+            cache=cache,
         )
         return spec
 
@@ -131,6 +144,9 @@ class TaskDecoratorCollection:
         outputs: Optional[SocketSpec | list] = None,
         error_handlers: Optional[Dict[str, ErrorHandlerSpec]] = None,
         catalog: str = 'Others',
+        executor_mode: Optional[str] = None,
+        ephemeral: bool = False,
+        cache: bool = False,
     ) -> Callable:
         """Generate a decorator that register a function as a task.
 
@@ -139,6 +155,12 @@ class TaskDecoratorCollection:
             catalog (str): task catalog
             inputs (list): task inputs
             outputs (list): task outputs
+            executor_mode (str): run the function in a ``thread`` or ``process`` pool instead of
+                blocking the engine, see :mod:`aiida_workgraph.engine.executor_pool`
+            ephemeral (bool): call the function directly instead of launching a process, and keep the
+                results in the engine as raw Python data, see :attr:`aiida_workgraph.task.Task.ephemeral`
+            cache (bool): reuse the results of a previous run with the same inputs, see
+                :attr:`aiida_workgraph.task.Task.cache`
         """
 
         def decorator(obj: Union[WorkGraph, type, callable]) -> TaskHandle:
@@ -150,6 +172,9 @@ class TaskDecoratorCollection:
                 inputs=inputs,
                 outputs=outputs,
                 error_handlers=normalized_handlers,
+                executor_mode=executor_mode,
+                ephemeral=ephemeral,
+                cache=cache,
             )
 
             handle = TaskHandle(spec)
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 import functools
+import traceback
+from concurrent.futures import Future
 from aiida.orm import ProcessNode
 from aiida.engine.processes.workchains.awaitable import (
     Awaitable,
@@ -10,25 +12,41 @@ from aiida.engine.processes.workchains.awaitable import (
 )
 from aiida.orm import load_node
 from aiida.common import exceptions
-from typing import Any, List
+from collections import Counter
+from typing import Any, Callable, Dict, List, Tuple
 import logging
 
 
 class AwaitableManager:
     """Handles awaitable objects and their resolutions."""
 
+    # maximum number of pks shown in the process status
+    MAX_STATUS_PKS = 5
+
     def __init__(self, _awaitables, runner, logger: logging.Logger, process, ctx_manager):
         self.runner = runner
         self.logger = logger
         self.process = process
         self.ctx_manager = ctx_manager
         self.ctx = ctx_manager.ctx
-        # awaitables that are persisted
-        self._awaitables: List[Awaitable] = _awaitables
-        # awaitables that are not persisted, because they are not serializable
-        # but don't worry, because we re-register them when loading the process
-        self.not_persisted_awaitables = {}
-        self.ctx._awaitable_actions = []
+        # awaitables that are persisted, indexed by the pk of the process
+        self._awaitables: Dict[int, Awaitable] = _awaitables
+        # awaitables that are not persisted, because they are not serializable, e.g. the futures of
+        # the functions running in an executor. They are lost when the process is loaded from a checkpoint,
+        # thus their tasks are reset and run again, see `TaskManager.reset_offloaded_tasks`
+        self.not_persisted_awaitables: Dict[str, Future] = {}
+        # pks of the awaitables whose callback is registered to the runner, the callbacks are
+        # not persisted, thus this is reset when loading the process
+        self._awaitable_actions = set()
+        # number of awaitables per task type, used for the process status
+        self._type_counts = Counter(self._get_task_type(awaitable) for awaitable in self._awaitables.values())
+        # completed awaitables waiting to be applied, see `on_awaitable_finished`
+        self._completed_awaitables: List[Awaitable] = []
+        self._completed_futures: List[Tuple[str, Future]] = []
+        self._completion_handle = None
+        # number of awaitables inserted since the process was created or loaded, see `CheckpointWriter`
+        self.insertions = 0
+        self.metrics = {'coalesce_window': self.coalesce_window, 'completions': 0, 'batches': 0, 'max_batch_size': 0}
 
     def insert_awaitable(self, awaitable: Awaitable) -> None:
         """Insert an awaitable that should be terminated before before continuing to the next step.
@@ -44,9 +62,10 @@ class AwaitableManager:
         else:
             raise AssertionError(f'Unsupported awaitable action: {awaitable.action}')
 
-        self._awaitables.append(
-            awaitable
-        )  # add only if everything went ok, otherwise we end up in an inconsistent state
+        # add only if everything went ok, otherwise we end up in an inconsistent state
+        self._awaitables[awaitable.pk] = awaitable
+        self.insertions += 1
+        self._type_counts[self._get_task_type(awaitable)] += 1
         self.update_process_status()
 
     def resolve_awaitable(self, awaitable: Awaitable, value: Any) -> None:
@@ -65,21 +84,47 @@ class AwaitableManager:
             raise AssertionError(f'Unsupported awaitable action: {awaitable.action}')
 
         awaitable.resolved = True
-        # remove awaitabble from the list, and use the same list reference
-        self._awaitables[:] = [a for a in self._awaitables if a.pk != awaitable.pk]
+        if self._awaitables.pop(awaitable.pk, None) is not None:
+            self._type_counts[self._get_task_type(awaitable)] -= 1
+        self._awaitable_actions.discard(awaitable.pk)
 
         if not self.process.has_terminated():
             # the process may be terminated, for example, if the process was killed or excepted
             # then we should not try to update it
             self.update_process_status()
 
+    def _get_task_type(self, awaitable: Awaitable) -> str:
+        """Return the type of the task that launched the awaitable."""
+        tasks = getattr(getattr(self.process, 'wg', None), 'tasks', None)
+        if tasks is None or awaitable.key not in tasks:
+            return 'UNKNOWN'
+        return tasks[awaitable.key].task_type.upper()
+
+    def get_process_status_summary(self) -> str | None:
+        """Return a summary of the sub processes that we are waiting for.
+
+        The size of the summary does not depend on the number of sub processes: it contains
+        the number of sub processes per task type and the pks of the first few of them.
+        Use :meth:`get_awaitables` to get all of them.
+        """
+        if not self._awaitables:
+            return None
+        counts = ', '.join(f'{task_type}: {count}' for task_type, count in sorted(self._type_counts.items()) if count)
+        pks = [str(pk) for pk, _ in zip(self._awaitables, range(self.MAX_STATUS_PKS))]
+        if len(self._awaitables) > self.MAX_STATUS_PKS:
+            pks.append('...')
+        return f'Waiting for child processes: {len(self._awaitables)} ({counts}), pks: {", ".join(pks)}'
+
+    def get_awaitables(self) -> List[Dict[str, Any]]:
+        """Return the key, pk and task type of all the sub processes that we are waiting for."""
+        return [
+            {'key': awaitable.key, 'pk': pk, 'task_type': self._get_task_type(awaitable)}
+            for pk, awaitable in self._awaitables.items()
+        ]
+
     def update_process_status(self) -> None:
         """Set the process status with a message accounting the current sub processes that we are waiting for."""
-        if self._awaitables:
-            status = f'Waiting for child processes: {", ".join([str(_.pk) for _ in self._awaitables])}'
-            self.process.node.set_process_status(status)
-        else:
-            self.process.node.set_process_status(None)
+        self.process.node.set_process_status(self.get_process_status_summary())
 
     def action_awaitables(self) -> None:
         """Handle the awaitables that are currently registered with the work chain.
@@ -88,30 +133,113 @@ class AwaitableManager:
         function will be bound with the awaitable and the runner will be asked to
         call it when the target is completed
         """
-        for awaitable in self._awaitables:
+        for awaitable in list(self._awaitables.values()):
             # if the waitable already has a callback, skip
-            if awaitable.pk in self.ctx._awaitable_actions:
+            if awaitable.pk in self._awaitable_actions:
                 continue
             if awaitable.target == AwaitableTarget.PROCESS:
                 callback = functools.partial(self.process.call_soon, self.on_awaitable_finished, awaitable)
                 self.runner.call_on_process_finish(awaitable.pk, callback)
-                self.ctx._awaitable_actions.append(awaitable.pk)
+                self._awaitable_actions.add(awaitable.pk)
             else:
                 assert f"invalid awaitable target '{awaitable.target}'"
 
+    @property
+    def coalesce_window(self) -> float:
+        """Time (in seconds) during which the completed child processes are collected before being applied."""
+        return getattr(getattr(self.process, 'wg', None), 'coalesce_window', 0) or 0
+
     def on_awaitable_finished(self, awaitable: Awaitable) -> None:
         """Callback function, for when an awaitable process instance is completed.
 
-        The awaitable will be effectuated on the context of the work chain and removed from the internal list. If all
-        awaitables have been dealt with, the work chain process is resumed.
+        The completions are not applied one by one, because each of them would resume the workgraph
+        and run a full step. Instead, they are collected for ``coalesce_window`` seconds (or until the
+        event loop is idle if the window is zero), then applied as one batch, see :meth:`apply_completions`.
 
         :param awaitable: an Awaitable instance
         """
-        self.logger.debug(f'Awaitable {awaitable.key} finished.')
+        with self.process.profiler.section('on_awaitable_finished'):
+            self.logger.info(
+                'received callback that awaitable with key {} and pk {} has terminated'.format(
+                    awaitable.key, awaitable.pk
+                )
+            )
+            self._completed_awaitables.append(awaitable)
+            self.schedule_completions()
+
+    def run_in_executor(self, key: str, func: Callable[[], Any], mode: str) -> None:
+        """Call the function in the executor of the given mode without blocking the event loop.
 
-        self.logger.info(
-            'received callback that awaitable with key {} and pk {} has terminated'.format(awaitable.key, awaitable.pk)
+        The result is applied on the event loop, together with the completed child processes.
+
+        :param key: the name of the task
+        :param func: the function to call, without arguments
+        :param mode: the executor mode, see :data:`~aiida_workgraph.engine.executor_pool.EXECUTOR_MODES`
+        """
+        from .executor_pool import get_executor
+
+        future = get_executor(mode).submit(func)
+        self.not_persisted_awaitables[key] = future
+        future.add_done_callback(
+            lambda future: self.process.loop.call_soon_threadsafe(
+                self.process.call_soon, self.on_future_finished, key, future
+            )
         )
+
+    def on_future_finished(self, key: str, future: Future) -> None:
+        """Callback function, for when a function running in an executor is completed."""
+        self.logger.info(f'received callback that the function of task {key} has terminated')
+        self.process.task_manager.state_manager.record_task_timestamp(key, 'finished')
+        self._completed_futures.append((key, future))
+        self.schedule_completions()
+
+    def schedule_completions(self) -> None:
+        """Schedule the completions to be applied, if it is not already scheduled."""
+        self.metrics['completions'] += 1
+        if self._completion_handle is not None:
+            return
+        window = self.coalesce_window
+        self.metrics['coalesce_window'] = window
+        if window > 0:
+            self._completion_handle = self.process.loop.call_later(
+                window, self.process.call_soon, self.apply_completions
+            )
+        else:
+            # the callbacks of the other completed processes are already scheduled, they run before this one
+            self._completion_handle = self.process.call_soon(self.apply_completions)
+
+    def apply_completions(self) -> None:
+        """Apply all the collected completions, then resume the workgraph once."""
+        self._completion_handle = None
+        awaitables, self._completed_awaitables = self._completed_awaitables, []
+        futures, self._completed_futures = self._completed_futures, []
+        batch_size = len(awaitables) + len(futures)
+        if not batch_size or self.process.has_terminated():
+            return
+        self.metrics['batches'] += 1
+        self.metrics['max_batch_size'] = max(self.metrics['max_batch_size'], batch_size)
+        self.logger.debug(f'Apply {batch_size} completed awaitables in one batch.')
+        with self.process.profiler.section('apply_completions'):
+            for awaitable in awaitables:
+                self.complete_awaitable(awaitable)
+            for key, future in futures:
+                self.complete_future(key, future)
+        # try to resume the workgraph, if the workgraph is already resumed
+        # by other awaitable, this will not work
+        try:
+            self.process.resume()
+        except Exception as e:
+            self.logger.exception('Failed to resume process after awaitable completion: %s', e)
+        # in case the process was not resumed, make the new task states visible on the node
+        if not self.process.has_terminated():
+            self.process.runtime_state.flush()
+
+    def complete_awaitable(self, awaitable: Awaitable) -> None:
+        """Effectuate the awaitable on the context and update the state of its task.
+
+        :param awaitable: an Awaitable instance
+        """
+        self.logger.debug(f'Awaitable {awaitable.key} finished.')
         try:
             node = load_node(awaitable.pk)
         except (exceptions.MultipleObjectsError, exceptions.NotExistent):
@@ -126,12 +254,22 @@ class AwaitableManager:
         # node finished, update the task state and result
         # udpate the task state
         self.process.task_manager.state_manager.update_task_state(awaitable.key)
-        # try to resume the workgraph, if the workgraph is already resumed
-        # by other awaitable, this will not work
-        try:
-            self.process.resume()
-        except Exception as e:
-            self.logger.exception('Failed to resume process after awaitable completion: %s', e)
+
+    def complete_future(self, key: str, future: Future) -> None:
+        """Set the results of the task whose function ran in an executor.
+
+        :param key: the name of the task
+        :param future: the future of the function
+        """
+        self.not_persisted_awaitables.pop(key, None)
+        state_manager = self.process.task_manager.state_manager
+        exception = future.exception()
+        if exception is None:
+            state_manager.update_normal_task_state(key, future.result())
+        else:
+            error_traceback = ''.join(traceback.format_exception(exception))
+            self.logger.error(f'Error in task {key}: {exception}\n{error_traceback}')
+            state_manager.update_normal_task_state(key, results=None, success=False)
 
     def to_context(self, **kwargs: Awaitable | ProcessNode) -> None:
         """Add a dictionary of awaitables to the context.
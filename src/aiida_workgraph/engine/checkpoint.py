@@ -0,0 +1,212 @@
+"""Decide when the engine saves a checkpoint, and write it off the event loop.
+
+By default a checkpoint is saved every time the engine enters the ``RUNNING`` or ``WAITING`` state,
+i.e. at every step. The ``checkpoint_policy`` of the workgraph (see ``WorkGraph.set_checkpoint_policy``)
+saves them less often:
+
+- ``step``: at every step.
+- ``steps``: every ``steps`` steps.
+- ``interval``: at the first step after ``interval`` seconds since the last checkpoint.
+- ``awaitables``: only when a child process was submitted.
+
+Whatever the policy, a checkpoint is saved at the end of a step which submitted child processes,
+so that they are never submitted again when the process is loaded from its last checkpoint. When the
+checkpoints can be skipped, a checkpoint is also saved as soon as a process function, e.g. a
+``PYFUNCTION`` or ``CALCFUNCTION`` task, ran inside the step, so that it does not run again. The
+``NORMAL`` tasks, which do not create a process, may run again instead.
+Since the runtime info on the node can be ahead of the last checkpoint, it is kept in the checkpoint
+and restored with it, unless a checkpoint is saved at every step.
+
+With ``asynchronous``, the checkpoint is represented as a YAML tree on the event loop, which is a
+consistent snapshot of the process, then emitted to a string in a background thread. The string is
+written to the node on the event loop, as the ``AiiDAPersister`` does, unless a newer checkpoint was
+written in the meantime. With another persister, the checkpoints are saved synchronously by the persister.
+If a checkpoint can not be saved or emitted, the checkpoint of the next step is saved synchronously.
+"""
+
+from __future__ import annotations
+
+import io
+import time
+import typing as t
+from concurrent.futures import Future, ThreadPoolExecutor
+
+CHECKPOINT_POLICIES = ('step', 'steps', 'interval', 'awaitables')
+
+DEFAULT_CHECKPOINT_POLICY = {'policy': 'step', 'steps': 1, 'interval': 0.0, 'asynchronous': False}
+
+_writer: t.Optional[ThreadPoolExecutor] = None
+
+
+def validate_checkpoint_policy(policy: str, steps: int, interval: float) -> None:
+    if policy not in CHECKPOINT_POLICIES:
+        raise ValueError(f'Unknown checkpoint policy: {policy}, valid policies are: {CHECKPOINT_POLICIES}')
+    if steps < 1:
+        raise ValueError(f'The number of steps between checkpoints must be a positive integer, got {steps}.')
+    if interval < 0:
+        raise ValueError(f'The interval between checkpoints must not be negative, got {interval}.')
+
+
+def get_writer() -> ThreadPoolExecutor:
+    """Return the thread emitting the checkpoints, shared by all the workgraphs of the interpreter.
+
+    A single thread keeps the checkpoints of a process in order.
+    """
+    global _writer
+
+    if _writer is None:
+        _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='workgraph-checkpoint')
+    return _writer
+
+
+def release_represented_objects(dumper: t.Any) -> None:
+    """Drop the references of the dumper to the represented objects, only its YAML tree is kept.
+
+    The represented objects are only needed to detect the aliases while representing the data. Dropping
+    them lets the objects of the process change while the tree is emitted.
+    """
+    dumper.represented_objects = {}
+    dumper.object_keeper = []
+    dumper.alias_key = None
+
+
+def emit_checkpoint(dumper: t.Any, node: t.Any, stream: io.StringIO) -> str:
+    """Emit the YAML tree of a checkpoint to a string, it does not access the process."""
+    try:
+        dumper.open()
+        dumper.serialize(node)
+        dumper.close()
+    finally:
+        dumper.dispose()
+    return stream.getvalue()
+
+
+class CheckpointWriter:
+    """Save the checkpoints of the engine following the checkpoint policy of its workgraph."""
+
+    def __init__(self, process):
+        """
+        :param process: The engine process.
+        """
+        self.process = process
+        # steps since the last checkpoint
+        self._steps = 0
+        self._last_time = time.monotonic()
+        # number of awaitables inserted when the last checkpoint was saved
+        self._insertions = process.awaitable_manager.insertions
+        # the checkpoints are numbered, an asynchronous one is not written if a newer one was written before
+        self._generation = 0
+        self._written_generation = 0
+        # an asynchronous checkpoint failed, the next one is saved synchronously
+        self._force_sync = False
+        self.metrics = {'saved': 0, 'asynchronous': 0}
+
+    @property
+    def policy(self) -> t.Dict[str, t.Any]:
+        policy = getattr(getattr(self.process, 'wg', None), 'checkpoint_policy', None)
+        return {**DEFAULT_CHECKPOINT_POLICY, **(policy or {})}
+
+    @property
+    def keeps_runtime_state(self) -> bool:
+        """Whether the checkpoint can be older than the runtime info on the node, thus keeps a copy of it."""
+        policy = self.policy
+        return hasattr(self.process, 'wg') and (policy['policy'] != 'step' or policy['asynchronous'])
+
+    @property
+    def can_save_async(self) -> bool:
+        """Whether the checkpoints are written to the node by the persister, as the asynchronous ones are."""
+        from aiida.engine.persistence import AiiDAPersister
+
+        return isinstance(self.process.runner.persister, AiiDAPersister)
+
+    def next_checkpoint(self) -> t.Optional[str]:
+        """Return how the checkpoint of this step is saved: ``None`` to skip it, ``sync`` or ``async``."""
+        self._steps += 1
+        # before the setup, and when the process is paused, e.g. before the daemon is stopped
+        if not hasattr(self.process, 'wg') or self.process.paused:
+            return 'sync'
+        # the submitted child processes must be in the checkpoint before anything else happens
+        if self.process.awaitable_manager.insertions != self._insertions or self._force_sync:
+            return 'sync'
+        policy = self.policy
+        if policy['policy'] == 'steps' and self._steps < policy['steps']:
+            return None
+        if policy['policy'] == 'interval' and time.monotonic() - self._last_time < policy['interval']:
+            return None
+        if policy['policy'] == 'awaitables':
+            return None
+        return 'async' if policy['asynchronous'] and self.can_save_async else 'sync'
+
+    def saved(self) -> int:
+        """Record that a checkpoint is saved, return its number."""
+        self._steps = 0
+        self._last_time = time.monotonic()
+        self._insertions = self.process.awaitable_manager.insertions
+        self._generation += 1
+        self.metrics['saved'] += 1
+        return self._generation
+
+    def save_sync(self) -> None:
+        """Save the checkpoint on the event loop, with the persister of the runner.
+
+        If the checkpoint can not be saved, it is not recorded as saved, and the next one is saved synchronously.
+        """
+        import plumpy
+
+        try:
+            self.process.runner.persister.save_checkpoint(self.process)
+        except plumpy.exceptions.PersistenceError:
+            self._force_sync = True
+            self.process.logger.exception(
+                'Exception trying to save checkpoint, this means you will '
+                'not be able to restart in case of a crash until the next successful checkpoint.'
+            )
+            return
+        self._force_sync = False
+        self._written_generation = self.saved()
+
+    def save_async(self) -> None:
+        """Represent the checkpoint on the event loop, then emit and write it without blocking it.
+
+        The checkpoint is serialized as by the ``AiiDAPersister``, see ``aiida.orm.utils.serialize.serialize``.
+
+        :raises: :class:`plumpy.exceptions.PersistenceError` if the checkpoint can not be represented
+        """
+        import traceback
+
+        import plumpy
+        from aiida.orm.utils.serialize import AiiDADumper
+
+        stream = io.StringIO()
+        dumper = AiiDADumper(stream)
+        try:
+            bundle = plumpy.persistence.Bundle(
+                self.process, plumpy.persistence.LoadSaveContext(loader=plumpy.get_object_loader())
+            )
+            node = dumper.represent_data(bundle)
+        except Exception:
+            self._force_sync = True
+            raise plumpy.exceptions.PersistenceError(
+                f"Failed to create a bundle for '{self.process}': {traceback.format_exc()}"
+            )
+        release_represented_objects(dumper)
+        generation = self.saved()
+        self.metrics['asynchronous'] += 1
+        loop = self.process.loop
+        future = get_writer().submit(emit_checkpoint, dumper, node, stream)
+        future.add_done_callback(lambda future: loop.call_soon_threadsafe(self.on_emitted, generation, future))
+
+    def on_emitted(self, generation: int, future: Future) -> None:
+        """Write an emitted checkpoint to the node, unless it is outdated or the process terminated."""
+        if generation <= self._written_generation or self.process.has_terminated():
+            return
+        exception = future.exception()
+        if exception is not None:
+            self.process.logger.error(
+                'Exception trying to save checkpoint, this means you will not be able to restart in case of a '
+                f'crash until the next successful checkpoint: {exception}'
+            )
+            self._force_sync = True
+            return
+        self.process.node.set_checkpoint(future.result())
+        self._written_generation = generation
@@ -51,9 +51,10 @@ class ErrorHandlerManager:
                     msg = executor(task, **(handler.kwargs or {}))
                 # Reset the task to rerun it
                 self.process.task_manager.state_manager.reset_task(task.name)
-                # Save the updated task into self.ctx._wgdata
+                # Save the updated task into the context, it can not be rebuilt from the process node
                 tdata = task.to_dict()
-                self.ctx._wgdata['tasks'][task.name] = tdata
+                self.ctx._wgdata_tasks[task.name] = tdata
+                self.process.track_unstored_nodes(tdata)
                 if msg:
                     self.process.report(msg)
                 handler.retry += 1
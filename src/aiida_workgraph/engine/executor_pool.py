@@ -0,0 +1,142 @@
+"""Run the synchronous functions of the tasks in a pool of threads or processes.
+
+By default, the function of a ``PYFUNCTION`` or ``NORMAL`` task is called inline on the event loop
+of the engine, which blocks the other branches of the graph and the handling of the RPC messages.
+A task with an ``executor_mode`` offloads the call to a shared, bounded executor instead:
+
+- ``thread``: a ``ThreadPoolExecutor``, for functions that release the GIL (I/O, numpy, ...).
+- ``process``: a ``ProcessPoolExecutor``, for CPU-bound pure Python functions. The function, its
+  inputs and its results must be picklable. Only supported by the ``PYFUNCTION`` tasks.
+
+Only the user function runs in the executor: the process node, the serialization of the outputs
+and the links are created on the event loop, so the provenance is recorded as for any other task.
+The size of the pools is set by the ``executor_max_workers`` key of the ``workgraph.json`` config file.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import logging
+import multiprocessing
+import traceback
+import typing as t
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+import cloudpickle
+import plumpy
+from aiida.engine import ExitCode
+from aiida.engine.processes.process import Process
+from aiida_pythonjob import PyFunction
+from aiida_pythonjob.calculations.common import ATTR_DESERIALIZERS, ATTR_INPUTS_SPEC
+from aiida_pythonjob.calculations.tasks import Waiting
+from aiida_pythonjob.data.deserializer import deserialize_to_raw_python_data
+from node_graph.socket_spec import SocketSpec
+from node_graph.utils.struct_utils import coerce_inputs_from_spec
+
+logger = logging.getLogger(__name__)
+
+EXECUTOR_MODES = ('thread', 'process')
+
+_executors: t.Dict[str, Executor] = {}
+
+
+def validate_executor_mode(mode: t.Optional[str]) -> None:
+    if mode is not None and mode not in EXECUTOR_MODES:
+        raise ValueError(f'Unknown executor mode: {mode}, valid modes are: {EXECUTOR_MODES}')
+
+
+def get_executor(mode: str) -> Executor:
+    """Return the executor of the given mode, shared by all the workgraphs of the interpreter."""
+    from aiida_workgraph.config import load_config
+
+    validate_executor_mode(mode)
+    if mode not in _executors:
+        max_workers = load_config().get('executor_max_workers')
+        if mode == 'thread':
+            _executors[mode] = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='workgraph')
+        else:
+            # forking the engine process, which runs an event loop and other threads, is not safe
+            _executors[mode] = ProcessPoolExecutor(
+                max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')
+            )
+    return _executors[mode]
+
+
+def shutdown_executors(wait: bool = True) -> None:
+    """Shut down the executors, they are created again when needed."""
+    while _executors:
+        _, executor = _executors.popitem()
+        executor.shutdown(wait=wait)
+
+
+def call_pickled_function(pickled_function: bytes, inputs: t.Dict[str, t.Any]) -> t.Any:
+    """Unpickle the function and call it, used to run a function in another process."""
+    return cloudpickle.loads(pickled_function)(**inputs)
+
+
+async def task_run_executor_job(process: Process, *args, **kwargs) -> t.Any:
+    """Run the *sync* user function in the executor and return results or a structured error."""
+    node = process.node
+
+    try:
+        inputs = dict(process.inputs.function_inputs or {})
+        deserializers = node.base.attributes.get(ATTR_DESERIALIZERS, {})
+        inputs = deserialize_to_raw_python_data(inputs, deserializers=deserializers)
+        inputs_spec = node.base.attributes.get(ATTR_INPUTS_SPEC, {})
+        if inputs_spec:
+            inputs = coerce_inputs_from_spec(inputs, SocketSpec.from_dict(inputs_spec))
+    except Exception as exception:
+        return {
+            '__error__': 'ERROR_DESERIALIZE_INPUTS_FAILED',
+            'exception': str(exception),
+            'traceback': traceback.format_exc(),
+        }
+
+    mode = process.inputs.executor_mode
+    if mode == 'process':
+        func = functools.partial(call_pickled_function, process.inputs.function_data.pickled_function, inputs)
+    else:
+        func = functools.partial(process.func, **inputs)
+    try:
+        logger.info(f'scheduled request to run the function<{node.pk}> in the {mode} executor')
+        results = await asyncio.get_running_loop().run_in_executor(get_executor(mode), func)
+        logger.info(f'running function<{node.pk}> successful')
+        return {'__ok__': True, 'results': results}
+    except Exception as exception:
+        logger.warning(f'running function<{node.pk}> failed')
+        return {
+            '__error__': 'ERROR_FUNCTION_EXECUTION_FAILED',
+            'exception': str(exception),
+            'traceback': traceback.format_exc(),
+        }
+
+
+class ExecutorWaiting(Waiting):
+    """The waiting state of the `ExecutorPyFunction` process."""
+
+    task_run_job = staticmethod(task_run_executor_job)
+
+
+class ExecutorPyFunction(PyFunction):
+    """A version of PyFunction that calls its synchronous function in an executor."""
+
+    _WAITING = ExecutorWaiting
+
+    @classmethod
+    def define(cls, spec) -> None:  # type: ignore[override]
+        super().define(spec)
+        spec.input(
+            'executor_mode',
+            valid_type=str,
+            default='thread',
+            non_db=True,
+            validator=lambda value, _: None if value in EXECUTOR_MODES else f'Unknown executor mode: {value}',
+            help=f'The executor running the function, one of {EXECUTOR_MODES}.',
+        )
+
+    async def run(self) -> t.Union[plumpy.process_states.Stop, int, plumpy.process_states.Wait]:
+        if self.node.exit_status is not None:
+            return ExitCode(self.node.exit_status, self.node.exit_message)
+
+        return plumpy.process_states.Wait(msg='Waiting to run')
@@ -0,0 +1,248 @@
+"""Instrumentation of the hot paths of the engine.
+
+The engine times its sections, i.e. a step (``_do_step``), ``continue_workgraph``, ``run_tasks``,
+``get_inputs``, the submission of a child process, ``update_task_state``, ``on_awaitable_finished`` and
+``apply_completions``. It also counts the tasks checked by the scheduler, the tasks launched and the
+attributes written to the node. These measurements are passed to the profiler hooks, see
+:class:`ProfilerHook`, registered with :func:`register_hook`. Without any hook, a section costs a single
+attribute lookup.
+
+The built-in :class:`MetricsCollector` aggregates the measurements of a process in histograms. It is
+enabled by the ``profiler`` key of the ``workgraph.json`` config file, e.g.::
+
+    {"profiler": {"extra": true, "prometheus": "/path/to/workgraph_{pid}.prom"}}
+
+With ``extra``, the histograms are stored in the ``_workgraph_profile`` extra of the process node when
+the process terminates. With ``prometheus``, the histograms of all the processes run by the interpreter,
+e.g. a daemon worker, are written to a file in the Prometheus text format, which can be read by the
+textfile collector of the node exporter. ``{pid}`` is replaced by the id of the operating system process,
+since each daemon worker writes its own file.
+"""
+
+from __future__ import annotations
+
+import bisect
+import contextlib
+import os
+import threading
+import time
+import typing as t
+
+PROFILE_EXTRA_KEY = '_workgraph_profile'
+# upper bounds (in seconds) of the buckets of the histograms, the last bucket is unbounded
+BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+_hooks: t.List['ProfilerHook'] = []
+
+
+class ProfilerHook:
+    """Receive the measurements of the engine, subclass it and override the methods of interest.
+
+    The methods are called on the event loop of the engine, they should return quickly.
+    """
+
+    def on_section(self, process, name: str, elapsed: float) -> None:
+        """Called when a section of the engine exits, with its duration in seconds."""
+
+    def on_count(self, process, name: str, value: int) -> None:
+        """Called when the engine counts some work, e.g. ``tasks_launched``."""
+
+    def on_terminated(self, process) -> None:
+        """Called when the process terminates."""
+
+
+def register_hook(hook: ProfilerHook) -> None:
+    """Register a hook receiving the measurements of all the engine processes created afterwards."""
+    if hook not in _hooks:
+        _hooks.append(hook)
+
+
+def unregister_hook(hook: ProfilerHook) -> None:
+    if hook in _hooks:
+        _hooks.remove(hook)
+
+
+class Histogram:
+    """Count of the durations per bucket, with their sum."""
+
+    def __init__(self, counts: t.Optional[t.List[int]] = None, total: float = 0.0):
+        self.counts = list(counts) if counts is not None else [0] * (len(BUCKETS) + 1)
+        self.total = total
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.total += value
+
+    def merge(self, other: 'Histogram') -> None:
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.total += other.total
+
+    def to_dict(self) -> t.Dict[str, t.Any]:
+        return {'counts': self.counts, 'sum': self.total, 'count': self.count}
+
+
+class _Section:
+    """Time a section of the engine, and pass its duration to the hooks."""
+
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler: 'EngineProfiler', name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *args: t.Any) -> None:
+        elapsed = time.perf_counter() - self.start
+        for hook in self.profiler.hooks:
+            hook.on_section(self.profiler.process, self.name, elapsed)
+
+
+_NULL_SECTION = contextlib.nullcontext()
+
+
+class EngineProfiler:
+    """The instrumentation surface of an engine process.
+
+    The hooks are the registered ones, see :func:`register_hook`, and the :class:`MetricsCollector`
+    if it is enabled in the config file.
+    """
+
+    def __init__(self, process, hooks: t.Optional[t.List[ProfilerHook]] = None):
+        """
+        :param process: The engine process.
+        :param hooks: The hooks, by default the registered ones and the configured collector.
+        """
+        self.process = process
+        if hooks is None:
+            hooks = list(_hooks)
+            collector = MetricsCollector.from_config()
+            if collector is not None:
+                hooks.append(collector)
+        self.hooks = hooks
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.hooks)
+
+    def section(self, name: str) -> t.ContextManager[None]:
+        """Return a context manager timing the section ``name``."""
+        if not self.hooks:
+            return _NULL_SECTION
+        return _Section(self, name)
+
+    def count(self, name: str, value: int = 1) -> None:
+        for hook in self.hooks:
+            hook.on_count(self.process, name, value)
+
+    def terminate(self) -> None:
+        for hook in self.hooks:
+            try:
+                hook.on_terminated(self.process)
+            except Exception:  # pylint: disable=broad-except
+                self.process.logger.exception(f'exception in the profiler hook {hook} called on termination')
+
+
+class MetricsCollector(ProfilerHook):
+    """Aggregate the durations of the sections of a process in histograms, and the counts in totals.
+
+    :param extra: Store the metrics in the ``_workgraph_profile`` extra of the node when the process terminates.
+    :param prometheus: The path of the Prometheus text file, where the metrics of all the processes of the
+        interpreter are written when a process terminates.
+    """
+
+    def __init__(self, extra: bool = True, prometheus: t.Optional[str] = None):
+        self.extra = extra
+        self.prometheus = prometheus
+        self.histograms: t.Dict[str, Histogram] = {}
+        self.counters: t.Dict[str, int] = {}
+
+    @classmethod
+    def from_config(cls) -> t.Optional['MetricsCollector']:
+        """Create the collector configured by the ``profiler`` key of the ``workgraph.json`` file, if any."""
+        from aiida_workgraph.config import load_config
+
+        config = load_config().get('profiler')
+        if not config:
+            return None
+        return cls(extra=config.get('extra', True), prometheus=config.get('prometheus'))
+
+    def on_section(self, process, name: str, elapsed: float) -> None:
+        if name not in self.histograms:
+            self.histograms[name] = Histogram()
+        self.histograms[name].observe(elapsed)
+
+    def on_count(self, process, name: str, value: int) -> None:
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_dict(self) -> t.Dict[str, t.Any]:
+        return {
+            'buckets': list(BUCKETS),
+            'sections': {name: histogram.to_dict() for name, histogram in self.histograms.items()},
+            'counters': dict(self.counters),
+        }
+
+    def on_terminated(self, process) -> None:
+        if self.extra:
+            process.node.base.extras.set(PROFILE_EXTRA_KEY, self.to_dict())
+        if self.prometheus:
+            path = self.prometheus.replace('{pid}', str(os.getpid()))
+            WORKER_METRICS.merge(self)
+            WORKER_METRICS.write_prometheus(path)
+
+
+class WorkerMetrics:
+    """The metrics of all the terminated processes of the interpreter, e.g. a daemon worker."""
+
+    def __init__(self):
+        self.histograms: t.Dict[str, Histogram] = {}
+        self.counters: t.Dict[str, int] = {}
+        self.processes = 0
+        self._lock = threading.Lock()
+
+    def merge(self, collector: MetricsCollector) -> None:
+        with self._lock:
+            for name, histogram in collector.histograms.items():
+                self.histograms.setdefault(name, Histogram()).merge(histogram)
+            for name, value in collector.counters.items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            self.processes += 1
+
+    def to_prometheus(self) -> str:
+        """Return the metrics in the Prometheus text exposition format."""
+        lines = [
+            '# HELP aiida_workgraph_section_seconds Duration of the sections of the WorkGraph engine.',
+            '# TYPE aiida_workgraph_section_seconds histogram',
+        ]
+        with self._lock:
+            for name, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip((*BUCKETS, '+Inf'), histogram.counts):
+                    cumulative += count
+                    labels = f'section="{name}",le="{bound}"'
+                    lines.append(f'aiida_workgraph_section_seconds_bucket{{{labels}}} {cumulative}')
+                lines.append(f'aiida_workgraph_section_seconds_sum{{section="{name}"}} {histogram.total}')
+                lines.append(f'aiida_workgraph_section_seconds_count{{section="{name}"}} {cumulative}')
+            lines.append('# HELP aiida_workgraph_work_total Work done by the WorkGraph engine.')
+            lines.append('# TYPE aiida_workgraph_work_total counter')
+            for name, value in sorted(self.counters.items()):
+                lines.append(f'aiida_workgraph_work_total{{counter="{name}"}} {value}')
+            lines.append('# HELP aiida_workgraph_processes_total Number of terminated WorkGraph processes.')
+            lines.append('# TYPE aiida_workgraph_processes_total counter')
+            lines.append(f'aiida_workgraph_processes_total {self.processes}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: str) -> None:
+        """Write the metrics to a file, replaced atomically so that a collector never reads a partial file."""
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as handle:
+            handle.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+
+WORKER_METRICS = WorkerMetrics()
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import heapq
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+# states of a task that hold a slot of its resource pools
+ACTIVE_STATES = ('RUNNING', 'CREATED')
+
+
+def get_task_computer(task) -> Optional[str]:
+    """Return the label of the computer the task runs on, if it is known before launching the task."""
+    from aiida import orm
+
+    inputs = task.inputs._value or {}
+    code = inputs.get('code')
+    if isinstance(code, orm.AbstractCode) and code.computer is not None:
+        return code.computer.label
+    computer = inputs.get('computer')
+    if computer is None:
+        computer = (inputs.get('metadata') or {}).get('computer')
+    if isinstance(computer, orm.Computer):
+        return computer.label
+    if isinstance(computer, orm.Str):
+        return computer.value
+    if isinstance(computer, str):
+        return computer
+    return None
+
+
+class ResourcePool:
+    """A named semaphore limiting the number of tasks of the pool that are active at the same time.
+
+    A task belongs to the pool if it matches all the criteria given to the pool: its task type is
+    in ``task_types``, its computer is in ``computers`` and it has one of the ``tags``. A criterion
+    that is not given matches any task.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        limit: int,
+        task_types: Optional[Iterable[str]] = None,
+        computers: Optional[Iterable[str]] = None,
+        tags: Optional[Iterable[str]] = None,
+    ):
+        self.name = name
+        self.limit = limit
+        self.task_types = {task_type.upper() for task_type in task_types} if task_types else None
+        self.computers = set(computers) if computers else None
+        self.tags = set(tags) if tags else None
+        self.active: Set[str] = set()
+        # insertion ordered set of the tasks waiting for a free slot
+        self.waiting: Dict[str, None] = {}
+        # (priority, name) of the waiting tasks, entries of the tasks that stopped waiting are skipped
+        self.heap: List[tuple] = []
+
+    def matches(self, task) -> bool:
+        if self.task_types is not None and task.task_type.upper() not in self.task_types:
+            return False
+        if self.tags is not None and not self.tags.intersection(getattr(task, 'tags', None) or []):
+            return False
+        if self.computers is not None and get_task_computer(task) not in self.computers:
+            return False
+        return True
+
+    @property
+    def is_full(self) -> bool:
+        return len(self.active) >= self.limit
+
+
+class ResourcePools:
+    """Named resource pools of the tasks.
+
+    Before launching a task, the scheduler checks that all the pools of the task have a free slot.
+    Otherwise, the task is moved to the waiting queue of the full pool, and it is pushed back to
+    the ready queue only when a task of this pool leaves the active states.
+    """
+
+    def __init__(self, push: Callable[[str], None], priority_key: Optional[Callable[[str], Any]] = None):
+        """
+        :param push: Callable queuing a task to be checked again by the scheduler.
+        :param priority_key: Sort key of the tasks, the waiting tasks with the smallest key are woken up first.
+        """
+        self.push = push
+        self.priority_key = priority_key
+        self.pools: Dict[str, ResourcePool] = {}
+        self._task_pools: Dict[str, List[ResourcePool]] = {}
+
+    def configure(self, pools: Dict[str, Dict[str, Any]]) -> None:
+        """Create the pools from their definitions, see :meth:`WorkGraph.add_resource_pool`."""
+        self.pools = {name: ResourcePool(name, **data) for name, data in pools.items()}
+        self._task_pools = {}
+
+    def get_pools(self, task) -> List[ResourcePool]:
+        """Return the pools the task belongs to."""
+        if task.name not in self._task_pools:
+            self._task_pools[task.name] = [pool for pool in self.pools.values() if pool.matches(task)]
+        return self._task_pools[task.name]
+
+    def get_full_pool(self, task) -> Optional[ResourcePool]:
+        """Return the first pool of the task without free slot, if any."""
+        for pool in self.get_pools(task):
+            if task.name not in pool.active and pool.is_full:
+                return pool
+        return None
+
+    def wait(self, pool: ResourcePool, name: str) -> bool:
+        """Add the task to the waiting queue of the pool, return False if it was already waiting."""
+        if name in pool.waiting:
+            return False
+        pool.waiting[name] = None
+        if self.priority_key is not None:
+            heapq.heappush(pool.heap, (self.priority_key(name), name))
+        return True
+
+    def acquire(self, task) -> None:
+        """Take a slot in all the pools of the task."""
+        for pool in self.get_pools(task):
+            pool.waiting.pop(task.name, None)
+            pool.active.add(task.name)
+
+    def release(self, name: str) -> None:
+        """Free the slots held by the task."""
+        for pool in self.pools.values():
+            pool.active.discard(name)
+
+    def forget(self, name: str) -> None:
+        """Remove all the references to the task, e.g. it was removed from the graph."""
+        self.release(name)
+        self.discard(name)
+        self._task_pools.pop(name, None)
+
+    def discard(self, name: str) -> None:
+        """Remove the task from the waiting queues, e.g. it was skipped or killed while waiting.
+
+        The entries of the task in the priority heaps are skipped when they are popped.
+        """
+        for pool in self.pools.values():
+            pool.waiting.pop(name, None)
+
+    def wake_up(self, is_runnable: Optional[Callable[[str], bool]] = None) -> None:
+        """Push back to the scheduler as many waiting tasks as there are free slots in their pool.
+
+        A woken task that is still blocked, e.g. by another pool, goes back to a waiting queue.
+
+        :param is_runnable: Callable checking that a waiting task can still be launched, the tasks that
+            can not, e.g. they were reset while waiting, leave the queue without taking a free slot.
+        """
+        for pool in self.pools.values():
+            free = pool.limit - len(pool.active)
+            if free <= 0 or not pool.waiting:
+                continue
+            names = []
+            for name in self._iter_waiting(pool):
+                if is_runnable is not None and not is_runnable(name):
+                    del pool.waiting[name]
+                    continue
+                names.append(name)
+                if len(names) >= free:
+                    break
+            for name in names:
+                del pool.waiting[name]
+                self.push(name)
+
+    def _iter_waiting(self, pool: ResourcePool) -> Iterator[str]:
+        """Iterate over the waiting tasks of the pool, in the order they should be woken up."""
+        if self.priority_key is None:
+            yield from list(pool.waiting)
+            return
+        seen = set()
+        while pool.heap:
+            _, name = heapq.heappop(pool.heap)
+            if name in pool.waiting and name not in seen:
+                seen.add(name)
+                yield name
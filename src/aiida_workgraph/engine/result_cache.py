@@ -0,0 +1,274 @@
+"""Reuse the results of the ``PYFUNCTION`` and ``NORMAL`` tasks that already ran with the same inputs.
+
+AiiDA caching only covers the CalcJobs and the process functions, it is not consulted for these tasks. A task
+with ``cache=True`` (see :attr:`aiida_workgraph.task.Task.cache`) is first looked up by its fingerprint: the hash
+of its executor (module path, callable name or pickled callable, and the source code of the function if it is
+available) and of its input values. The AiiDA data nodes are represented by their content hash, so equal
+values created by different workgraphs have the same fingerprint. The metadata of the task, e.g. its call link
+label, is not part of the fingerprint.
+
+If a task with the same fingerprint finished before, the task is not executed: a task running as a process
+points to the existing process node, whose outputs and provenance are reused as they are, and a task running
+inline, i.e. a ``NORMAL`` or an ephemeral ``PYFUNCTION`` task, receives a copy of the results kept in memory.
+The stored data nodes of these results are reused as they are, the other values are copied, so that the
+workgraphs do not share them. Since no process records them, the task and the workgraph which produced the
+results are reported. The lookup is configured by the ``result_cache`` key of the ``workgraph.json`` config
+file, e.g. ``{"result_cache": {"scope": "profile", "size": 1024}}``:
+
+- ``scope``: ``workgraph`` only reuses the results within the same workgraph, e.g. the iterations of a loop,
+  ``worker`` the results of all the workgraphs run by the interpreter, e.g. a daemon worker, and ``profile``
+  also the process nodes of the whole profile, which are tagged with the ``_workgraph_result_key`` extra.
+  The results of the tasks running inline are only kept in memory, for them ``profile`` is the same as
+  ``worker``: they are not reused by another daemon worker, or after a restart.
+- ``size``: the maximum number of entries of the in-memory layer, the least recently used ones are dropped.
+
+Editing the function changes its source code, and therefore the fingerprint. The cached results can also be
+discarded with :func:`clear_result_cache`, or ``workgraph task clear-cache``, which removes the extras.
+"""
+
+from __future__ import annotations
+
+import collections
+import collections.abc
+import copy
+import hashlib
+import inspect
+import typing as t
+
+from aiida import orm
+
+RESULT_KEY_EXTRA = '_workgraph_result_key'
+CACHE_SCOPES = ('workgraph', 'worker', 'profile')
+DEFAULT_CACHE_CONFIG = {'scope': 'profile', 'size': 1024}
+
+_memory_cache: t.Optional['LRUCache'] = None
+
+
+class LRUCache:
+    """A mapping holding at most ``size`` entries, the least recently used entry is dropped first."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._entries: collections.OrderedDict[str, t.Any] = collections.OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> t.Any:
+        if key not in self._entries:
+            return None
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def put(self, key: str, value: t.Any) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: str) -> t.Any:
+        return self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+def get_cache_config() -> t.Dict[str, t.Any]:
+    """Return the ``result_cache`` config, with the default values for the missing keys."""
+    from aiida_workgraph.config import load_config
+
+    config = {**DEFAULT_CACHE_CONFIG, **(load_config().get('result_cache') or {})}
+    if config['scope'] not in CACHE_SCOPES:
+        raise ValueError(f'Unknown result cache scope: {config["scope"]}, valid scopes are: {CACHE_SCOPES}')
+    return config
+
+
+def get_memory_cache() -> LRUCache:
+    """Return the in-memory layer, shared by all the workgraphs of the interpreter."""
+    global _memory_cache
+
+    if _memory_cache is None:
+        _memory_cache = LRUCache(int(get_cache_config()['size']))
+    return _memory_cache
+
+
+def clear_result_cache(key: t.Optional[str] = None) -> int:
+    """Discard the cached results, all of them or the ones of the fingerprint ``key``.
+
+    The in-memory layer of this interpreter is cleared, and the extra marking the process nodes as reusable is
+    removed. The in-memory layers of the running daemon workers are only cleared of the process nodes.
+
+    :return: The number of process nodes which are not reused anymore.
+    """
+    if _memory_cache is not None:
+        if key is None:
+            _memory_cache.clear()
+        else:
+            _memory_cache.pop(key)
+    filters = {f'extras.{RESULT_KEY_EXTRA}': key} if key is not None else {'extras': {'has_key': RESULT_KEY_EXTRA}}
+    query = orm.QueryBuilder().append(orm.ProcessNode, filters=filters)
+    count = 0
+    for (node,) in query.iterall():
+        node.base.extras.delete(RESULT_KEY_EXTRA)
+        count += 1
+    return count
+
+
+class _StoredNode(t.NamedTuple):
+    """A stored data node of cached results, it is loaded again when the results are reused."""
+
+    pk: int
+
+
+def _copy_results(value: t.Any) -> t.Any:
+    """Copy cached results, so that they are not shared between workgraphs.
+
+    The stored data nodes are kept by their pk, the unstored ones are cloned, and the other values are deep copied.
+    """
+    if isinstance(value, _StoredNode):
+        return orm.load_node(value.pk)
+    if isinstance(value, orm.Data):
+        return _StoredNode(value.pk) if value.is_stored else value.clone()
+    if isinstance(value, collections.abc.Mapping):
+        return {key: _copy_results(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy_results(item) for item in value]
+    return copy.deepcopy(value)
+
+
+class CachedResults(t.NamedTuple):
+    """The results of a task which ran inline, and the task and the workgraph which produced them."""
+
+    results: t.Dict[str, t.Any]
+    task: str
+    workgraph: str
+
+
+def _normalize(value: t.Any) -> t.Any:
+    """Replace the data nodes by their content hash, recursively."""
+    if isinstance(value, orm.Data):
+        return {'__aiida_hash__': value.base.caching.get_hash()}
+    if isinstance(value, collections.abc.Mapping):
+        return {str(key): _normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    return value
+
+
+class TaskResultCache:
+    """Fingerprint the tasks of an engine process, look up their results and record the new ones."""
+
+    def __init__(self, process):
+        """
+        :param process: The engine process.
+        """
+        self.process = process
+        self._config: t.Optional[t.Dict[str, t.Any]] = None
+        # the fingerprint of the tasks which are running, the results are recorded once they finished
+        self.pending: t.Dict[str, str] = {}
+        # the hash of the source code of the executors, indexed by the hash of the executor
+        self._sources: t.Dict[str, str] = {}
+
+    @property
+    def scope(self) -> str:
+        # the config is only loaded by the workgraphs with cached tasks
+        if self._config is None:
+            self._config = get_cache_config()
+        return self._config['scope']
+
+    def executor_source(self, task, executor_hash: str) -> str:
+        """The hash of the source code of the function of the task, empty if it is not available."""
+        from node_graph.executor import RuntimeExecutor
+        from node_graph.task_spec import BaseHandle
+
+        if executor_hash not in self._sources:
+            source = ''
+            try:
+                func = RuntimeExecutor(**task.get_executor().to_dict()).callable
+                if isinstance(func, BaseHandle) and hasattr(func, '_callable'):
+                    func = func._callable
+                if hasattr(func, 'is_process_function'):
+                    func = func.func
+                source = hashlib.sha256(inspect.getsource(func).encode()).hexdigest()
+            except (OSError, TypeError, ImportError, AttributeError):
+                pass
+            self._sources[executor_hash] = source
+        return self._sources[executor_hash]
+
+    def fingerprint(self, task, inputs: t.Dict[str, t.Any]) -> t.Optional[str]:
+        """Return the fingerprint of the task run with ``inputs``, or None if the inputs can not be hashed."""
+        from aiida.common.hashing import make_hash
+
+        kwargs = {key: value for key, value in (inputs['kwargs'] or {}).items() if key != 'metadata'}
+        try:
+            executor_hash = make_hash(task.get_executor().to_dict())
+            data = {
+                'executor': executor_hash,
+                'source': self.executor_source(task, executor_hash),
+                'kwargs': _normalize(kwargs),
+                'var_kwargs': _normalize(inputs['var_kwargs']),
+            }
+            if self.scope == 'workgraph':
+                data['workgraph'] = self.process.node.uuid
+            return make_hash(data)
+        except (ValueError, TypeError) as exception:
+            self.process.logger.warning(f'The inputs of the task {task.name} can not be hashed: {exception}')
+            return None
+
+    def runs_as_process(self, task) -> bool:
+        return task.task_type.upper() == 'PYFUNCTION' and not task.ephemeral
+
+    def lookup(self, task, key: str) -> t.Optional[t.Union[orm.ProcessNode, CachedResults]]:
+        """Return the process node or the results of a finished task with the fingerprint ``key``, if any."""
+        entry = get_memory_cache().get(key)
+        if entry is not None:
+            kind, value = entry
+            if kind == 'results':
+                return value._replace(results=_copy_results(value.results))
+            node = orm.load_node(value)
+            # the extra is removed when the cache is cleared, see `clear_result_cache`
+            if node.base.extras.get(RESULT_KEY_EXTRA, None) == key:
+                return node
+            get_memory_cache().pop(key)
+        if self.scope == 'profile' and self.runs_as_process(task):
+            query = orm.QueryBuilder().append(
+                orm.ProcessNode,
+                filters={
+                    f'extras.{RESULT_KEY_EXTRA}': key,
+                    'attributes.process_state': 'finished',
+                    'attributes.exit_status': 0,
+                },
+                project='id',
+            )
+            query.order_by({orm.ProcessNode: {'id': 'desc'}}).limit(1)
+            pks = query.all(flat=True)
+            if pks:
+                get_memory_cache().put(key, ('process', pks[0]))
+                return orm.load_node(pks[0])
+        return None
+
+    def record_submission(self, name: str, key: str) -> None:
+        """Remember the fingerprint of a task which is executed, until it finishes."""
+        self.pending[name] = key
+
+    def record_results(self, name: str, node: t.Optional[orm.ProcessNode] = None, results: t.Any = None) -> None:
+        """Keep the process node or a copy of the results of a task which finished successfully.
+
+        The process node is tagged with the fingerprint, so that it is found by the other workgraphs.
+        """
+        key = self.pending.pop(name, None)
+        if key is None:
+            return
+        if node is not None:
+            node.base.extras.set(RESULT_KEY_EXTRA, key)
+            get_memory_cache().put(key, ('process', node.pk))
+        else:
+            try:
+                cached = CachedResults(_copy_results(dict(results or {})), name, self.process.node.uuid)
+            except Exception as exception:  # pylint: disable=broad-except
+                self.process.logger.warning(f'The results of the task {name} are not cached: {exception}')
+                return
+            get_memory_cache().put(key, ('results', cached))
+
+    def discard(self, name: str) -> None:
+        self.pending.pop(name, None)
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, Set
+from aiida_workgraph.orm.workgraph import WorkGraphNode
+
+
+class RuntimeStateStore:
+    """In-memory, write-back cache of the tasks' runtime info.
+
+    The runtime info (state, action, process, ...) of every task is kept on the
+    ``WorkGraphNode`` so that it can be inspected from outside the engine. Writing
+    each item to the node means re-writing the whole dict attribute on every change,
+    therefore the engine keeps an authoritative copy in memory, records which
+    attributes were modified, and writes them back to the node in one go
+    with :meth:`flush` (at the end of every step and before every checkpoint).
+    """
+
+    # runtime key -> (node attribute key, default value)
+    ATTRIBUTES: Dict[str, tuple[str, Any]] = {
+        'state': (WorkGraphNode.TASK_STATES_KEY, ''),
+        'action': (WorkGraphNode.TASK_ACTIONS_KEY, ''),
+        'process': (WorkGraphNode.TASK_PROCESSES_KEY, None),
+        'execution_count': (WorkGraphNode.TASK_EXECUTION_COUNTS_KEY, 0),
+        'map_info': (WorkGraphNode.TASK_MAP_INFO_KEY, ''),
+        'timestamps': (WorkGraphNode.TASK_TIMESTAMPS_KEY, None),
+    }
+
+    def __init__(self, process):
+        """
+        :param process: The engine process, whose node holds the persisted runtime info.
+        """
+        self.process = process
+        self._data: Dict[str, Dict[str, Any]] | None = None
+        self._dirty: Set[str] = set()
+        # number of node attributes written by the flushes, reported to the profiler of the engine
+        self.writes = 0
+
+    @property
+    def data(self) -> Dict[str, Dict[str, Any]]:
+        """The cached runtime info, lazily loaded from the node on first access."""
+        if self._data is None:
+            self.reload()
+        return self._data
+
+    def reload(self) -> None:
+        """Discard the cache and read the runtime info from the node again."""
+        attributes = self.process.node.base.attributes
+        self._data = {key: dict(attributes.get(attr_key, None) or {}) for key, (attr_key, _) in self.ATTRIBUTES.items()}
+        self._dirty.clear()
+
+    def restore(self, data: Dict[str, Dict[str, Any]]) -> None:
+        """Replace the cache with the runtime info of a checkpoint, it is written to the node on the next flush."""
+        self._data = {key: dict(data.get(key, None) or {}) for key in self.ATTRIBUTES}
+        self._dirty = set(self.ATTRIBUTES)
+
+    def get(self, name: str, key: str) -> Any:
+        """Get the runtime info ``key`` of task ``name``."""
+        if key not in self.ATTRIBUTES:
+            raise ValueError(f'Invalid key: {key}')
+        return self.data[key].get(name, self.ATTRIBUTES[key][1])
+
+    def set(self, name: str, key: str, value: Any) -> None:
+        """Set the runtime info ``key`` of task ``name``, the node is only updated on :meth:`flush`."""
+        if key not in self.ATTRIBUTES:
+            raise ValueError(f'Invalid key: {key}')
+        values = self.data[key]
+        if name in values and values[name] == value:
+            return
+        values[name] = value
+        self._dirty.add(key)
+
+    def discard(self, name: str, keys: Iterable[str]) -> None:
+        """Remove the runtime info ``keys`` of task ``name``, e.g. the task was removed from the graph."""
+        for key in keys:
+            if name in self.data[key]:
+                del self.data[key][name]
+                self._dirty.add(key)
+
+    @property
+    def is_dirty(self) -> bool:
+        return bool(self._dirty)
+
+    def flush(self) -> None:
+        """Write all the modified runtime info to the node with a single attribute update."""
+        if not self._dirty or self._data is None:
+            return
+        attributes = {self.ATTRIBUTES[key][0]: self._data[key] for key in self._dirty}
+        self.process.node.base.attributes.set_many(attributes)
+        self.writes += len(attributes)
+        self._dirty.clear()
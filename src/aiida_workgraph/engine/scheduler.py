@@ -0,0 +1,277 @@
+from __future__ import annotations
+
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from .resource_pools import ACTIVE_STATES, ResourcePools
+
+TERMINAL_STATES = ('FINISHED', 'SKIPPED', 'FAILED')
+# states of the tasks that prevent the workgraph from finishing
+UNFINISHED_STATES = ('RUNNING', 'CREATED', 'PLANNED', 'READY')
+# states of the tasks that will never be launched again unless they are reset
+NOT_RUNNABLE_STATES = ('CREATED', 'RUNNING', 'FINISHED', 'FAILED', 'SKIPPED', 'MAPPED')
+# order in which the ready tasks are launched, see `TaskScheduler.set_priority_policy`
+PRIORITY_POLICIES = ('fifo', 'critical_path')
+
+
+class TaskScheduler:
+    """Dependency-counting scheduler of the tasks.
+
+    For each task, it keeps the number of input tasks that have not reached a terminal
+    state yet. The counters are updated on every state transition, and a task is pushed
+    to the ready queue when it could become runnable: its last input task finished, its
+    parent zone started running, or the task itself was reset. Thus, the engine only
+    looks at the newly unblocked tasks instead of scanning the whole graph on every step.
+
+    It also counts the number of tasks in each state, so that checking whether the
+    workgraph is finished does not require reading the state of every task.
+
+    The tasks blocked by a full resource pool are held in the waiting queue of the pool,
+    see :class:`~aiida_workgraph.engine.resource_pools.ResourcePools`. When some tasks have
+    to wait, the order in which the ready tasks are launched is given by the priority policy.
+
+    The scheduler only holds data derived from the task states and the connectivity,
+    thus it is rebuilt from the runtime info when the process is loaded from a checkpoint.
+    """
+
+    def __init__(self, get_state: Callable[[str], str]):
+        """
+        :param get_state: Callable returning the current state of a task.
+        """
+        self.get_state = get_state
+        self.priority_policy = 'fifo'
+        self.get_weight: Callable[[str], float] = lambda name: 1.0
+        self.resource_pools = ResourcePools(self.push, self.priority_key)
+        self._reset()
+
+    def _reset(self) -> None:
+        self._built = False
+        # number of input tasks that are not in a terminal state
+        self._pending: Dict[str, int] = {}
+        # input task -> insertion ordered set of the tasks that wait on it
+        self._dependents: Dict[str, Dict[str, None]] = {}
+        self._input_tasks: Dict[str, List[str]] = {}
+        # running input task -> tasks that may start before it finishes, see `release_dependent`
+        self._released: Dict[str, Dict[str, None]] = {}
+        # zone -> insertion ordered set of the tasks inside the zone
+        self._zone_children: Dict[str, Dict[str, None]] = {}
+        self._parent: Dict[str, Optional[str]] = {}
+        # position of the task in the graph, used to launch ready tasks in a stable order
+        self._order: Dict[str, int] = {}
+        self._next_order = 0
+        # launched task -> its labels in `ctx._executed_tasks`, i.e. the name or "name.*"
+        self._executed: Dict[str, Set[str]] = {}
+        # insertion ordered set of tasks to check
+        self._queue: Dict[str, None] = {}
+        # number of registered tasks in each state
+        self._state_counts: Counter = Counter()
+        # length of the longest path from the task to the end of the graph, see `get_rank`
+        self._ranks: Dict[str, float] = {}
+
+    @property
+    def is_built(self) -> bool:
+        return self._built
+
+    def build(
+        self,
+        tasks: Iterable[Tuple[str, Optional[str], List[str]]],
+        executed: Iterable[str] = (),
+    ) -> None:
+        """Build the counters and seed the ready queue.
+
+        :param tasks: (name, parent name, input task names) of every task in the graph.
+        :param executed: labels of the tasks that were already launched, see :meth:`mark_executed`.
+        """
+        self._reset()
+        for label in executed:
+            self.mark_executed(label)
+        self._built = True
+        for name, parent, input_tasks in tasks:
+            self.register_task(name, parent, input_tasks)
+
+    def register_task(self, name: str, parent: Optional[str], input_tasks: List[str]) -> None:
+        """Add a task, e.g. a newly mapped task, to the scheduler."""
+        if name not in self._order:
+            self._order[name] = self._next_order
+            self._next_order += 1
+            self._state_counts[self.get_state(name)] += 1
+        # the new task may extend the paths of its input tasks
+        self._ranks.clear()
+        self._parent[name] = parent
+        if parent is not None:
+            self._zone_children.setdefault(parent, {})[name] = None
+        self._input_tasks[name] = list(input_tasks)
+        pending = 0
+        for input_task in input_tasks:
+            self._dependents.setdefault(input_task, {})[name] = None
+            if self.get_state(input_task) not in TERMINAL_STATES and name not in self._released.get(input_task, {}):
+                pending += 1
+        self._pending[name] = pending
+        self.push(name)
+
+    def unregister_task(self, name: str) -> None:
+        """Remove a task, e.g. a mapped task whose results were gathered, from the scheduler."""
+        if name not in self._order:
+            return
+        del self._order[name]
+        self._state_counts[self.get_state(name)] -= 1
+        parent = self._parent.pop(name, None)
+        if parent is not None:
+            self._zone_children.get(parent, {}).pop(name, None)
+        for input_task in self._input_tasks.pop(name, ()):
+            self._dependents.get(input_task, {}).pop(name, None)
+            self._released.get(input_task, {}).pop(name, None)
+        self._dependents.pop(name, None)
+        self._released.pop(name, None)
+        self._zone_children.pop(name, None)
+        self._pending.pop(name, None)
+        self._executed.pop(name, None)
+        self._queue.pop(name, None)
+        self._ranks.pop(name, None)
+        self.resource_pools.forget(name)
+
+    def on_state_changed(self, name: str, old_state: str, new_state: str) -> None:
+        """Update the counters after the state of a task changed."""
+        if not self._built or old_state == new_state:
+            return
+        if name in self._order:
+            self._state_counts[old_state] -= 1
+            self._state_counts[new_state] += 1
+        if new_state not in ACTIVE_STATES:
+            self.resource_pools.release(name)
+        if new_state in NOT_RUNNABLE_STATES:
+            self.resource_pools.discard(name)
+        was_terminal = old_state in TERMINAL_STATES
+        is_terminal = new_state in TERMINAL_STATES
+        # the released tasks do not wait on the task anymore, unless it is reset before it finishes
+        released = self._released.pop(name, {})
+        if not is_terminal:
+            for dependent in released:
+                self._pending[dependent] += 1
+        if was_terminal != is_terminal:
+            delta = -1 if is_terminal else 1
+            for dependent in self._dependents.get(name, ()):
+                if dependent in released:
+                    continue
+                self._pending[dependent] += delta
+                if self._pending[dependent] == 0:
+                    self.push(dependent)
+        if new_state == 'RUNNING':
+            for child in self._zone_children.get(name, ()):
+                self.push(child)
+        if new_state not in NOT_RUNNABLE_STATES:
+            self.push(name)
+
+    def release_dependent(self, name: str, dependent: str) -> None:
+        """Let a task start before its running input task reaches a terminal state.
+
+        E.g. the tasks reading the streamed results of a running MAP task. The dependency is
+        restored if the input task is reset before it finishes.
+        """
+        if self.get_state(name) != 'RUNNING' or name not in self._input_tasks.get(dependent, ()):
+            return
+        if dependent in self._released.get(name, {}):
+            return
+        self._released.setdefault(name, {})[dependent] = None
+        self._pending[dependent] -= 1
+        if self._pending[dependent] == 0:
+            self.push(dependent)
+
+    def set_priority_policy(self, policy: str, get_weight: Optional[Callable[[str], float]] = None) -> None:
+        """Set the order in which the ready tasks are launched.
+
+        - ``fifo``: the order of the tasks in the graph.
+        - ``critical_path``: the tasks with the longest remaining path to the end of the graph first,
+          where the length of a path is the sum of the weights (e.g. expected durations) of its tasks.
+
+        :param policy: One of :data:`PRIORITY_POLICIES`.
+        :param get_weight: Callable returning the weight of a task, 1 by default.
+        """
+        if policy not in PRIORITY_POLICIES:
+            raise ValueError(f'Unknown priority policy: {policy}, valid policies are: {PRIORITY_POLICIES}')
+        self.priority_policy = policy
+        self.get_weight = get_weight or (lambda name: 1.0)
+        self._ranks.clear()
+
+    def get_rank(self, name: str) -> float:
+        """Return the length of the longest path from the task to the end of the graph.
+
+        The tasks waiting on a task and the tasks inside a zone are downstream of it.
+        The ranks are computed iteratively and cached until a new task is registered.
+        """
+        if name in self._ranks:
+            return self._ranks[name]
+        stack = [(name, False)]
+        visiting = set()
+        while stack:
+            current, expanded = stack.pop()
+            if current in self._ranks:
+                continue
+            downstream = [*self._dependents.get(current, ()), *self._zone_children.get(current, ())]
+            if not expanded:
+                visiting.add(current)
+                stack.append((current, True))
+                # a task already being visited closes a cycle, its rank is not added
+                stack.extend((task, False) for task in downstream if task not in self._ranks and task not in visiting)
+                continue
+            visiting.discard(current)
+            rank = max((self._ranks.get(task, 0.0) for task in downstream), default=0.0)
+            self._ranks[current] = self.get_weight(current) + rank
+        return self._ranks[name]
+
+    def priority_key(self, name: str) -> Tuple[float, int]:
+        """Sort key of the ready tasks, the smallest is launched first."""
+        order = self._order.get(name, len(self._order))
+        if self.priority_policy == 'critical_path':
+            return (-self.get_rank(name), order)
+        return (0.0, order)
+
+    def count(self, *states: str) -> int:
+        """Return the number of tasks in any of the given states."""
+        return sum(self._state_counts[state] for state in states)
+
+    def tasks_in_state(self, state: str) -> List[str]:
+        """Return the names of the tasks in the given state, in the order of the graph."""
+        return [name for name in self._order if self.get_state(name) == state]
+
+    def mark_executed(self, label: str) -> None:
+        """Mark a task as launched, the label is the name of the task, or "name.*" for a part of it."""
+        self._executed.setdefault(label.split('.')[0], set()).add(label)
+
+    def unmark_executed(self, name: str) -> Set[str]:
+        """Mark a task as not launched, and return all its labels."""
+        labels = self._executed.pop(name, set())
+        if labels:
+            self.push(name)
+        return labels
+
+    def is_executed(self, name: str) -> bool:
+        return name in self._executed
+
+    def push(self, name: str) -> None:
+        """Queue a task to be checked on the next call of :meth:`pop_ready`."""
+        self._queue[name] = None
+
+    def is_task_ready_to_run(self, name: str) -> Tuple[bool, List[bool]]:
+        """Check if all the input tasks are done, and the parent zone (if any) is running."""
+        states = [self._pending.get(name, 1) == 0, True]
+        parent = self._parent.get(name)
+        if parent is not None and self.get_state(parent) != 'RUNNING':
+            states[1] = False
+        return all(states), states
+
+    def is_runnable(self, name: str) -> bool:
+        """Check if the task is ready and has not been launched yet."""
+        if name in self._executed or self.get_state(name) in NOT_RUNNABLE_STATES:
+            return False
+        return self.is_task_ready_to_run(name)[0]
+
+    def pop_ready(self) -> List[str]:
+        """Empty the queue and return the runnable tasks in the order of the priority policy.
+
+        The tasks that are not runnable are dropped, they are queued again by the
+        state transition that unblocks them.
+        """
+        self.resource_pools.wake_up(self.is_runnable)
+        names = sorted(self._queue, key=self.priority_key)
+        self._queue.clear()
+        return [name for name in names if self.is_runnable(name)]
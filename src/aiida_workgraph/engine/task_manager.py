@@ -1,18 +1,43 @@
 from __future__ import annotations
 
+from dataclasses import replace
 from typing import Any, Dict, List, Optional, Tuple
 from aiida_workgraph.task import Task
 from aiida_workgraph.socket import TaskSocketNamespace
-from aiida_workgraph.utils import get_nested_dict
+from aiida_workgraph.utils import get_nested_dict, to_raw_python_data
 from aiida.engine.processes.exit_code import ExitCode
-from .task_state import TaskStateManager
+from .task_state import TaskStateManager, has_raw_values
 from .task_actions import TaskActionManager
 from .awaitable_manager import AwaitableManager
+from .scheduler import TaskScheduler, TERMINAL_STATES, UNFINISHED_STATES
+from .resource_pools import ACTIVE_STATES
 import traceback
 from node_graph.link import TaskLink
+from aiida import orm
 from aiida.engine.processes import Process
+from aiida_pythonjob.data.deserializer import deserialize_to_raw_python_data
+from aiida_pythonjob.data.serializer import general_serializer
 
 MAX_NUMBER_AWAITABLES_MSG = 'The maximum number of subprocesses has been reached: {}. Cannot launch the job: {}.'
+RESOURCE_POOL_FULL_MSG = 'The resource pool {} is full: {}. Cannot launch the job: {}.'
+# name of the resource pool enforcing `WorkGraph.max_number_jobs`
+MAX_NUMBER_JOBS_POOL = 'max_number_jobs'
+# the tasks launching an AiiDA process whose inputs must be data nodes, the PyFunction and PythonJob
+# tasks serialize the raw Python data themselves
+PROCESS_INPUT_TASK_TYPES = ('CALCJOB', 'WORKCHAIN', 'CALCFUNCTION', 'WORKFUNCTION', 'SHELLJOB', 'GRAPH', 'SUBGRAPH')
+
+# the tasks whose results can be reused, see `Task.cache`
+CACHEABLE_TASK_TYPES = ('PYFUNCTION', 'NORMAL')
+
+
+def copy_containers(value: Any) -> Any:
+    """Copy the dicts and lists of the value recursively, the other objects, e.g. the AiiDA nodes, are shared."""
+    if isinstance(value, dict):
+        return {key: copy_containers(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [copy_containers(item) for item in value]
+    return value
+
 
 process_task_types = [
     'CALCJOB',
@@ -42,8 +67,11 @@ class TaskManager:
         self.process = process
         self.awaitable_manager = awaitable_manager
         # Sub-managers
-        self.state_manager = TaskStateManager(ctx_manager, logger, process, awaitable_manager)
+        self.scheduler = TaskScheduler(lambda name: process.runtime_state.get(name, 'state'))
+        self.state_manager = TaskStateManager(ctx_manager, logger, process, awaitable_manager, self.scheduler)
         self.action_manager = TaskActionManager(self.state_manager, logger, process)
+        # serialized data of the template tasks, see `get_template_data`
+        self._template_data: Dict[str, Dict[str, Any]] = {}
 
     def get_task(self, name: str):
         """Get task from the context."""
@@ -71,73 +99,139 @@ class TaskManager:
                 self.state_manager.reset_task(task.name)
             self.state_manager.update_task_state(task.name)
 
+    def build_scheduler(self) -> None:
+        """Build the dependency counters of the scheduler from the connectivity of the graph."""
+        wg = self.process.wg
+        self.scheduler.build(
+            (
+                (
+                    task.name,
+                    task.parent.name if task.parent else None,
+                    wg.connectivity['zone'][task.name]['input_tasks'],
+                )
+                for task in wg.tasks
+            ),
+            executed=self.ctx._executed_tasks,
+        )
+        self.scheduler.set_priority_policy(wg.priority_policy, self.get_task_weight)
+        self.build_resource_pools()
+        self.restore_map_items()
+        self.restore_reduce_partials()
+        # the mapped tasks may have finished before the checkpoint, check all the templates once
+        self.state_manager.templates_to_update.update(self.scheduler.tasks_in_state('MAPPED'))
+
+    def restore_map_items(self) -> None:
+        """Map again the expanded items that were not released, the mapped tasks are not persisted.
+
+        The states and results of the mapped tasks are persisted, thus the number of running
+        items of each MAP task is counted again from them. The tasks reading an opened stream
+        are released again, since the scheduler is rebuilt from the states.
+        """
+        for name, prefixes in list(self.map_expanded.items()):
+            task = self.process.wg.tasks[name]
+            for prefix in prefixes:
+                new_tasks, _ = self.generate_mapped_tasks(task, prefix, restore=True)
+                self.state_manager.track_map_item(name, prefix, [new_task.name for new_task in new_tasks.values()])
+            if name in self.map_pending:
+                self.state_manager.maps_to_expand.add(name)
+            # the consumers of an opened stream are not waiting on the MAP task
+            if 'stream' in self.ctx._task_results.get(name, {}):
+                self.state_manager.release_stream_consumers(name)
+            self.state_manager.release_reduce_consumers(name)
+
+    def reset_offloaded_tasks(self) -> List[str]:
+        """Reset the normal tasks that were running in an executor, their futures are lost with the process."""
+        names = [
+            name
+            for name in self.scheduler.tasks_in_state('RUNNING')
+            if self.process.wg.tasks[name].task_type.upper() == 'NORMAL'
+        ]
+        for name in names:
+            self.state_manager.reset_task(name, recursive=False)
+        return names
+
+    def get_task_weight(self, name: str) -> float:
+        """Return the weight of a task for the priority policy, the mapped tasks use the weight of their template."""
+        weights = self.process.wg.task_weights
+        if name not in weights and name in self.process.wg.tasks:
+            map_data = self.process.wg.tasks[name].map_data
+            if map_data:
+                return weights.get(map_data['parent'], 1.0)
+        return weights.get(name, 1.0)
+
+    def build_resource_pools(self) -> None:
+        """Create the resource pools declared on the workgraph.
+
+        `max_number_jobs` is a pool of all the tasks launching a process. The tasks that were
+        launched before the process was checkpointed take their slots again.
+        """
+        wg = self.process.wg
+        pools = {MAX_NUMBER_JOBS_POOL: {'limit': wg.max_number_jobs, 'task_types': process_task_types}}
+        pools.update(wg.resource_pools)
+        self.scheduler.resource_pools.configure(pools)
+        for task in wg.tasks:
+            if self.scheduler.is_executed(task.name) and self.scheduler.get_state(task.name) in ACTIVE_STATES:
+                self.scheduler.resource_pools.acquire(task)
+
     def is_workgraph_finished(self) -> bool:
         """Check if the workgraph is finished.
-        For `while` workgraph, we need check its conditions"""
-        is_finished = True
-        failed_tasks = []
-        not_finished_tasks = []
-        for task in self.process.wg.tasks:
-            # if the task is in mapped state, we need to check its children (mapped tasks)
-            if self.state_manager.get_task_runtime_info(task.name, 'state') in ['MAPPED']:
-                self.state_manager.update_template_task_state(task.name)
-            elif self.state_manager.get_task_runtime_info(task.name, 'state') in [
-                'RUNNING',
-                'CREATED',
-                'PLANNED',
-                'READY',
-            ]:
-                not_finished_tasks.append(task.name)
-                is_finished = False
-            elif self.state_manager.get_task_runtime_info(task.name, 'state') == 'FAILED':
-                failed_tasks.append(task.name)
-        if is_finished and len(failed_tasks) > 0:
-            message = f'WorkGraph finished, but tasks: {failed_tasks} failed. Thus all their child tasks are skipped.'
-            self.process.report(message)
-            result = ExitCode(302, message)
-        else:
-            result = None
-        # print("not_finished_tasks: ", not_finished_tasks)
+        For `while` workgraph, we need check its conditions.
+        The number of tasks in each state is tracked by the scheduler, so this does not
+        loop over all the tasks, only the failed tasks are collected once finished."""
+        # if the mapped tasks of a template changed, we need to check the template state,
+        # a finished template can in turn finish the template it is mapped in
+        templates = self.state_manager.pop_templates_to_update()
+        while templates:
+            for name in templates:
+                if self.state_manager.get_task_runtime_info(name, 'state') == 'MAPPED':
+                    self.state_manager.update_template_task_state(name)
+            templates = self.state_manager.pop_templates_to_update()
+        is_finished = self.scheduler.count(*UNFINISHED_STATES) == 0
+        result = None
+        if is_finished:
+            failed_tasks = self.get_failed_tasks()
+            if failed_tasks:
+                message = (
+                    f'WorkGraph finished, but tasks: {failed_tasks} failed. Thus all their child tasks are skipped.'
+                )
+                self.process.report(message)
+                result = ExitCode(302, message)
         return is_finished, result
 
+    def get_failed_tasks(self) -> List[str]:
+        """Return the names of the failed tasks."""
+        return self.scheduler.tasks_in_state('FAILED')
+
     def continue_workgraph(self) -> None:
         """
         Resume the WorkGraph by looking for tasks that are ready to run.
         """
         # self.process.report("Continue workgraph.")
-        task_to_run = []
-        for task in self.process.wg.tasks:
-            # update task state
-            if (
-                self.state_manager.get_task_runtime_info(task.name, 'state')
-                in [
-                    'CREATED',
-                    'RUNNING',
-                    'FINISHED',
-                    'FAILED',
-                    'SKIPPED',
-                    'MAPPED',
-                ]
-                or task.name in self.ctx._executed_tasks
-            ):
-                continue
-            ready, _ = self.state_manager.is_task_ready_to_run(task.name)
-            if ready:
-                task_to_run.append(task.name)
-        #
-        self.process.report('tasks ready to run: {}'.format(','.join(task_to_run)))
-        self.run_tasks(task_to_run)
+        with self.process.profiler.section('continue_workgraph'):
+            self.expand_map_zones()
+            self.update_reduce_tasks()
+            task_to_run = self.scheduler.pop_ready()
+            self.process.profiler.count('tasks_scanned', len(task_to_run))
+            #
+            self.process.report('tasks ready to run: {}'.format(','.join(task_to_run)))
+            self.run_tasks(task_to_run)
 
     def should_run_task(self, task: 'Task') -> bool:
         """Check if the task should run."""
         name = task.name
-        # skip if the max number of awaitables is reached
-        if task.task_type.upper() in process_task_types:
-            if len(self.process._awaitables) >= self.process.wg.max_number_jobs:
-                self.process.report(MAX_NUMBER_AWAITABLES_MSG.format(self.process.wg.max_number_jobs, name))
-                return False
         # skip if the task is already executed or if the task is in a skippped state
-        if name in self.ctx._executed_tasks or self.state_manager.get_task_runtime_info(name, 'state') in ['SKIPPED']:
+        if self.scheduler.is_executed(name) or self.state_manager.get_task_runtime_info(name, 'state') in ['SKIPPED']:
+            return False
+        # the task is ready, if it waits in a full resource pool, the time it was first ready is kept
+        self.state_manager.record_task_timestamp(name, 'ready', overwrite=False)
+        # wait if one of the resource pools of the task is full, the task is checked again once a slot is free
+        pool = self.scheduler.resource_pools.get_full_pool(task)
+        if pool is not None:
+            if self.scheduler.resource_pools.wait(pool, name):
+                if pool.name == MAX_NUMBER_JOBS_POOL:
+                    self.process.report(MAX_NUMBER_AWAITABLES_MSG.format(pool.limit, name))
+                else:
+                    self.process.report(RESOURCE_POOL_FULL_MSG.format(pool.name, pool.limit, name))
             return False
         return True
 
@@ -147,55 +241,97 @@ class TaskManager:
         WorkGraph, PythonJob, ShellJob, While, If, Zone, GetContext, SetContext, Normal.
 
         """
-        for name in names:
-            # skip if the max number of awaitables is reached
-            task = self.process.wg.tasks[name]
-            task.action = self.state_manager.get_task_runtime_info(name, 'action')
-            if not self.should_run_task(task):
-                continue
+        with self.process.profiler.section('run_tasks'):
+            for name in names:
+                self.run_task(name, continue_workgraph)
+
+    def run_task(self, name: str, continue_workgraph: bool = True) -> None:
+        """Run a task, unless it was already executed, or it waits for a slot of a resource pool."""
+        # skip if the max number of awaitables is reached
+        task = self.process.wg.tasks[name]
+        task.action = self.state_manager.get_task_runtime_info(name, 'action')
+        if not self.should_run_task(task):
+            return
 
-            self.ctx._executed_tasks.append(name)
-            # print("-" * 60)
+        self.ctx._executed_tasks[name] = None
+        self.scheduler.mark_executed(name)
+        self.scheduler.resource_pools.acquire(task)
+        self.state_manager.record_task_timestamp(name, 'submitted')
+        self.process.profiler.count('tasks_launched')
+        # print("-" * 60)
 
-            self.logger.info(f'Run task: {name}, type: {task.task_type}')
+        self.logger.info(f'Run task: {name}, type: {task.task_type}')
+        with self.process.profiler.section('get_inputs'):
             inputs = self.get_inputs(name)
-            # print("kwargs: ", inputs["kwargs"])
-            self.ctx._task_results[task.name] = {}
-            task_type = task.task_type.upper()
-            if task_type == 'PYFUNCTION':
-                if task.spec.metadata.get('is_coroutine', False):
-                    self.execute_process_task(task, **inputs)
-                else:
-                    self.execute_function_task(task, continue_workgraph, **inputs)
-            elif task_type in ['CALCFUNCTION', 'WORKFUNCTION']:
-                self.execute_function_task(task, continue_workgraph, **inputs)
-            elif task_type in [
-                'CALCJOB',
-                'WORKCHAIN',
-                'SHELLJOB',
-                'PYTHONJOB',
-                'SUBGRAPH',
-                'GRAPH',
-                'MONITOR',
-            ]:
+        # print("kwargs: ", inputs["kwargs"])
+        self.ctx._task_results[task.name] = {}
+        task_type = task.task_type.upper()
+        if task.cache and task_type in CACHEABLE_TASK_TYPES:
+            key = self.state_manager.result_cache.fingerprint(task, inputs)
+            if key is not None:
+                if self.reuse_cached_result(task, key):
+                    if continue_workgraph:
+                        self.continue_workgraph()
+                    return
+                self.state_manager.result_cache.record_submission(name, key)
+        if task_type == 'PYFUNCTION':
+            # the async functions and the functions running in an executor are awaited as child processes
+            if task.ephemeral:
+                self.execute_ephemeral_task(task, continue_workgraph, **inputs)
+            elif task.spec.metadata.get('is_coroutine', False) or task.executor_mode:
                 self.execute_process_task(task, **inputs)
-            elif task_type == 'WHILE':
-                self.execute_while_task(task)
-            elif task_type == 'IF':
-                self.execute_if_task(task)
-            elif task_type == 'ZONE':
-                self.execute_zone_task(task)
-            elif task_type == 'MAP':
-                self.execute_map_task(task, inputs['kwargs'])
-            elif task_type == 'NORMAL':
-                self.execute_normal_task(
-                    task,
-                    continue_workgraph,
-                    **inputs,
-                )
             else:
-                self.process.report(f'Unknown task type {task_type}')
-                self.state_manager.set_task_runtime_info(name, 'state', 'FAILED')
+                self.execute_function_task(task, continue_workgraph, **inputs)
+        elif task_type in ['CALCFUNCTION', 'WORKFUNCTION']:
+            self.execute_function_task(task, continue_workgraph, **inputs)
+        elif task_type in [
+            'CALCJOB',
+            'WORKCHAIN',
+            'SHELLJOB',
+            'PYTHONJOB',
+            'SUBGRAPH',
+            'GRAPH',
+            'MONITOR',
+        ]:
+            self.execute_process_task(task, **inputs)
+        elif task_type == 'WHILE':
+            self.execute_while_task(task)
+        elif task_type == 'IF':
+            self.execute_if_task(task)
+        elif task_type == 'ZONE':
+            self.execute_zone_task(task)
+        elif task_type == 'MAP':
+            self.execute_map_task(task, inputs['kwargs'])
+        elif task_type == 'REDUCE':
+            self.execute_reduce_task(task, inputs['kwargs'])
+        elif task_type == 'NORMAL':
+            self.execute_normal_task(
+                task,
+                continue_workgraph,
+                **inputs,
+            )
+        else:
+            self.process.report(f'Unknown task type {task_type}')
+            self.state_manager.set_task_runtime_info(name, 'state', 'FAILED')
+
+    def reuse_cached_result(self, task, key: str) -> bool:
+        """Finish the task with the results of a previous run with the same fingerprint, if there is one."""
+        cached = self.state_manager.result_cache.lookup(task, key)
+        if cached is None:
+            return False
+        # the task finishes as soon as it is submitted
+        self.state_manager.record_task_timestamp(task.name, 'finished')
+        if isinstance(cached, orm.ProcessNode):
+            self.process.report(f'Task: {task.name} reuses the results of the process {cached.pk}.')
+            self.state_manager.set_task_runtime_info(task.name, 'process', cached)
+            self.state_manager.update_task_state(task.name)
+        else:
+            self.process.report(
+                f'Task: {task.name} reuses the results of the task {cached.task} of the workgraph {cached.workgraph}.'
+            )
+            self.state_manager.update_normal_task_state(task.name, cached.results)
+        self.process.profiler.count('tasks_cached')
+        return True
 
     def execute_function_task(self, task, continue_workgraph=None, args=None, kwargs=None, var_kwargs=None):
         """Execute a CalcFunction or WorkFunction task."""
@@ -208,27 +344,42 @@ class TaskManager:
             error_traceback = traceback.format_exc()  # Capture the full traceback
             self.logger.error(f'Error in task {task.name}: {e}\n{error_traceback}')
             self.state_manager.update_task_state(task.name, success=False)
+        # the process node of the function is created, it must not run again after a crash
+        self.process.save_child_checkpoint()
         # exclude the current tasks from the next run
         if continue_workgraph:
             self.continue_workgraph()
 
+    def execute_ephemeral_task(self, task, continue_workgraph=None, args=None, kwargs=None, var_kwargs=None):
+        """Execute an ephemeral PyFunction task: call the function without a process, see `Task.ephemeral`."""
+        try:
+            results = task.execute_ephemeral(args, kwargs, var_kwargs)
+            self.state_manager.update_normal_task_state(task.name, results)
+        except Exception as e:
+            error_traceback = traceback.format_exc()
+            self.logger.error(f'Error in task {task.name}: {e}\n{error_traceback}')
+            self.state_manager.update_normal_task_state(task.name, results=None, success=False)
+        if continue_workgraph:
+            self.continue_workgraph()
+
     def execute_process_task(self, task, args=None, kwargs=None, var_kwargs=None):
         """Execute a CalcJob or WorkChain task."""
         try:
-            process, state = task.execute(
-                engine_process=self.process,
-                args=args,
-                kwargs=kwargs,
-                var_kwargs=var_kwargs,
-            )
+            with self.process.profiler.section('submit'):
+                process, state = task.execute(
+                    engine_process=self.process,
+                    args=args,
+                    kwargs=kwargs,
+                    var_kwargs=var_kwargs,
+                )
             self.state_manager.set_task_runtime_info(task.name, 'state', state)
             self.state_manager.set_task_runtime_info(task.name, 'action', '')
             self.state_manager.set_task_runtime_info(task.name, 'process', process)
             # update the parent task state of mappped tasks
             if self.process.wg.tasks[task.name].map_data:
                 parent_task_name = self.process.wg.tasks[task.name].map_data['parent']
-                if self.process.node.get_task_state(parent_task_name) == 'PLANNED':
-                    self.process.node.set_task_state(parent_task_name, state)
+                if self.state_manager.get_task_runtime_info(parent_task_name, 'state') == 'PLANNED':
+                    self.state_manager.set_task_runtime_info(parent_task_name, 'state', state)
             self.awaitable_manager.to_context(**{task.name: process})
         except Exception as e:
             error_traceback = traceback.format_exc()  # Capture the full traceback
@@ -286,24 +437,47 @@ class TaskManager:
 
     def execute_map_task(self, task, kwargs):
         """
-        1. Clone the subgraph tasks for each item in `source`.
+        1. Clone the subgraph tasks for the first items in `source`, see `expand_map_items`.
         2. Mark this MAP node as running and schedule a continuation.
         """
         name = task.name
         # we also store the links, so that we can load it in the GUI
         map_info = {'prefix': [], 'children': [], 'links': []}
+        self.map_expanded[name] = {}
+        self.state_manager.map_gathered.pop(name, None)
+        self.state_manager.map_streams.pop(name, None)
         if self.state_manager.are_childen_finished(name)[0]:
             self.state_manager.update_zone_task_state(name)
         else:
             self.state_manager.set_task_runtime_info(name, 'state', 'RUNNING')
-            item_task = [child for child in task.children if child.identifier == 'workgraph.map_item'][0]
+            self.state_manager.release_reduce_consumers(name)
             source = kwargs['source']
+            chunk_size = kwargs.get('chunk_size') or 0
+            if isinstance(chunk_size, orm.Data):
+                chunk_size = chunk_size.value
+            batch_size = kwargs.get('batch_size') or 0
+            if isinstance(batch_size, orm.Data):
+                batch_size = batch_size.value
+            stream_size = kwargs.get('stream_size') or 0
+            if isinstance(stream_size, orm.Data):
+                stream_size = stream_size.value
             map_info['prefix'] = list(source.keys())
-            for prefix, value in source.items():
-                new_tasks, new_links = self.generate_mapped_tasks(task, prefix=prefix)
-                self.update_map_item_task_state(item_task, prefix, value)
-            map_info['children'] = list(new_tasks.keys())
-            map_info['links'] = new_links
+            if stream_size:
+                stream_keys = map_info['prefix'][:stream_size]
+                self.state_manager.map_streams[name] = {'keys': stream_keys, 'missing': dict.fromkeys(stream_keys)}
+            # the items that are not expanded yet, they are persisted with the context
+            self.map_pending[name] = {
+                'chunk_size': chunk_size,
+                'source': source,
+                'keys': map_info['prefix'],
+                'next': 0,
+            }
+            self.process.track_unstored_nodes(source)
+            if batch_size:
+                map_info['batches'] = self.get_map_batches(map_info['prefix'], batch_size)
+                self.map_pending[name]['batches'] = map_info['batches']
+                self.map_pending[name]['keys'] = list(map_info['batches'].keys())
+            map_info['children'], map_info['links'] = self.expand_map_items(name)
         self.state_manager.set_task_runtime_info(name, 'map_info', map_info)
         # gather task finishes immediately
         gather_task = task.gather_item_task
@@ -311,6 +485,324 @@ class TaskManager:
 
         self.continue_workgraph()
 
+    @staticmethod
+    def get_map_batches(keys: List[str], batch_size: int) -> Dict[str, List[str]]:
+        """Group the keys of the items in batches, each batch is mapped as a single item."""
+        return {f'batch{i // batch_size}': keys[i : i + batch_size] for i in range(0, len(keys), batch_size)}
+
+    @staticmethod
+    def get_batch_value(source: Dict[str, Any], keys: List[str]) -> orm.Data:
+        """Return the values of the items of a batch, as a single data node holding their list.
+
+        The tasks of the zone receive the list of the values of the batch. The node is stored,
+        so that only a reference to it is kept in the results, as for the values of the items.
+        """
+        values = [
+            deserialize_to_raw_python_data(source[key]) if isinstance(source[key], orm.Data) else source[key]
+            for key in keys
+        ]
+        return general_serializer(values)
+
+    @property
+    def map_pending(self) -> Dict[str, Dict[str, Any]]:
+        """The source items of the MAP tasks that are not expanded yet, indexed by the name of the MAP task."""
+        if '_map_pending' not in self.ctx:
+            self.ctx._map_pending = {}
+        return self.ctx._map_pending
+
+    @property
+    def map_expanded(self) -> Dict[str, Dict[str, None]]:
+        """The expanded items of the MAP tasks whose tasks are not released yet, see `release_map_item`.
+
+        MAP task -> insertion ordered set of the prefixes of the items. It is persisted with the context,
+        so that the mapped tasks can be built again when the process is loaded from a checkpoint.
+        """
+        if '_map_expanded' not in self.ctx:
+            self.ctx._map_expanded = {}
+        return self.ctx._map_expanded
+
+    def expand_map_items(self, name: str) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """Clone the subgraph of the MAP task for its next items.
+
+        With a `chunk_size`, only `chunk_size` items are expanded at the same time, the next ones are
+        expanded once the earlier items are finished, so that the number of tasks waiting to run does not
+        depend on the number of items. Otherwise, all the items are expanded at once.
+
+        :return: the names of the cloned tasks and the links of the last expanded item.
+        """
+        pending = self.map_pending[name]
+        task = self.process.wg.tasks[name]
+        item_task = [child for child in task.children if child.identifier == 'workgraph.map_item'][0]
+        keys = pending['keys']
+        window = pending['chunk_size'] or len(keys)
+        new_tasks, new_links = {}, []
+        while pending['next'] < len(keys) and self.state_manager.count_map_items(name) < window:
+            prefix = keys[pending['next']]
+            pending['next'] += 1
+            new_tasks, new_links = self.generate_mapped_tasks(task, prefix=prefix)
+            self.map_expanded.setdefault(name, {})[prefix] = None
+            self.state_manager.track_map_item(name, prefix, [new_task.name for new_task in new_tasks.values()])
+            if 'batches' in pending:
+                batch_keys = pending['batches'][prefix]
+                value = self.get_batch_value(pending['source'], batch_keys)
+                self.update_map_item_task_state(item_task, prefix, value, key=batch_keys)
+            else:
+                self.update_map_item_task_state(item_task, prefix, pending['source'][prefix])
+        if pending['next'] == len(keys):
+            del self.map_pending[name]
+        return list(new_tasks.keys()), new_links
+
+    def expand_map_zones(self) -> None:
+        """Release the finished items, and expand the next items of the MAP tasks whose running items changed."""
+        for name, prefix in self.state_manager.pop_finished_map_items():
+            self.release_map_item(name, prefix)
+        for name in self.state_manager.pop_maps_to_expand():
+            if name in self.map_pending:
+                self.expand_map_items(name)
+
+    def release_map_item(self, name: str, prefix: str) -> None:
+        """Gather the results of a finished item of the MAP task `name`, and remove the tasks of the item.
+
+        Thus, the memory held by the mapped tasks does not grow with the number of items. The runtime
+        info needed to inspect the tasks (state, process) is kept on the node. An item with a failed
+        task, or whose results can not be gathered, is kept until the MAP task finishes.
+        """
+        if prefix not in self.map_expanded.get(name, {}):
+            return
+        names = [f'{prefix}_{child}' for child in self.get_all_children(name)]
+        if any(
+            self.state_manager.get_task_runtime_info(child, 'state') not in ('FINISHED', 'SKIPPED') for child in names
+        ):
+            return
+        gather_task = self.process.wg.tasks[name].gather_item_task
+        if self.state_manager.get_task_runtime_info(gather_task.mapped_tasks[prefix].name, 'state') != 'FINISHED':
+            return
+        try:
+            self.state_manager.gather_map_item(name, prefix)
+        except ValueError:
+            # reported when the MAP task finishes
+            return
+        for child in names:
+            self.remove_mapped_task(child)
+        del self.map_expanded[name][prefix]
+
+    def remove_mapped_task(self, name: str) -> None:
+        """Remove a mapped task from the graph, the scheduler and the context."""
+        wg = self.process.wg
+        task = wg.tasks[name]
+        for link in list(task.inputs._all_links):
+            del wg.links[link.name]
+        wg.tasks[task.map_data['parent']].mapped_tasks.pop(task.map_data['prefix'], None)
+        self.state_manager.untrack_mapped_task(name)
+        wg.connectivity['child_node'].pop(name, None)
+        wg.connectivity['zone'].pop(name, None)
+        self.remove_task(name)
+        # a MAP task of the item
+        self.map_pending.pop(name, None)
+        self.map_expanded.pop(name, None)
+        self.state_manager.map_gathered.pop(name, None)
+        self.state_manager.map_streams.pop(name, None)
+
+    def remove_task(self, name: str) -> None:
+        """Remove a task created by the engine from the graph, the scheduler and the context.
+
+        The runtime info needed to inspect the task (state, process) is kept on the node.
+        """
+        self.process.wg.tasks._pop(name)
+        for label in self.scheduler.unmark_executed(name):
+            self.ctx._executed_tasks.pop(label, None)
+        self.scheduler.unregister_task(name)
+        self.ctx._task_results.pop(name, None)
+        self.process.runtime_state.discard(name, ('action', 'execution_count'))
+
+    @property
+    def reduce_trees(self) -> Dict[str, Dict[str, Any]]:
+        """The reductions of the running REDUCE tasks, indexed by the name of the REDUCE task.
+
+        Each reduction holds the values that are not combined yet, indexed by their level and position,
+        and the partial reductions that are running. It is persisted with the context, so that the partial
+        reductions can be built again when the process is loaded from a checkpoint.
+        """
+        if '_reduce_trees' not in self.ctx:
+            self.ctx._reduce_trees = {}
+        return self.ctx._reduce_trees
+
+    def execute_reduce_task(self, task, kwargs):
+        """Reduce the values of the source in a tree of partial reductions, see `add_reduce_values`.
+
+        If the source is a gathered output of a running MAP task, the task was released when the MAP
+        task started, and the results of the items are reduced as soon as they are gathered, see
+        `on_map_item_gathered`. Otherwise, all the values of the source are reduced at once.
+        """
+        name = task.name
+        self.discard_reduce_tree(name)
+        fan_in = kwargs.get('fan_in') or 2
+        if isinstance(fan_in, orm.Data):
+            fan_in = fan_in.value
+        map_name, socket_name = self.get_reduced_map_output(task)
+        if map_name is not None:
+            keys = self.state_manager.get_task_runtime_info(map_name, 'map_info')['prefix']
+        else:
+            source = kwargs.get('source') or {}
+            keys = list(source.keys())
+        if fan_in < 2 or not keys:
+            reason = f'the fan-in must be at least 2, got {fan_in}' if fan_in < 2 else 'the source is empty'
+            self.process.report(f'Task: {name} failed, {reason}.')
+            self.state_manager.update_normal_task_state(name, results=None, success=False)
+            self.continue_workgraph()
+            return
+        # number of values on each level of the tree, the last level holds the result
+        sizes = [len(keys)]
+        while sizes[-1] > 1:
+            sizes.append(-(-sizes[-1] // fan_in))
+        self.reduce_trees[name] = {
+            'map': map_name,
+            'socket': socket_name,
+            'fan_in': fan_in,
+            'sizes': sizes,
+            'index': {key: index for index, key in enumerate(keys)},
+            'received': 0,
+            'values': {},
+            'partials': {},
+        }
+        self.state_manager.set_task_runtime_info(name, 'state', 'RUNNING')
+        if map_name is None:
+            self.add_reduce_values(name, 0, dict(enumerate(source.values())))
+        else:
+            for item_results in self.state_manager.map_gathered.get(map_name, {}).values():
+                self.add_reduce_leaves(name, item_results)
+        self.continue_workgraph()
+
+    def get_reduced_map_output(self, task) -> Tuple[Optional[str], Optional[str]]:
+        """Return the running MAP task and its gathered output linked to the source of the REDUCE task."""
+        links = task.inputs.source._links
+        if len(links) != 1:
+            return None, None
+        link = links[0]
+        socket_name = link.from_socket._scoped_name
+        if (
+            link.from_task.task_type.upper() != 'MAP'
+            or self.state_manager.get_task_runtime_info(link.from_task.name, 'state') != 'RUNNING'
+            or '.' in socket_name
+            or socket_name.startswith('_')
+        ):
+            return None, None
+        return link.from_task.name, socket_name
+
+    def on_map_item_gathered(self, name: str, results: Dict[str, Dict[str, Any]]) -> None:
+        """Reduce the results of a gathered item of the MAP task `name`, see `execute_reduce_task`."""
+        for reduce_name, tree in list(self.reduce_trees.items()):
+            if tree['map'] == name:
+                self.add_reduce_leaves(reduce_name, results)
+
+    def add_reduce_leaves(self, name: str, results: Dict[str, Dict[str, Any]]) -> None:
+        """Add the results of a gathered item (or batch of items) of the MAP task to the reduction."""
+        tree = self.reduce_trees[name]
+        leaves = {tree['index'][key]: value for key, value in results.get(tree['socket'], {}).items()}
+        tree['received'] += len(leaves)
+        self.add_reduce_values(name, 0, leaves)
+
+    def add_reduce_values(self, name: str, level: int, values: Dict[int, Any]) -> None:
+        """Add values to a level of the tree of the REDUCE task, and reduce the complete groups.
+
+        The values of a level are combined in groups of `fan_in` consecutive values, and the result of
+        each group is a value of the next level. A group is reduced by a partial reduction task as soon
+        as all its values are available. The single value of the last level is the result.
+        """
+        tree = self.reduce_trees[name]
+        sizes, fan_in = tree['sizes'], tree['fan_in']
+        if level == len(sizes) - 1:
+            self.finish_reduce_task(name, values[0])
+            return
+        level_values = tree['values'].setdefault(level, {})
+        level_values.update(values)
+        for group in sorted({index // fan_in for index in values}):
+            indices = range(group * fan_in, min((group + 1) * fan_in, sizes[level]))
+            if any(index not in level_values for index in indices):
+                continue
+            members = [level_values.pop(index) for index in indices]
+            if len(members) == 1:
+                self.add_reduce_values(name, level + 1, {group: members[0]})
+                continue
+            partial = f'{name}_level{level}_{group}'
+            tree['partials'][partial] = [level, group, members]
+            self.add_reduce_partial(name, partial, members)
+
+    def add_reduce_partial(self, name: str, partial: str, members: List[Any], restore: bool = False) -> None:
+        """Add a partial reduction task combining the values `members` with the function of the REDUCE task."""
+        from aiida_workgraph.tasks.builtins import ReducePartial
+
+        spec = replace(ReducePartial._default_spec, executor=self.process.wg.tasks[name].spec.executor)
+        new_task = self.process.wg.add_task(spec, name=partial)
+        new_task.inputs['values'].value = members
+        if not restore:
+            self.state_manager.set_task_runtime_info(partial, 'state', 'PLANNED')
+            self.state_manager.set_task_runtime_info(partial, 'action', '')
+        self.scheduler.register_task(partial, None, [])
+
+    def update_reduce_tasks(self) -> None:
+        """Reduce the results of the finished partial reductions, and check the running REDUCE tasks."""
+        for partial in self.state_manager.pop_finished_reduce_partials():
+            name = next((name for name, tree in self.reduce_trees.items() if partial in tree['partials']), None)
+            if name is None:
+                continue
+            if self.state_manager.get_task_runtime_info(partial, 'state') != 'FINISHED':
+                self.process.report(f'Task: {name} failed, the partial reduction {partial} failed.')
+                self.fail_reduce_task(name)
+                continue
+            level, group, _ = self.reduce_trees[name]['partials'].pop(partial)
+            result = self.ctx._task_results[partial]['result']
+            self.remove_task(partial)
+            self.add_reduce_values(name, level + 1, {group: result})
+        for name, tree in list(self.reduce_trees.items()):
+            # e.g. skipped because the MAP task failed
+            if self.state_manager.get_task_runtime_info(name, 'state') != 'RUNNING':
+                self.discard_reduce_tree(name)
+                continue
+            if tree['map'] is None or self.state_manager.get_task_runtime_info(tree['map'], 'state') != 'FINISHED':
+                continue
+            missing = tree['sizes'][0] - tree['received']
+            if missing:
+                self.process.report(f'Task: {name} failed, {missing} items of {tree["map"]} have no result.')
+                self.fail_reduce_task(name)
+
+    def finish_reduce_task(self, name: str, result: Any) -> None:
+        """Set the result of the REDUCE task, the single value of the last level of its tree."""
+        del self.reduce_trees[name]
+        self.ctx._task_results[name] = {'result': result}
+        self.process.track_unstored_nodes(result)
+        self.state_manager.set_task_runtime_info(name, 'state', 'FINISHED')
+        self.state_manager.update_meta_tasks(name)
+        self.process.report(f'Task: {name} finished.')
+        self.state_manager.update_parent_task_state(name)
+
+    def fail_reduce_task(self, name: str) -> None:
+        """Mark the REDUCE task as failed, and remove its partial reductions that are not finished."""
+        self.discard_reduce_tree(name)
+        self.state_manager.update_normal_task_state(name, results=None, success=False)
+
+    def discard_reduce_tree(self, name: str) -> None:
+        """Remove the reduction of the REDUCE task and its partial reduction tasks that are not finished."""
+        tree = self.reduce_trees.pop(name, None)
+        if tree is None:
+            return
+        for partial in tree['partials']:
+            if partial in self.process.wg.tasks:
+                self.remove_task(partial)
+
+    def restore_reduce_partials(self) -> None:
+        """Add again the partial reduction tasks, they are not persisted.
+
+        The finished ones are reduced on the next step, the other ones run again.
+        """
+        for name, tree in self.reduce_trees.items():
+            for partial, (_, _, members) in tree['partials'].items():
+                self.add_reduce_partial(name, partial, members, restore=True)
+                if self.state_manager.get_task_runtime_info(partial, 'state') in TERMINAL_STATES:
+                    self.state_manager.finished_reduce_partials.append(partial)
+                else:
+                    self.state_manager.reset_task(partial, recursive=False)
+
     def execute_normal_task(self, task, continue_workgraph=None, args=None, kwargs=None, var_kwargs=None):
         """Execute a Normal task."""
         name = task.name
@@ -320,11 +812,26 @@ class TaskManager:
         if 'context' in task.args_data['kwargs']:
             self.ctx.task_name = name
             kwargs.update({'context': self.ctx})
+            # the function can put anything in the context
+            self.process.track_unstored_nodes()
         for key in task.args_data['args']:
             kwargs.pop(key, None)
         try:
-            results, _ = task.execute(args, kwargs, var_kwargs)
-            self.state_manager.update_normal_task_state(name, results)
+            # the context is not thread safe, the tasks using it always run inline
+            if task.executor_mode and 'context' not in kwargs:
+                # the results are set once the function returns, see `AwaitableManager.complete_future`
+                # the nodes can only be loaded on the event loop thread, pass the raw python data to the function
+                args = [to_raw_python_data(arg) for arg in args]
+                kwargs = to_raw_python_data(kwargs)
+                if var_kwargs is not None:
+                    var_kwargs = to_raw_python_data(var_kwargs)
+                self.awaitable_manager.run_in_executor(
+                    name, lambda: task.execute(args, kwargs, var_kwargs)[0], task.executor_mode
+                )
+                self.state_manager.set_task_runtime_info(name, 'state', 'RUNNING')
+            else:
+                results, _ = task.execute(args, kwargs, var_kwargs)
+                self.state_manager.update_normal_task_state(name, results)
         except Exception as e:
             error_traceback = traceback.format_exc()
             self.logger.error(f'Error in task {task.name}: {e}\n{error_traceback}')
@@ -377,6 +884,14 @@ class TaskManager:
                     socket_value[item_name] = None
                 else:
                     socket_value[item_name] = self.ctx._task_results[link.from_task.name][link.from_socket._scoped_name]
+        if (
+            socket._task is not None
+            and socket._task.task_type.upper() in PROCESS_INPUT_TASK_TYPES
+            and any(link.from_task.ephemeral for link in links)
+            and has_raw_values(socket_value)
+        ):
+            # the results of the ephemeral tasks are serialized when they are passed to an AiiDA process
+            socket_value = self.state_manager.serialize_raw_value(socket, socket_value)
         return socket_value
 
     def get_inputs(
@@ -459,10 +974,13 @@ class TaskManager:
             child_tasks.extend(self.get_all_children(child_task.name))
         return child_tasks
 
-    def generate_mapped_tasks(self, zone_task: Task, prefix: str) -> None:
+    def generate_mapped_tasks(self, zone_task: Task, prefix: str, restore: bool = False) -> None:
         """
         Recursively clone the subgraph starting from zone_children,
         rewriting references to old tasks with new task names.
+
+        :param restore: the item was mapped before the process was loaded from a checkpoint,
+            keep the runtime info and the results of its tasks.
         """
         # keep track of the mapped tasks
         new_tasks = {}
@@ -471,7 +989,7 @@ class TaskManager:
         for child_task in child_tasks:
             # since the child task is mapped, it should be skipped
             self.state_manager.set_task_runtime_info(child_task, 'state', 'MAPPED')
-            task = self.copy_task(child_task, prefix)
+            task = self.copy_task(child_task, prefix, zone_task.name, restore=restore)
             new_tasks[child_task] = task
             links = self.process.wg.tasks[child_task].inputs._all_links
             all_links.extend(links)
@@ -481,30 +999,54 @@ class TaskManager:
         self._patch_connectivity(new_tasks)
         return new_tasks, new_links
 
-    def update_map_item_task_state(self, item_task, prefix, value: Any):
+    def update_map_item_task_state(self, item_task, prefix, value: Any, key: Any = None):
         new_name = f'{prefix}_{item_task.name}'
-        self.ctx._task_results[new_name]['key'] = prefix
+        self.ctx._task_results[new_name]['key'] = prefix if key is None else key
         self.ctx._task_results[new_name]['value'] = value
         self.state_manager.set_task_runtime_info(new_name, 'state', 'FINISHED')
 
-    def copy_task(self, name: str, prefix: str) -> 'Task':
+    def get_template_data(self, name: str) -> Dict[str, Any]:
+        """Return the serialized data of a template task, shared by all its mapped tasks.
+
+        The template is not executed, thus its data does not change while it is being mapped.
+        The data is computed once per template instead of once per map item, and the process
+        is kept deserialized. It is not persisted, and computed again after a reload.
+        """
+        if name not in self._template_data:
+            template = self.process.wg.tasks[name]
+            data = template.to_dict()
+            # the mapped tasks are built from the spec of the template, see `copy_task`
+            data.pop('spec', None)
+            data['process'] = template.process
+            self._template_data[name] = data
+        return self._template_data[name]
+
+    def copy_task(self, name: str, prefix: str, zone: Optional[str] = None, restore: bool = False) -> 'Task':
         import uuid
 
+        template = self.process.wg.tasks[name]
         # keep track of the mapped tasks
-        if not self.process.wg.tasks[name].mapped_tasks:
-            self.process.wg.tasks[name].mapped_tasks = {}
-        task_data = self.process.wg.tasks[name].to_dict()
+        if not template.mapped_tasks:
+            template.mapped_tasks = {}
         new_name = f'{prefix}_{name}'
+        # the nested dicts and lists are copied, so that a mapped task modifying its data in place does not
+        # modify the template or the other mapped tasks, the input values and the spec are shared
+        task_data = copy_containers(self.get_template_data(name))
         task_data['name'] = new_name
-        task_data['map_data'] = {'parent': name, 'prefix': prefix}
+        task_data['map_data'] = {'parent': name, 'prefix': prefix, 'zone': zone}
         task_data['uuid'] = str(uuid.uuid4())
         # Reset runtime states
-        self.ctx._task_results[new_name] = {}
-        self.state_manager.set_task_runtime_info(new_name, 'state', 'PLANNED')
-        self.state_manager.set_task_runtime_info(new_name, 'action', '')
-        # Insert new_data in ctx._tasks
-        task = self.process.wg.add_task_from_dict(task_data)
-        self.process.wg.tasks[name].mapped_tasks[prefix] = task
+        if not restore:
+            self.ctx._task_results[new_name] = {}
+            self.state_manager.set_task_runtime_info(new_name, 'state', 'PLANNED')
+            self.state_manager.set_task_runtime_info(new_name, 'action', '')
+        # build the task from the spec object of the template, instead of
+        # rebuilding the spec from its serialized data for every map item
+        task = template.spec.to_task(name=new_name, uuid=task_data['uuid'], graph=self.process.wg)
+        self.process.wg.tasks._append(task)
+        task.update_from_dict(task_data)
+        template.mapped_tasks[prefix] = task
+        self.state_manager.track_mapped_task(name, new_name)
         return task
 
     def _patch_cloned_tasks(
@@ -572,3 +1114,4 @@ class TaskManager:
                 else:
                     new_input_tasks.append(input_task)
             self.process.wg.connectivity['zone'][task.name] = {'input_tasks': new_input_tasks}
+            self.scheduler.register_task(task.name, task.parent.name if task.parent else None, new_input_tasks)
@@ -1,9 +1,59 @@
 from __future__ import annotations
-from typing import Optional, Tuple, List, Any
-from aiida.orm.utils.serialize import serialize
-from aiida_workgraph.orm.utils import deserialize_safe
-from aiida.orm import ProcessNode, Data
+import time
+from typing import Optional, Tuple, List, Any, Dict
+from aiida_workgraph.orm.utils import parse_task_process
+from aiida.orm import ProcessNode, Data, Node, load_node
 from node_graph.socket import BaseSocket, TaskSocketNamespace
+from .scheduler import TERMINAL_STATES
+from .result_cache import TaskResultCache
+
+
+def scatter_batch_results(keys: List[str], result: Any) -> Dict[str, Data]:
+    """Split the result of a batch of map items into the results of its items.
+
+    Each element is stored as a data node, as the result of an item that is not batched.
+
+    :param keys: The keys of the items of the batch.
+    :param result: A sequence (list, tuple, array, ...) with one element per item, or an AiiDA data node
+        holding such a sequence.
+    """
+    from aiida_pythonjob.data.deserializer import deserialize_to_raw_python_data
+    from aiida_pythonjob.data.serializer import general_serializer
+
+    if isinstance(result, Data):
+        result = deserialize_to_raw_python_data(result)
+    if isinstance(result, (str, bytes, dict)) or not hasattr(result, '__len__'):
+        raise ValueError(f'the result of a batch must be a sequence, got {type(result).__name__}')
+    if len(result) != len(keys):
+        raise ValueError(f'the result of a batch has {len(result)} elements, expected {len(keys)}')
+    # numpy scalars are converted to the python scalars, which can be serialized
+    elements = [element.item() if getattr(element, 'ndim', None) == 0 else element for element in result]
+    return {key: general_serializer(element) for key, element in zip(keys, elements)}
+
+
+def has_raw_values(value: Any) -> bool:
+    """Check if a (possibly nested) value holds raw Python data, i.e. not AiiDA nodes."""
+    if isinstance(value, dict):
+        return any(has_raw_values(item) for item in value.values())
+    return value is not None and not isinstance(value, Node)
+
+
+def to_raw_results(value: Any) -> Any:
+    """Convert the unstored data nodes of the results of an ephemeral task to raw Python data.
+
+    The stored nodes, e.g. the inputs passed through by the task, and the nodes that can not be
+    deserialized are kept.
+    """
+    from aiida_pythonjob.data.deserializer import deserialize_to_raw_python_data
+
+    if isinstance(value, dict):
+        return {key: to_raw_results(item) for key, item in value.items()}
+    if isinstance(value, Data) and not value.is_stored:
+        try:
+            return deserialize_to_raw_python_data(value)
+        except ValueError:
+            return value
+    return value
 
 
 class TaskStateManager:
@@ -12,52 +62,197 @@ class TaskStateManager:
     and relationships (parent/child).
     """
 
-    def __init__(self, ctx_manager, logger, process, awaitable_manager):
+    def __init__(self, ctx_manager, logger, process, awaitable_manager, scheduler):
         """
         :param ctx_manager: Context manager holding `ctx` (containing tasks, connectivity, etc).
         :param logger: Logger instance.
         :param process: The current AiiDA process.
         :param awaitable_manager: Manager that orchestrates async tasks/futures.
+        :param scheduler: Scheduler that is notified of every state transition.
         """
         self.ctx_manager = ctx_manager
         self.ctx = ctx_manager.ctx
         self.logger = logger
         self.process = process
         self.awaitable_manager = awaitable_manager
+        self.scheduler = scheduler
+        # templates of the mapped tasks that need to be checked, see `pop_templates_to_update`
+        self.templates_to_update = set()
+        # mapped task -> its template, and template -> number of its mapped tasks not in a terminal state
+        self.mapped_templates: Dict[str, str] = {}
+        self.unfinished_mapped: Dict[str, int] = {}
+        # MAP task -> prefix of its running items -> number of their mapped tasks not in a terminal state
+        self.map_items: Dict[str, Dict[str, int]] = {}
+        # MAP tasks with a finished item, their next items can be expanded, see `pop_maps_to_expand`
+        self.maps_to_expand = set()
+        # (MAP task, prefix) of the finished items, their tasks can be released, see `pop_finished_map_items`
+        self.finished_map_items: List[Tuple[str, str]] = []
+        # partial reductions in a terminal state, see `TaskManager.update_reduce_tasks`
+        self.finished_reduce_partials: List[str] = []
+        # the nodes of the task processes, indexed by their pk (or uuid for the older nodes)
+        self._process_nodes: Dict[Any, Node] = {}
+        # the results of the tasks with `cache=True`, see `TaskManager.reuse_cached_result`
+        self.result_cache = TaskResultCache(process)
+
+    @property
+    def runtime_state(self):
+        """The engine-owned, write-back store of the tasks' runtime info."""
+        return self.process.runtime_state
 
     def get_task_runtime_info(self, name: str, key: str) -> Any:
         """Fetch a task runtime property (e.g. process, state, action)."""
         if key == 'process':
-            value = self.process.node.get_task_process(name)
-            return deserialize_safe(value) if value else None
-        elif key == 'state':
-            return self.process.node.get_task_state(name)
-        elif key == 'action':
-            return self.process.node.get_task_action(name)
-        elif key == 'execution_count':
-            return self.process.node.get_task_execution_count(name)
-        else:
-            raise ValueError(f'Invalid key: {key}')
-        return None
+            identifier = parse_task_process(self.runtime_state.get(name, 'process'))
+            if identifier is None:
+                return None
+            if identifier not in self._process_nodes:
+                self._process_nodes[identifier] = load_node(identifier)
+            return self._process_nodes[identifier]
+        return self.runtime_state.get(name, key)
 
     def set_task_runtime_info(self, name: str, key: str, value: Any) -> None:
         """Set a task runtime property (e.g. process, state, action).
-        All the runtime info are store into the process node, which allow us
-        access this info outside the engine
+        All the runtime info are cached by the engine and written back to the process node
+        at the end of each step, which allow us access this info outside the engine
         """
         if key == 'process':
-            serialized = serialize(value)
-            self.process.node.set_task_process(name, serialized)
+            # only the pk is stored, the node is kept to be returned by `get_task_runtime_info`
+            if value is not None:
+                self._process_nodes[value.pk] = value
+                value = value.pk
         elif key == 'state':
-            self.process.node.set_task_state(name, value)
-        elif key == 'action':
-            self.process.node.set_task_action(name, value)
-        elif key == 'execution_count':
-            self.process.node.set_task_execution_count(name, value)
-        elif key == 'map_info':
-            self.process.node.set_task_map_info(name, value)
+            old_state = self.runtime_state.get(name, 'state')
+            self.runtime_state.set(name, key, value)
+            self.scheduler.on_state_changed(name, old_state, value)
+            if value != old_state and name in self.mapped_templates:
+                self.count_unfinished_mapped(self.mapped_templates[name], old_state, value)
+            if value != old_state and value in TERMINAL_STATES:
+                self.track_template_task(name)
+            if value != old_state:
+                self.record_state_timestamp(name, value)
+            return
+        self.runtime_state.set(name, key, value)
+
+    def record_task_timestamp(
+        self, name: str, event: str, timestamp: Optional[float] = None, overwrite: bool = True
+    ) -> None:
+        """Record the time of an event of the lifecycle of a task, see `WorkGraphNode.TASK_TIMESTAMP_EVENTS`.
+
+        :param timestamp: The POSIX timestamp of the event, by default the current time.
+        :param overwrite: If False, an event that was already recorded is kept.
+        """
+        timestamps = self.runtime_state.get(name, 'timestamps') or {}
+        if not overwrite and event in timestamps:
+            return
+        timestamp = time.time() if timestamp is None else timestamp
+        # a new dict, since the runtime state store only writes the changed values
+        self.runtime_state.set(name, 'timestamps', {**timestamps, event: round(timestamp, 3)})
+
+    def record_state_timestamp(self, name: str, state: str) -> None:
+        """Record the timestamps following a state transition of a task.
+
+        A task reset to PLANNED, e.g. for the next iteration of a WHILE task, starts a new lifecycle.
+        The results of a task are applied when it reaches the FINISHED or FAILED state, the child
+        process, if any, finished before, see `update_task_state`.
+        """
+        if state == 'PLANNED':
+            self.runtime_state.discard(name, ('timestamps',))
+        elif state == 'RUNNING':
+            self.record_task_timestamp(name, 'running', overwrite=False)
+        elif state in ('FINISHED', 'FAILED'):
+            self.record_task_timestamp(name, 'finished', overwrite=False)
+            self.record_task_timestamp(name, 'applied')
+
+    def track_template_task(self, name: str) -> None:
+        """Record the template task that may be finished after the task `name` reached a terminal state."""
+        if name not in self.process.wg.tasks:
+            return
+        task = self.process.wg.tasks[name]
+        if task.identifier == 'workgraph.reduce_partial':
+            self.finished_reduce_partials.append(name)
+            return
+        if task.map_data:
+            self.on_map_item_task_finished(task.map_data)
+        if task.parent is not None and self.get_task_runtime_info(task.parent.name, 'state') == 'MAPPED':
+            self.templates_to_update.add(task.parent.name)
+
+    def track_mapped_task(self, template: str, name: str) -> None:
+        """Count a new mapped task of the template, unless it is already in a terminal state, e.g. restored."""
+        if name in self.mapped_templates:
+            # mapped again, its state transitions are already counted
+            return
+        self.mapped_templates[name] = template
+        self.unfinished_mapped.setdefault(template, 0)
+        self.count_unfinished_mapped(template, '', self.get_task_runtime_info(name, 'state'))
+
+    def untrack_mapped_task(self, name: str) -> None:
+        """Stop counting a mapped task removed from the graph."""
+        template = self.mapped_templates.pop(name, None)
+        if template is not None:
+            self.count_unfinished_mapped(template, self.get_task_runtime_info(name, 'state'), '')
+
+    def count_unfinished_mapped(self, template: str, old_state: str, new_state: str) -> None:
+        """Update the number of unfinished mapped tasks of the template after a state transition.
+
+        The empty state stands for a task that is not mapped (yet or anymore). Once all the mapped tasks are in a
+        terminal state, the template is checked, see `update_template_task_state`.
+        """
+        was_unfinished = bool(old_state) and old_state not in TERMINAL_STATES
+        is_unfinished = bool(new_state) and new_state not in TERMINAL_STATES
+        if was_unfinished == is_unfinished:
+            return
+        self.unfinished_mapped[template] += 1 if is_unfinished else -1
+        if self.unfinished_mapped[template] == 0:
+            self.templates_to_update.add(template)
+
+    def track_map_item(self, zone: str, prefix: str, names: List[str]) -> None:
+        """Count the mapped tasks of a newly expanded item of a MAP task."""
+        count = sum(self.get_task_runtime_info(name, 'state') not in TERMINAL_STATES for name in names)
+        if count:
+            self.map_items.setdefault(zone, {})[prefix] = count
         else:
-            raise ValueError(f'Invalid key: {key}')
+            self.finished_map_items.append((zone, prefix))
+            self.maps_to_expand.add(zone)
+
+    def count_map_items(self, zone: str) -> int:
+        """Return the number of expanded items of the MAP task that are not finished."""
+        return len(self.map_items.get(zone, ()))
+
+    def on_map_item_task_finished(self, map_data: Dict[str, Any]) -> None:
+        """A mapped task reached a terminal state, check if its item is finished."""
+        items = self.map_items.get(map_data.get('zone'))
+        prefix = map_data['prefix']
+        if not items or prefix not in items:
+            return
+        items[prefix] -= 1
+        if items[prefix] <= 0:
+            del items[prefix]
+            self.finished_map_items.append((map_data['zone'], prefix))
+            self.maps_to_expand.add(map_data['zone'])
+
+    def pop_maps_to_expand(self) -> List[str]:
+        """Return and clear the MAP tasks with an item finished since the last call."""
+        names = list(self.maps_to_expand)
+        self.maps_to_expand.clear()
+        return names
+
+    def pop_finished_map_items(self) -> List[Tuple[str, str]]:
+        """Return and clear the (MAP task, prefix) of the items finished since the last call."""
+        items = self.finished_map_items
+        self.finished_map_items = []
+        return items
+
+    def pop_finished_reduce_partials(self) -> List[str]:
+        """Return and clear the partial reductions that reached a terminal state since the last call."""
+        names = self.finished_reduce_partials
+        self.finished_reduce_partials = []
+        return names
+
+    def pop_templates_to_update(self) -> List[str]:
+        """Return and clear the template tasks whose mapped tasks changed since the last call."""
+        names = list(self.templates_to_update)
+        self.templates_to_update.clear()
+        return names
 
     def set_tasks_state(self, tasks: List[str], value: str) -> None:
         """
@@ -74,37 +269,44 @@ class TaskStateManager:
         """Update task state when the task is finished."""
         from aiida_workgraph.utils import resolve_node_link_managers
 
-        task = self.process.wg.tasks[name]
-        self.ctx._task_results.setdefault(name, {})
-        if success:
-            node = self.get_task_runtime_info(name, 'process')
-            if isinstance(node, ProcessNode):
-                state = node.process_state.value.upper()
-                if node.is_finished_ok:
-                    self.set_task_runtime_info(task.name, 'state', state)
-
-                    self.ctx._task_results[name] = resolve_node_link_managers(node.outputs)
+        with self.process.profiler.section('update_task_state'):
+            task = self.process.wg.tasks[name]
+            self.ctx._task_results.setdefault(name, {})
+            if success:
+                node = self.get_task_runtime_info(name, 'process')
+                if isinstance(node, ProcessNode):
+                    # the child process finished when its node was last modified, i.e. sealed, unless the task
+                    # reuses the process of a previous run, see `TaskManager.reuse_cached_result`
+                    self.record_task_timestamp(name, 'finished', node.mtime.timestamp(), overwrite=False)
+                    state = node.process_state.value.upper()
+                    if node.is_finished_ok:
+                        self.set_task_runtime_info(task.name, 'state', state)
+
+                        self.ctx._task_results[name] = resolve_node_link_managers(node.outputs)
+                        self.set_task_runtime_info(task.name, 'state', 'FINISHED')
+                        self.update_meta_tasks(name)
+                        self.process.report(f'Task: {name}, type: {task.task_type}, finished.')
+                        self.apply_socket_spec_extras_to_aiida_node(name, node)
+                        self.result_cache.record_results(name, node=node)
+                    # all other states are considered as failed
+                    else:
+                        self.ctx._task_results[name] = resolve_node_link_managers(node.outputs)
+                        self.on_task_failed(name)
+                elif isinstance(node, Data):
+                    #
+                    output_name = [
+                        output_name
+                        for output_name in task.outputs._get_keys()
+                        if output_name not in ['_wait', '_outputs']
+                    ][0]
+                    self.ctx._task_results[name] = {output_name: node}
                     self.set_task_runtime_info(task.name, 'state', 'FINISHED')
                     self.update_meta_tasks(name)
-                    self.process.report(f'Task: {name}, type: {task.task_type}, finished.')
-                    self.apply_socket_spec_extras_to_aiida_node(name, node)
-                # all other states are considered as failed
-                else:
-                    self.ctx._task_results[name] = resolve_node_link_managers(node.outputs)
-                    self.on_task_failed(name)
-            elif isinstance(node, Data):
-                #
-                output_name = [
-                    output_name for output_name in task.outputs._get_keys() if output_name not in ['_wait', '_outputs']
-                ][0]
-                self.ctx._task_results[name] = {output_name: node}
-                self.set_task_runtime_info(task.name, 'state', 'FINISHED')
-                self.update_meta_tasks(name)
-                self.process.report(f'Task: {name} finished.')
-        else:
-            self.on_task_failed(name)
-        # After finishing, inform the parent
-        self.update_parent_task_state(name)
+                    self.process.report(f'Task: {name} finished.')
+            else:
+                self.on_task_failed(name)
+            # After finishing, inform the parent
+            self.update_parent_task_state(name)
 
     def update_normal_task_state(self, name, results, success=True):
         """Set the results of a normal task.
@@ -132,11 +334,16 @@ class TaskStateManager:
                 # some task does not have any output
                 if len(output_names) == 1:
                     self.ctx._task_results[name][output_names[0]] = results
-                    if isinstance(results, Data):
+                    if isinstance(results, Data) and not task.ephemeral:
                         results.store()
                         self.set_task_runtime_info(task.name, 'process', results)
                 elif len(output_names) > 1:
                     self.process.exit_codes.OUTPUS_NOT_MATCH_RESULTS
+            if task.ephemeral:
+                # the results are kept in the context, they are serialized when they leave the graph
+                self.ctx._task_results[name] = to_raw_results(self.ctx._task_results[name])
+            self.process.track_unstored_nodes(self.ctx._task_results[name])
+            self.result_cache.record_results(name, results=self.ctx._task_results[name])
             self.update_meta_tasks(name)
             self.set_task_runtime_info(name, 'state', 'FINISHED')
             self.process.report(f'Task: {name} finished.')
@@ -162,8 +369,23 @@ class TaskStateManager:
                 else:
                     result = get_nested_dict(self.ctx._task_results[name], result_key, default=None)
                 result = resolve_node_link_managers(result)
+                if link.to_task.name == 'graph_outputs' and has_raw_values(result):
+                    # e.g. the results of an ephemeral task
+                    result = self.serialize_raw_value(link.to_socket, result)
                 update_nested_dict(self.ctx._task_results[link.to_task.name], key, result)
 
+    def serialize_raw_value(self, socket: BaseSocket, value: Any) -> Any:
+        """Serialize the raw Python data passed to a socket to AiiDA data nodes, and store the new nodes.
+
+        It is used where the results of an ephemeral task leave the graph: the outputs of the graph
+        and the inputs of the AiiDA processes.
+        """
+        from aiida_workgraph.serialization import AiidaSerializationAdapter
+
+        value = AiidaSerializationAdapter().serialize(value, socket, store=True)
+        self.process._store_nodes(value)
+        return value
+
     def reset_task(
         self,
         name: str,
@@ -203,36 +425,24 @@ class TaskStateManager:
         """
         Remove tasks from `ctx._executed_tasks` if they match this name (or name.*).
         """
-        self.ctx._executed_tasks = [label for label in self.ctx._executed_tasks if label.split('.')[0] != name]
+        for label in self.scheduler.unmark_executed(name):
+            self.ctx._executed_tasks.pop(label, None)
 
     def is_task_ready_to_run(self, name: str) -> Tuple[bool, Optional[str]]:
         """
         Check if the task is ready to run. We consider parent states, input tasks, etc.
         For tasks inside a ZONE or with a parent task, we require the parent
         to be in a running state, and the zone's input tasks finished or failed.
+        The number of unfinished input tasks is tracked by the scheduler.
         """
-        parent_task = self.process.wg.tasks[name].parent
-        parent_states = [True, True]
-
-        # If the task has a parent zone
-        if parent_task:
-            state = self.get_task_runtime_info(parent_task.name, 'state')
-            if state not in ['RUNNING']:
-                parent_states[1] = False
-
-        # Check input tasks from the zone connectivity
-        for child_task_name in self.process.wg.connectivity['zone'][name]['input_tasks']:
-            child_state = self.get_task_runtime_info(child_task_name, 'state')
-            if child_state not in ['FINISHED', 'SKIPPED', 'FAILED']:
-                parent_states[0] = False
-                break
-        return all(parent_states), parent_states
+        return self.scheduler.is_task_ready_to_run(name)
 
     def on_task_failed(self, name: str) -> None:
         """
         Mark a task as FAILED, skip its children, and run any error handlers.
         """
         task_type = self.process.wg.tasks[name].task_type
+        self.result_cache.discard(name)
         self.set_task_runtime_info(name, 'state', 'FAILED')
         self.set_tasks_state(self.process.wg.connectivity['child_node'][name], 'SKIPPED')
         msg = f'Task, {name}, type: {task_type}, failed.'
@@ -245,7 +455,8 @@ class TaskStateManager:
     def update_parent_task_state(self, name: str) -> None:
         """
         If a task has a parent (WHILE, IF, ZONE, MAP), notify the parent to update
-        its own state. Also handle mapped tasks referencing a 'map_data.parent' node.
+        its own state. The template of a mapped task is checked once all its mapped tasks are finished, see
+        `count_unfinished_mapped`.
         """
         parent_task = self.process.wg.tasks[name].parent
         if parent_task:
@@ -257,11 +468,6 @@ class TaskStateManager:
             elif task_type == 'MAP':
                 self.update_map_task_state(parent_task.name)
 
-        # If the task is a mapped child, update its parent's "template" (the original map node)
-        if self.process.wg.tasks[name].map_data:
-            map_parent = self.process.wg.tasks[name].map_data['parent']
-            self.update_template_task_state(map_parent)
-
     def update_while_task_state(self, name: str) -> None:
         """
         Called when a child of a WHILE task finishes. If all children are done, we decide
@@ -288,37 +494,164 @@ class TaskStateManager:
             self.process.report(f'Task: {name} finished.')
             self.update_parent_task_state(name)
 
+    @property
+    def map_gathered(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """The gathered results of the finished items of the MAP tasks, see `gather_map_item`.
+
+        MAP task -> prefix of the item -> output name -> key of the item -> result.
+        """
+        if '_map_gathered' not in self.ctx:
+            self.ctx._map_gathered = {}
+        return self.ctx._map_gathered
+
     def update_map_task_state(self, name: str) -> None:
         """Update the map task state.
         1) check if all child tasks are finished.
-        2) gather the results of all the mapped tasks.
+        2) gather the results of the items that are not gathered yet, see `gather_map_item`.
         3) update the parent task state.
         """
         finished, _ = self.are_childen_finished(name)
         if finished:
             map_zone = self.process.wg.tasks[name]
-            # gather the results of all the mapped tasks
             gather_task = map_zone.gather_item_task
-            for input in gather_task.inputs:
-                if input._name.startswith('_'):
-                    continue
-                results = {}
-                link = input._links[0]
-                for prefix, mapped_task in self.process.wg.tasks[gather_task.name].mapped_tasks.items():
-                    results[prefix] = self.ctx._task_results[mapped_task.name][link.to_socket._name]
-                self.ctx._task_results[name][link.to_socket._name] = results
+            for prefix in list(gather_task.mapped_tasks or {}):
+                try:
+                    self.gather_map_item(name, prefix)
+                except ValueError as exception:
+                    self.process.report(f'Task: {name} failed to scatter the results of {prefix}: {exception}')
+                    self.on_task_failed(name)
+                    return
+            # the items are gathered in the order they finished, sort them as the source
+            gathered = {input._name: {} for input in gather_task.inputs if not input._name.startswith('_')}
+            for item_results in self.map_gathered.pop(name, {}).values():
+                for socket_name, values in item_results.items():
+                    gathered[socket_name].update(values)
+            keys = self.get_task_runtime_info(name, 'map_info')['prefix']
+            for socket_name, values in gathered.items():
+                self.ctx._task_results[name][socket_name] = {key: values[key] for key in keys if key in values}
+            # the stream was not opened, e.g. without `stream_size`, it holds the results of its items
+            stream = self.map_streams.pop(name, None)
+            if 'stream' not in self.ctx._task_results[name]:
+                stream_keys = stream['keys'] if stream else keys
+                self.ctx._task_results[name]['stream'] = {
+                    socket_name: {key: values[key] for key in stream_keys if key in values}
+                    for socket_name, values in gathered.items()
+                }
             self.set_task_runtime_info(name, 'state', 'FINISHED')
             # self.update_meta_tasks(name)
             self.process.report(f'Task: {name} finished.')
             self.update_meta_tasks(name)
             self.update_parent_task_state(name)
 
+    def gather_map_item(self, name: str, prefix: str) -> None:
+        """Gather the results of an item of the MAP task `name`, from the gather task of the item.
+
+        The items are gathered as soon as they are finished, so that their tasks can be released,
+        see `TaskManager.release_map_item`. A batch of items is scattered back to its items.
+
+        :raises ValueError: if the result of a batch can not be scattered.
+        """
+        gathered = self.map_gathered.setdefault(name, {})
+        if prefix in gathered:
+            return
+        map_zone = self.process.wg.tasks[name]
+        gather_task = map_zone.gather_item_task
+        item_results = self.ctx._task_results[gather_task.mapped_tasks[prefix].name]
+        item_key = self.get_map_item_key(map_zone, prefix)
+        results = {}
+        for input in gather_task.inputs:
+            if input._name.startswith('_'):
+                continue
+            result = item_results[input._name]
+            if isinstance(item_key, list):
+                results[input._name] = scatter_batch_results(item_key, result)
+            else:
+                results[input._name] = {prefix: result}
+        gathered[prefix] = results
+        self.update_map_stream(name, results)
+        self.process.task_manager.on_map_item_gathered(name, results)
+
+    @property
+    def map_streams(self) -> Dict[str, Dict[str, Any]]:
+        """The streams of the MAP tasks with a `stream_size` that are not opened yet, see `update_map_stream`.
+
+        MAP task -> {'keys': keys of the streamed items, 'missing': insertion ordered set of the keys
+        of the streamed items that are not gathered yet}.
+        """
+        if '_map_streams' not in self.ctx:
+            self.ctx._map_streams = {}
+        return self.ctx._map_streams
+
+    def update_map_stream(self, name: str, results: Dict[str, Dict[str, Any]]) -> None:
+        """Open the stream of the MAP task once the first `stream_size` items of the source are gathered.
+
+        The results of these items are set on the `stream` outputs of the MAP task, and the tasks
+        reading only the `stream` outputs can start while the other items are still running.
+        """
+        stream = self.map_streams.get(name)
+        if stream is None or 'stream' in self.ctx._task_results[name]:
+            return
+        for values in results.values():
+            for key in values:
+                stream['missing'].pop(key, None)
+        if stream['missing']:
+            return
+        gathered = {}
+        for item_results in self.map_gathered[name].values():
+            for socket_name, values in item_results.items():
+                gathered.setdefault(socket_name, {}).update(values)
+        self.ctx._task_results[name]['stream'] = {
+            socket_name: {key: values[key] for key in stream['keys']} for socket_name, values in gathered.items()
+        }
+        self.process.report(f'Task: {name} streams the results of its first {len(stream["keys"])} items.')
+        self.release_stream_consumers(name)
+
+    def release_reduce_consumers(self, name: str) -> None:
+        """Let the REDUCE tasks reducing a gathered output of the MAP task start before it finishes.
+
+        The results of the items are reduced as soon as they are gathered, see `TaskManager.execute_reduce_task`.
+        """
+        map_zone = self.process.wg.tasks[name]
+        for link in map_zone.outputs._all_links:
+            consumer = link.to_task
+            socket_name = link.from_socket._scoped_name
+            if consumer.task_type.upper() != 'REDUCE' or '.' in socket_name or socket_name.startswith('_'):
+                continue
+            links = [link for link in consumer.inputs._all_links if link.from_task is map_zone]
+            if len(links) == 1 and links[0].to_socket._scoped_name == 'source':
+                self.scheduler.release_dependent(name, consumer.name)
+
+    def release_stream_consumers(self, name: str) -> None:
+        """Let the tasks that only read the `stream` outputs of the MAP task start before it finishes."""
+        map_zone = self.process.wg.tasks[name]
+        consumers = {link.to_task.name: None for link in map_zone.outputs.stream._all_links}
+        for consumer in consumers:
+            # the graph outputs and context are exported when the MAP task finishes
+            if consumer in ['graph_ctx', 'graph_outputs']:
+                continue
+            links = self.process.wg.tasks[consumer].inputs._all_links
+            if all(link.from_socket._scoped_name.startswith('stream.') for link in links if link.from_task is map_zone):
+                self.scheduler.release_dependent(name, consumer)
+
+    def get_map_item_key(self, map_zone, prefix: str) -> Any:
+        """Return the key of an item of the MAP task, or the list of the keys of the items of a batch."""
+        item_task = next((child for child in map_zone.children if child.identifier == 'workgraph.map_item'), None)
+        if item_task is None or prefix not in (item_task.mapped_tasks or {}):
+            return prefix
+        return self.ctx._task_results[item_task.mapped_tasks[prefix].name].get('key', prefix)
+
     def update_template_task_state(self, name: str) -> None:
         """Update the template task state.
         1) check if all child tasks are finished.
         2) gather the results of all the mapped tasks.
         3) update the parent task state.
         """
+        # the MAP task still has items to expand, they will be mapped from this template
+        zone = self.get_map_zone(name)
+        if zone is not None and zone in self.process.task_manager.map_pending:
+            return
+        if self.unfinished_mapped.get(name, 0):
+            return
         finished, _ = self.are_childen_finished(name)
         if finished:
             # # gather the results of all the mapped tasks
@@ -334,6 +667,15 @@ class TaskStateManager:
             self.process.report(f'Task: {name} finished.')
             self.update_parent_task_state(name)
 
+    def get_map_zone(self, name: str) -> Optional[str]:
+        """Return the MAP task that expands the mapped tasks of the template task."""
+        parent = self.process.wg.tasks[name].parent
+        while parent is not None:
+            if parent.task_type.upper() == 'MAP':
+                return parent.name
+            parent = parent.parent
+        return None
+
     def are_childen_finished(self, name: str) -> tuple[bool, Any]:
         """Check if the child tasks are finished."""
         task = self.process.wg.tasks[name]
@@ -347,16 +689,7 @@ class TaskStateManager:
                 ]:
                     finished = False
                     break
-        # check the mapped tasks
-        mapped_tasks = task.mapped_tasks or {}
-        for mapped_task in mapped_tasks.values():
-            if self.get_task_runtime_info(mapped_task.name, 'state') not in [
-                'FINISHED',
-                'SKIPPED',
-                'FAILED',
-            ]:
-                finished = False
-                break
+        # the mapped tasks of a template are counted instead, see `count_unfinished_mapped`
         return finished, None
 
     def apply_socket_spec_extras_to_aiida_node(self, name: str, node: ProcessNode) -> None:
@@ -24,6 +24,9 @@ from .context_manager import ContextManager
 from .awaitable_manager import AwaitableManager
 from .task_manager import TaskManager
 from .error_handler_manager import ErrorHandlerManager
+from .runtime_state import RuntimeStateStore
+from .checkpoint import CheckpointWriter
+from .profiler import EngineProfiler
 from aiida.engine.processes.workchains.awaitable import Awaitable
 from node_graph.config import BUILTIN_TASKS
 
@@ -45,6 +48,7 @@ class WorkGraphEngine(Process, metaclass=Protect):
     _node_class = WorkGraphNode
     _spec_class = WorkGraphSpec
     _CONTEXT = 'CONTEXT'
+    _RUNTIME_STATE = 'RUNTIME_STATE'
 
     def __init__(
         self,
@@ -63,12 +67,16 @@ class WorkGraphEngine(Process, metaclass=Protect):
         """
 
         super().__init__(inputs, logger, runner, enable_persistence=enable_persistence)
-        self._awaitables: list[Awaitable] = []
+        self._awaitables: dict[int, Awaitable] = {}
         self._context = AttributeDict()
+        self.profiler = EngineProfiler(self)
+        self.runtime_state = RuntimeStateStore(self)
+        self._init_unstored_nodes()
         self.ctx_manager = ContextManager(self._context, process=self, logger=self.logger)
         self.awaitable_manager = AwaitableManager(self._awaitables, self.runner, self.logger, self, self.ctx_manager)
         self.task_manager = TaskManager(self.ctx_manager, self.logger, self.runner, self, self.awaitable_manager)
         self.error_handler_manager = ErrorHandlerManager(self, self.ctx_manager, self.logger)
+        self.checkpointer = CheckpointWriter(self)
 
     @classmethod
     def define(cls, spec: WorkGraphSpec) -> None:
@@ -135,6 +143,52 @@ class WorkGraphEngine(Process, metaclass=Protect):
         super().save_instance_state(out_state, save_context)
         # Save the context
         out_state[self._CONTEXT] = self.ctx
+        # the runtime info on the node can be ahead of the checkpoint, see `CheckpointWriter`
+        if self.checkpointer.keeps_runtime_state:
+            out_state[self._RUNTIME_STATE] = self.runtime_state.data
+
+    @override
+    def _save_checkpoint(self) -> None:
+        """Save a checkpoint following the checkpoint policy of the workgraph, see `CheckpointWriter`."""
+        import plumpy
+
+        if not self._enable_persistence or self._state.is_terminal() or self.runner.persister is None:
+            return super()._save_checkpoint()
+        mode = self.checkpointer.next_checkpoint()
+        if mode == 'sync':
+            self.checkpointer.save_sync()
+        elif mode == 'async':
+            try:
+                self.checkpointer.save_async()
+            except plumpy.exceptions.PersistenceError:
+                self.logger.exception(
+                    'Exception trying to save checkpoint, this means you will '
+                    'not be able to restart in case of a crash until the next successful checkpoint.'
+                )
+
+    def save_child_checkpoint(self) -> None:
+        """Save a checkpoint inside the step, after a process function created its process node.
+
+        When a checkpoint is saved at every step, the runtime info on the node already records the process.
+        Otherwise, the last checkpoint can be older, and the function would run again after a crash.
+        """
+        if not self._enable_persistence or self.runner.persister is None or not self.checkpointer.keeps_runtime_state:
+            return
+        # the checkpoint only holds stored nodes, see `on_exiting`
+        self._store_tracked_nodes()
+        self.runtime_state.flush()
+        self.checkpointer.save_sync()
+
+    @override
+    def encode_input_args(self, inputs: t.Dict[str, t.Any]) -> str:
+        """Encode the inputs for the checkpoint.
+
+        Once the process is set up, the workgraph data is left out of the raw and parsed inputs,
+        since it is rebuilt from the process node when the process is loaded.
+        """
+        if '_task_results' in self.ctx and (inputs is self.raw_inputs or inputs is self.inputs):
+            inputs = {key: value for key, value in inputs.items() if key != WorkGraphSpec.WORKGRAPH_DATA_KEY}
+        return super().encode_input_args(inputs)
 
     @override
     def load_instance_state(self, saved_state: t.Dict[str, t.Any], load_context: t.Any) -> None:
@@ -145,9 +199,9 @@ class WorkGraphEngine(Process, metaclass=Protect):
         # Load the context
         self._context = saved_state[self._CONTEXT]
         # Load the WorkGraph
-        # if `_wgdata` does not exist, which means this is the first time the process is run
-        if '_wgdata' in self.ctx:
-            self.wg = WorkGraph.from_dict(self.ctx._wgdata)
+        # if `_task_results` does not exist, which means this is the first time the process is run
+        if '_task_results' in self.ctx:
+            self.wg = WorkGraph.from_dict(self._restore_workgraph_data())
         # TODO: avoid hardcoding the logger
         self.node._logger = logging.getLogger('aiida.orm.nodes.process.workflow.workchain.WorkChainNode')
         # First time the property is called after the node is stored, create the logger adapter
@@ -155,16 +209,55 @@ class WorkGraphEngine(Process, metaclass=Protect):
         self.set_logger(self.node._logger_adapter)
         # TODO I don't know why we need to reinitialize the context, awaitables, and task_manager
         # Need to initialize the context, awaitables, and task_manager
+        # the runtime info is flushed to the node before every checkpoint, so the node is up to date,
+        # unless some checkpoints were skipped, then it is restored from the checkpoint
+        # the task processes of the nodes created by older versions are serialized as YAML
+        self.node.migrate_task_processes()
+        self.profiler = EngineProfiler(self)
+        self.runtime_state = RuntimeStateStore(self)
+        if self._RUNTIME_STATE in saved_state:
+            self.runtime_state.restore(saved_state[self._RUNTIME_STATE])
+        self._init_unstored_nodes()
+        # the awaitables were persisted as a list in older checkpoints
+        if isinstance(self._awaitables, list):
+            self._awaitables = {awaitable.pk: awaitable for awaitable in self._awaitables}
         self.ctx_manager = ContextManager(self._context, process=self, logger=self.logger)
         self.awaitable_manager = AwaitableManager(self._awaitables, self.runner, self.logger, self, self.ctx_manager)
         self.task_manager = TaskManager(self.ctx_manager, self.logger, self.runner, self, self.awaitable_manager)
         self.error_handler_manager = ErrorHandlerManager(self, self.ctx_manager, self.logger)
+        self.checkpointer = CheckpointWriter(self)
+        # the launched tasks were persisted as a list in older checkpoints
+        if isinstance(self.ctx.get('_executed_tasks'), list):
+            self.ctx._executed_tasks = dict.fromkeys(self.ctx._executed_tasks)
+        # the scheduler is derived from the task states, rebuild it instead of persisting it
+        if '_task_results' in self.ctx:
+            self.task_manager.build_scheduler()
+            # nothing else would wake up the process to run the reset tasks again
+            if self.task_manager.reset_offloaded_tasks() and not self._awaitables:
+                self.call_soon(self.resume)
         # "_awaitables" is auto persisted.
         if self._awaitables:
             # For other awaitables, because they exist in the db, we only need to re-register the callbacks
-            self.ctx._awaitable_actions = []
             self.awaitable_manager.action_awaitables()
 
+    def _restore_workgraph_data(self) -> t.Dict[str, t.Any]:
+        """Rebuild the workgraph data of a process loaded from a checkpoint.
+
+        The workgraph data is read from the process node. Only the tasks which can not be rebuilt
+        from the node are kept in the context: the ones with a pickled executor, which is cleaned
+        before saving the data to the node, and the ones updated by an error handler.
+        """
+        from aiida_workgraph.utils import load_workgraph_data
+
+        # older checkpoints keep the whole workgraph data in the context
+        if '_wgdata' in self.ctx:
+            wgdata = self.ctx.pop('_wgdata')
+            self.ctx._wgdata_tasks = dict(wgdata['tasks'])
+            return wgdata
+        wgdata = load_workgraph_data(self.node, safe=False)
+        wgdata['tasks'].update(self.ctx._wgdata_tasks)
+        return wgdata
+
     @override
     def run(self) -> t.Any:
         self.setup()
@@ -181,39 +274,103 @@ class WorkGraphEngine(Process, metaclass=Protect):
         # there are some awaitables left
         # self._awaitables = []
         result: t.Any = None
+        writes = self.runtime_state.writes
+
+        with self.profiler.section('step'):
+            try:
+                try:
+                    self.task_manager.continue_workgraph()
+                except _PropagateReturn as exception:
+                    finished, result = True, exception.exit_code
+                else:
+                    finished, result = self.task_manager.is_workgraph_finished()
+
+                # If the workgraph is finished or the result is an ExitCode, we exit by returning
+                if finished:
+                    if isinstance(result, ExitCode):
+                        return result
+                    else:
+                        return self.finalize()
+            finally:
+                # write the runtime info of all the tasks changed in this step back to the node at once
+                self.runtime_state.flush()
+                self.profiler.count('attribute_writes', self.runtime_state.writes - writes)
+
+        if self._awaitables or self.awaitable_manager.not_persisted_awaitables:
+            return Wait(self._do_step, 'Waiting before next step')
 
-        try:
-            self.task_manager.continue_workgraph()
-        except _PropagateReturn as exception:
-            finished, result = True, exception.exit_code
-        else:
-            finished, result = self.task_manager.is_workgraph_finished()
+        return Continue(self._do_step)
 
-        # If the workgraph is finished or the result is an ExitCode, we exit by returning
-        if finished:
-            if isinstance(result, ExitCode):
-                return result
-            else:
-                return self.finalize()
+    def _init_unstored_nodes(self) -> None:
+        from aiida_workgraph.config import load_config
 
-        if self._awaitables:
-            return Wait(self._do_step, 'Waiting before next step')
+        # the unstored nodes put in the context since the last state exit, see `track_unstored_nodes`
+        self._unstored_nodes: t.List[Node] = []
+        # walk the whole context on the next state exit, e.g. after the setup; a checkpoint only holds stored nodes
+        self._store_whole_context = False
+        # check that no unstored node of the context was missed, see `_store_tracked_nodes`
+        self._debug_store_nodes = bool(load_config().get('debug_store_nodes', False))
 
-        return Continue(self._do_step)
+    def track_unstored_nodes(self, data: t.Any = None) -> None:
+        """Record the unstored nodes of data put in the context, they are stored on the next state exit.
+
+        Only the new data is walked, instead of the whole context. If the data is not given, e.g. a task
+        received the context and could have changed anything in it, the whole context is walked instead.
 
-    def _store_nodes(self, data: t.Any) -> None:
+        :param data: a data structure potentially containing unstored nodes
+        """
+        if data is None:
+            self._store_whole_context = True
+        elif isinstance(data, Node):
+            if not data.is_stored:
+                self._unstored_nodes.append(data)
+        elif isinstance(data, collections.abc.Mapping):
+            for value in data.values():
+                self.track_unstored_nodes(value)
+        elif isinstance(data, collections.abc.Sequence) and not isinstance(data, str):
+            for value in data:
+                self.track_unstored_nodes(value)
+
+    def _store_tracked_nodes(self) -> None:
+        """Store the unstored nodes put in the context since the last state exit, in a single transaction.
+
+        If ``debug_store_nodes`` is set in the ``workgraph.json`` configuration file, the whole context is
+        then checked for unstored nodes that were not tracked.
+        """
+        from aiida.manage import get_manager
+
+        nodes, self._unstored_nodes = self._unstored_nodes, []
+        if self._store_whole_context:
+            self._store_whole_context = False
+            self._store_nodes(self.ctx)
+            return
+        nodes = [node for node in nodes if not node.is_stored]
+        if nodes:
+            with get_manager().get_profile_storage().transaction():
+                for node in nodes:
+                    node.store()
+        if self._debug_store_nodes:
+            untracked = []
+            self._store_nodes(self.ctx, untracked)
+            if untracked:
+                self.logger.warning(f'stored {len(untracked)} unstored nodes of the context that were not tracked')
+
+    def _store_nodes(self, data: t.Any, stored: t.Optional[t.List[Node]] = None) -> None:
         """Recurse through a data structure and store any unstored nodes that are found along the way
 
         :param data: a data structure potentially containing unstored nodes
+        :param stored: if given, the nodes stored by the call are appended to it
         """
         if isinstance(data, Node) and not data.is_stored:
             data.store()
+            if stored is not None:
+                stored.append(data)
         elif isinstance(data, collections.abc.Mapping):
             for _, value in data.items():
-                self._store_nodes(value)
+                self._store_nodes(value, stored)
         elif isinstance(data, collections.abc.Sequence) and not isinstance(data, str):
             for value in data:
-                self._store_nodes(value)
+                self._store_nodes(value, stored)
 
     @override
     @Protect.final
@@ -222,13 +379,37 @@ class WorkGraphEngine(Process, metaclass=Protect):
 
         After the state is exited the next state will be entered and if persistence is enabled, a checkpoint will
         be saved. If the context contains unstored nodes, the serialization necessary for checkpointing will fail.
+        The nodes are recorded when they are put in the context, see `track_unstored_nodes`.
         """
         super().on_exiting()
         try:
-            self._store_nodes(self.ctx)
+            self._store_tracked_nodes()
         except Exception:  # pylint: disable=broad-except
             # An uncaught exception here will have bizarre and disastrous consequences
-            self.logger.exception('exception in _store_nodes called in on_exiting')
+            self.logger.exception('exception in _store_tracked_nodes called in on_exiting')
+        try:
+            self.runtime_state.flush()
+        except Exception:  # pylint: disable=broad-except
+            self.logger.exception('exception in flushing the runtime state called in on_exiting')
+        try:
+            self.save_metrics()
+        except Exception:  # pylint: disable=broad-except
+            self.logger.exception('exception in saving the engine metrics called in on_exiting')
+
+    @override
+    def on_terminated(self) -> None:
+        """Pass the termination to the profiler hooks, e.g. to write the collected metrics."""
+        super().on_terminated()
+        try:
+            self.profiler.terminate()
+        except Exception:  # pylint: disable=broad-except
+            self.logger.exception('exception in terminating the profiler called in on_terminated')
+
+    def save_metrics(self) -> None:
+        """Write the engine metrics, e.g. how the child process completions were batched, to the node."""
+        metrics = {'awaitables': dict(self.awaitable_manager.metrics), 'checkpoints': dict(self.checkpointer.metrics)}
+        if metrics != self.node.engine_metrics:
+            self.node.engine_metrics = metrics
 
     @Protect.final
     def on_wait(self, awaitables: t.Sequence[t.Awaitable]):
@@ -237,7 +418,7 @@ class WorkGraphEngine(Process, metaclass=Protect):
         if self._awaitables:
             self.awaitable_manager.action_awaitables()
             self.report('Process status: {}'.format(self.node.process_status))
-        else:
+        elif not self.awaitable_manager.not_persisted_awaitables:
             self.call_soon(self.resume)
 
     def _build_process_label(self) -> str:
@@ -256,17 +437,18 @@ class WorkGraphEngine(Process, metaclass=Protect):
     def setup(self) -> None:
         """Setup the variables in the context."""
         from aiida_workgraph import WorkGraph
-        from aiida_workgraph.utils import restore_workgraph_data_from_raw_inputs
+        from aiida_workgraph.utils import has_pickled_executor, restore_workgraph_data_from_raw_inputs
 
-        # track if the awaitable callback is added to the runner
-        self.ctx._awaitable_actions = []
         self.ctx._new_data = {}
-        self.ctx._executed_tasks = []
+        # insertion ordered set of the labels of the launched tasks
+        self.ctx._executed_tasks = {}
         # read the workgraph data
         wgdata = restore_workgraph_data_from_raw_inputs(self.inputs)
         self.wg = WorkGraph.from_dict(wgdata)
-        # store the workgraph data in the context, so that one can resume from checkpoint
-        self.ctx._wgdata = wgdata
+        # the checkpoints only keep the tasks which can not be rebuilt from the process node,
+        # see `_restore_workgraph_data`
+        self.ctx._wgdata_tasks = {name: tdata for name, tdata in wgdata['tasks'].items() if has_pickled_executor(tdata)}
+        self.task_manager.build_scheduler()
         # init task results
         self.ctx._task_results = {}
         # create a builtin `_context` task with its results as the context variables
@@ -280,10 +462,13 @@ class WorkGraphEngine(Process, metaclass=Protect):
         # set meta-tasks state
         for task_name in BUILTIN_TASKS:
             self.task_manager.state_manager.set_task_runtime_info(task_name, 'state', 'FINISHED')
+        # the initial context, e.g. the graph inputs and the context variables, is walked once
+        self.track_unstored_nodes()
 
     def apply_action(self, msg: dict) -> None:
         if msg['catalog'] == 'task':
             self.task_manager.action_manager.apply_task_actions(msg)
+            self.runtime_state.flush()
         else:
             self.report(f'Unknow message type {msg}')
 
@@ -334,6 +519,5 @@ class WorkGraphEngine(Process, metaclass=Protect):
         if self.ctx._new_data:
             self.out('new_data', self.ctx._new_data)
         self.report('Finalize workgraph.')
-        for task in self.wg.tasks:
-            if self.task_manager.state_manager.get_task_runtime_info(task.name, 'state') == 'FAILED':
-                return self.exit_codes.TASK_FAILED
+        if self.task_manager.scheduler.count('FAILED'):
+            return self.exit_codes.TASK_FAILED
@@ -8,7 +8,8 @@ Note pitfalls:
 """
 
 from contextlib import contextmanager
-from aiida_workgraph.socket import TaskSocket
+from typing import Callable
+from aiida_workgraph.socket import TaskSocket, TaskSocketNamespace
 from aiida_workgraph.tasks.task_pool import TaskPool
 
 DEFAULT_MAP_PLACEHOLDER = 'map_input'
@@ -167,12 +168,29 @@ def While(condition_socket: TaskSocket, max_iterations: int = 10000):
 
 
 @contextmanager
-def Map(source_socket: TaskSocket, placeholder: str = DEFAULT_MAP_PLACEHOLDER):
+def Map(
+    source_socket: TaskSocket,
+    placeholder: str = DEFAULT_MAP_PLACEHOLDER,
+    chunk_size: int = 0,
+    batch_size: int = 0,
+    stream_size: int = 0,
+):
     """
     Context manager to create a "map zone" in the current graph.
 
     :param source_socket: A TaskSocket or boolean-like object (e.g. sum_ > 0)
     :param placeholder: The placeholder string to use as the input for the mapped tasks
+    :param chunk_size: The maximum number of items whose tasks are created and running at the same time.
+        The tasks of the next items are created once the earlier items are finished. By default (0),
+        the tasks of all the items are created at once.
+    :param batch_size: Group the items in batches of `batch_size` items, the tasks of the zone run once per
+        batch. The `item.key` and `item.value` of a batch are the lists of the keys and values of its items,
+        and the gathered results of a batch must be sequences of the same length, they are scattered back
+        to the keys of the items. By default (0), the tasks run once per item.
+    :param stream_size: The number of items whose results are streamed. The `stream` outputs of the zone hold
+        the gathered results of the first `stream_size` items of the source, and the tasks linked only to the
+        `stream` outputs start as soon as these items are finished, while the other items are still running.
+        By default (0), the `stream` outputs hold the results of all the items once the zone is finished.
     """
 
     wg = get_current_graph()
@@ -180,6 +198,9 @@ def Map(source_socket: TaskSocket, placeholder: str = DEFAULT_MAP_PLACEHOLDER):
     zone_task = wg.add_task(
         TaskPool.workgraph.map_zone,
         source=source_socket,
+        chunk_size=chunk_size,
+        batch_size=batch_size,
+        stream_size=stream_size,
     )
 
     old_zone = getattr(wg, '_active_zone', None)
@@ -191,3 +212,29 @@ def Map(source_socket: TaskSocket, placeholder: str = DEFAULT_MAP_PLACEHOLDER):
         yield zone_task
     finally:
         wg._active_zone = old_zone
+
+
+def Reduce(source_socket: TaskSocket, function: Callable, fan_in: int = 2) -> TaskSocketNamespace:
+    """
+    Add a task to the current graph that reduces the values of a namespace with an associative function.
+
+    The values are combined in a tree of partial reductions, each one combines `fan_in` consecutive values
+    and runs as a task of its own. When the source is the gathered output of a Map zone, the results of the
+    items are reduced as soon as they are finished, while the other items are still running.
+
+    :param source_socket: A namespace socket, e.g. the gathered output of a Map zone.
+    :param function: A function combining two values, e.g. ``operator.add``, or a task created with ``@task``.
+        It receives the raw python values, and it must be associative, since the values are combined
+        in the order of the source, but not in a sequence.
+    :param fan_in: The number of values combined by each partial reduction.
+    :return: The outputs of the task, the reduced value is ``result``.
+    """
+    wg = get_current_graph()
+
+    reduce_task = wg.add_task(TaskPool.workgraph.reduce, source=source_socket, fan_in=fan_in)
+    reduce_task.set_function(function)
+
+    zone = getattr(wg, '_active_zone', None)
+    if zone:
+        zone.children.add(reduce_task)
+    return reduce_task.outputs
@@ -8,7 +8,8 @@ from aiida.orm.utils.serialize import (
     group_constructor,
     node_links_manager_constructor,
 )
-from typing import Any
+from aiida import orm
+from typing import Any, Dict, List, Optional, Tuple, Union
 import yaml
 
 
@@ -32,3 +33,73 @@ AiiDASafeLoader.add_constructor(_GROUP_TAG, group_constructor)
 
 def deserialize_safe(serialized: str) -> Any:
     return yaml.load(serialized, Loader=AiiDASafeLoader)
+
+
+class TaskProcessLoader(yaml.SafeLoader):
+    """Read the uuid of a task process serialized as YAML by older versions, without loading the node."""
+
+    pass
+
+
+TaskProcessLoader.add_constructor(_NODE_TAG, lambda loader, node: loader.construct_scalar(node))
+
+
+def parse_task_process(value: Any) -> Optional[Union[int, str]]:
+    """Return the identifier of a task process stored in the ``task_processes`` attribute of a workgraph.
+
+    Since version 2 of the attribute, see ``WorkGraphNode.TASK_PROCESSES_VERSION``, the pk is stored.
+    The older versions store the node serialized as YAML, whose uuid is returned instead.
+    Both can be passed to ``load_node``.
+    """
+    if value is None or isinstance(value, int):
+        return value
+    if not value:
+        return None
+    return yaml.load(value, Loader=TaskProcessLoader)
+
+
+def _query_task_processes(values: Dict[str, Any], project: Any) -> Tuple[Dict[str, Any], List[List[Any]]]:
+    """Query the processes of many tasks at once, return their identifiers and the projected rows.
+
+    The first two projections of the rows are always the pk and the uuid of the node.
+    """
+    identifiers = {name: parse_task_process(value) for name, value in values.items()}
+    pks = {identifier for identifier in identifiers.values() if isinstance(identifier, int)}
+    uuids = {identifier for identifier in identifiers.values() if isinstance(identifier, str)}
+    filters = [{'id': {'in': list(pks)}}] if pks else []
+    if uuids:
+        filters.append({'uuid': {'in': list(uuids)}})
+    if not filters:
+        return identifiers, []
+    filters = filters[0] if len(filters) == 1 else {'or': filters}
+    query = orm.QueryBuilder().append(orm.Node, filters=filters, project=['id', 'uuid', *project])
+    return identifiers, query.all()
+
+
+def load_task_processes(values: Dict[str, Any]) -> Dict[str, orm.Node]:
+    """Load the processes of many tasks with a single query.
+
+    :param values: the values of the ``task_processes`` attribute, indexed by the task names
+    :return: the nodes indexed by the task names, the tasks without a process are left out
+    """
+    identifiers, rows = _query_task_processes(values, ['*'])
+    nodes = {}
+    for pk, uuid, node in rows:
+        nodes[pk] = nodes[uuid] = node
+    return {name: nodes[identifier] for name, identifier in identifiers.items() if identifier in nodes}
+
+
+def query_task_processes(values: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Fetch the state of the processes of many tasks with a single projected query, without loading the nodes.
+
+    :param values: the values of the ``task_processes`` attribute, indexed by the task names
+    :return: the ``pk``, ``node_type``, ``process_type``, ``process_state``, ``ctime`` and ``mtime`` of the
+        processes indexed by the task names, the tasks without a process are left out
+    """
+    keys = ('node_type', 'process_type', 'process_state', 'ctime', 'mtime')
+    project = ['node_type', 'process_type', 'attributes.process_state', 'ctime', 'mtime']
+    identifiers, rows = _query_task_processes(values, project)
+    processes = {}
+    for pk, uuid, *row in rows:
+        processes[pk] = processes[uuid] = {'pk': pk, **dict(zip(keys, row))}
+    return {name: processes[identifier] for name, identifier in identifiers.items() if identifier in processes}
@@ -1,6 +1,6 @@
 """Module with `Node` sub class for work processes."""
 
-from typing import Optional, Tuple
+from typing import Optional, Tuple, Union
 import logging
 from aiida.common.lang import classproperty
 
@@ -48,15 +48,22 @@ class WorkGraphNode(WorkChainNode):
 
     TASK_STATES_KEY = 'task_states'
     TASK_PROCESSES_KEY = 'task_processes'
+    TASK_PROCESSES_VERSION_KEY = 'task_processes_version'
+    # version 2 stores the pks of the task processes instead of the nodes serialized as YAML
+    TASK_PROCESSES_VERSION = 2
     TASK_ACTIONS_KEY = 'task_actions'
     TASK_EXECUTORS_KEY = 'task_executors'
     TASK_ERROR_HANDLERS_KEY = 'task_error_handlers'
     TASK_EXECUTION_COUNTS_KEY = 'task_execution_counts'
     TASK_MAP_INFO_KEY = 'task_map_info'
     TASK_INPUTS_KEY = 'task_inputs'
+    TASK_TIMESTAMPS_KEY = 'task_timestamps'
+    # the events of the lifecycle of a task whose time is recorded in `task_timestamps`
+    TASK_TIMESTAMP_EVENTS = ('ready', 'submitted', 'running', 'finished', 'applied')
     WORKGRAPH_DATA_KEY = 'workgraph_data'
     WORKGRAPH_DATA_SHORT_KEY = 'workgraph_data_short'
     WORKGRAPH_ERROR_HANDLERS_KEY = 'workgraph_error_handlers'
+    ENGINE_METRICS_KEY = 'engine_metrics'
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -73,11 +80,14 @@ class WorkGraphNode(WorkChainNode):
             cls.WORKGRAPH_ERROR_HANDLERS_KEY,
             cls.TASK_STATES_KEY,
             cls.TASK_PROCESSES_KEY,
+            cls.TASK_PROCESSES_VERSION_KEY,
             cls.TASK_ACTIONS_KEY,
             cls.TASK_EXECUTORS_KEY,
             cls.TASK_ERROR_HANDLERS_KEY,
             cls.TASK_EXECUTION_COUNTS_KEY,
             cls.TASK_MAP_INFO_KEY,
+            cls.TASK_TIMESTAMPS_KEY,
+            cls.ENGINE_METRICS_KEY,
         )
 
     task_states = make_dict_property(TASK_STATES_KEY, default={})
@@ -87,10 +97,21 @@ class WorkGraphNode(WorkChainNode):
     task_error_handlers = make_dict_property(TASK_ERROR_HANDLERS_KEY, default={})
     task_execution_counts = make_dict_property(TASK_EXECUTION_COUNTS_KEY, default={})
     task_map_info = make_dict_property(TASK_MAP_INFO_KEY, default={})
+    task_timestamps = make_dict_property(TASK_TIMESTAMPS_KEY, default={})
     workgraph_data = make_dict_property(WORKGRAPH_DATA_KEY, default=None)
     task_inputs = make_dict_property(TASK_INPUTS_KEY, default=None)
     workgraph_data_short = make_dict_property(WORKGRAPH_DATA_SHORT_KEY, default=None)
     workgraph_error_handlers = make_dict_property(WORKGRAPH_ERROR_HANDLERS_KEY, default=None)
+    engine_metrics = make_dict_property(ENGINE_METRICS_KEY, default={})
+
+    @property
+    def task_processes_version(self) -> int:
+        """The version of the format of `task_processes`, the nodes created before the version was stored are 1."""
+        return self.base.attributes.get(self.TASK_PROCESSES_VERSION_KEY, 1)
+
+    @task_processes_version.setter
+    def task_processes_version(self, value: int) -> None:
+        self.base.attributes.set(self.TASK_PROCESSES_VERSION_KEY, value)
 
     def get_task_state(self, task_name: str) -> Optional[str]:
         """Return the state of a single task."""
@@ -100,14 +121,29 @@ class WorkGraphNode(WorkChainNode):
         """Set the state of a single task."""
         set_item_in_dict(self.base, self.TASK_STATES_KEY, task_name, task_state)
 
-    def get_task_process(self, task_name: str) -> Optional[str]:
-        """Return the process info of a single task."""
+    def get_task_process(self, task_name: str) -> Optional[Union[int, str]]:
+        """Return the process info of a single task, see `parse_task_process`."""
         return get_item_from_dict(self.base, self.TASK_PROCESSES_KEY, task_name, default=None)
 
-    def set_task_process(self, task_name: str, task_process: str) -> None:
-        """Set the process info of a single task."""
+    def set_task_process(self, task_name: str, task_process: Optional[int]) -> None:
+        """Set the pk of the process of a single task."""
         set_item_in_dict(self.base, self.TASK_PROCESSES_KEY, task_name, task_process)
 
+    def migrate_task_processes(self) -> None:
+        """Replace the task processes serialized as YAML by older versions with their pks."""
+        from aiida_workgraph.orm.utils import load_task_processes
+
+        if self.task_processes_version >= self.TASK_PROCESSES_VERSION:
+            return
+        task_processes = self.task_processes
+        nodes = load_task_processes(task_processes)
+        self.base.attributes.set_many(
+            {
+                self.TASK_PROCESSES_KEY: {name: nodes[name].pk if name in nodes else None for name in task_processes},
+                self.TASK_PROCESSES_VERSION_KEY: self.TASK_PROCESSES_VERSION,
+            }
+        )
+
     def get_task_action(self, task_name: str) -> Optional[str]:
         """Return the action info of a single task."""
         return get_item_from_dict(self.base, self.TASK_ACTIONS_KEY, task_name, default='')
@@ -22,6 +22,10 @@ class Task(GraphTask):
 
     _REGISTRY: Optional[RegistryHub] = registry_hub
     _SOCKET_SPEC_API = SocketSpecAPI
+    # the process set by `update_state`, which is loaded on first access
+    _pending_process: Optional[Dict[str, Any]] = None
+    _loaded_process: Optional[tuple] = None
+    _process: Optional[aiida.orm.Node] = None
 
     _default_spec = TaskSpec(
         identifier='workgraph.task',
@@ -54,6 +58,74 @@ class Task(GraphTask):
         self.map_data = None
         self.mapped_tasks = None
         self.execution_count = 0
+        # the POSIX timestamps of the lifecycle events of the task, see `WorkGraphNode.TASK_TIMESTAMP_EVENTS`
+        self.timestamps: Dict[str, float] = {}
+        # tags used to assign the task to resource pools, see `WorkGraph.add_resource_pool`
+        self.tags: List[str] = []
+        self._ephemeral = False
+        self.executor_mode = self.spec.metadata.get('executor_mode')
+        self.ephemeral = self.spec.metadata.get('ephemeral', False)
+        self.cache = self.spec.metadata.get('cache', False)
+
+    @property
+    def executor_mode(self) -> Optional[str]:
+        """Run the function of the task in a ``thread`` or ``process`` pool, see `aiida_workgraph.engine.executor_pool`.
+
+        A normal task only supports the ``thread`` pool. Its function then receives the inputs as raw
+        Python data instead of AiiDA nodes, because the nodes can only be loaded on the thread of the engine.
+        """
+        return self._executor_mode
+
+    @executor_mode.setter
+    def executor_mode(self, mode: Optional[str]) -> None:
+        from aiida_workgraph.engine.executor_pool import validate_executor_mode
+
+        validate_executor_mode(mode)
+        if mode is not None and mode != 'thread' and self.task_type.upper() == 'NORMAL':
+            raise ValueError(f'The executor mode of the normal task {self.name} must be `thread`, not `{mode}`')
+        if mode is not None and self._ephemeral:
+            raise ValueError(f'The ephemeral task {self.name} runs inline, it does not support an executor mode')
+        self._executor_mode = mode
+
+    @property
+    def ephemeral(self) -> bool:
+        """Keep the results of the task only in the context of the engine, as raw Python data.
+
+        A ``PYFUNCTION`` task calls its function directly instead of launching a process, and a normal
+        task does not store its results. The results are serialized to AiiDA data nodes only when they
+        are passed to the outputs of the graph or to the inputs of an AiiDA process.
+        """
+        return self._ephemeral
+
+    @ephemeral.setter
+    def ephemeral(self, value: bool) -> None:
+        value = bool(value)
+        if value:
+            if self.task_type.upper() not in ('NORMAL', 'PYFUNCTION'):
+                raise ValueError(f'Only normal and pyfunction tasks can be ephemeral, not the task {self.name}')
+            if self.executor_mode is not None or self.spec.metadata.get('is_coroutine', False):
+                raise ValueError(
+                    f'The ephemeral task {self.name} runs inline, it can not be async or run in an executor'
+                )
+        self._ephemeral = value
+
+    @property
+    def cache(self) -> bool:
+        """Reuse the results of a previous run of the function with the same inputs, instead of executing it.
+
+        Only supported by the ``PYFUNCTION`` and ``NORMAL`` tasks, whose function must not have side effects.
+        The results of the tasks running inline, e.g. the ``NORMAL`` and ephemeral tasks, are only kept in the
+        memory of the interpreter, e.g. a daemon worker. See :mod:`aiida_workgraph.engine.result_cache` for the
+        scope and the invalidation of the results.
+        """
+        return self._cache
+
+    @cache.setter
+    def cache(self, value: bool) -> None:
+        value = bool(value)
+        if value and self.task_type.upper() not in ('NORMAL', 'PYFUNCTION'):
+            raise ValueError(f'Only the results of normal and pyfunction tasks can be cached, not the task {self.name}')
+        self._cache = value
 
     def to_dict(self, include_sockets: bool = False, should_serialize: bool = False) -> Dict[str, Any]:
         from aiida.orm.utils.serialize import serialize
@@ -62,6 +134,10 @@ class Task(GraphTask):
         tdata['wait'] = [task.name for task in self.waiting_on]
         tdata['children'] = []
         tdata['execution_count'] = self.execution_count
+        tdata['tags'] = list(self.tags)
+        tdata['executor_mode'] = self.executor_mode
+        tdata['ephemeral'] = self.ephemeral
+        tdata['cache'] = self.cache
         tdata['parent_task'] = [self.parent.name] if self.parent else [None]
         tdata['process'] = serialize(self.process) if self.process else serialize(None)
         tdata['metadata']['pk'] = self.process.pk if self.process else None
@@ -113,24 +189,72 @@ class Task(GraphTask):
         self.process = process
         self.waiting_on.add(data.get('wait', []))
         self.map_data = data.get('map_data', None)
+        self.tags = list(data.get('tags', []))
+        self.executor_mode = data.get('executor_mode', self.executor_mode)
+        self.ephemeral = data.get('ephemeral', self.ephemeral)
+        self.cache = data.get('cache', self.cache)
 
     def reset(self) -> None:
         self.process = None
         self.state = 'PLANNED'
+        self.timestamps = {}
+
+    @property
+    def process(self) -> Optional[aiida.orm.Node]:
+        """The process of the task, or the data node returned by a normal task."""
+        self._load_pending_process()
+        return self._process
+
+    @process.setter
+    def process(self, value: Optional[aiida.orm.Node]) -> None:
+        self._pending_process = None
+        self._process = value
+
+    @property
+    def node(self) -> Optional[aiida.orm.Node]:
+        return self.process
+
+    @property
+    def outputs(self):
+        self._load_pending_process()
+        return self._outputs
+
+    @outputs.setter
+    def outputs(self, value) -> None:
+        self._outputs = value
 
     def update_state(self, data: Dict[str, Any]) -> None:
-        """Set the outputs of the task from a dictionary."""
+        """Set the state of the task from a dictionary, see `get_processes_latest`.
+
+        The node and the outputs are only loaded when they are accessed, see `_load_pending_process`.
+        """
         self.state = data['state']
         self.ctime = data['ctime']
         self.mtime = data['mtime']
         self.pk = data['pk']
-        if data['pk'] is not None:
-            node = aiida.orm.load_node(data['pk'])
-            self.process = self.node = node
-            if isinstance(node, aiida.orm.ProcessNode):
-                self.set_outputs_from_process_node(node)
-            elif isinstance(node, aiida.orm.Data):
-                self.set_outputs_from_data_node(node)
+        self.timestamps = data.get('timestamps', {})
+        if data['pk'] is not None and (data['pk'], data['mtime']) != self._loaded_process:
+            self._pending_process = data
+
+    @property
+    def delays(self) -> Dict[str, Optional[float]]:
+        """The queue wait, run time and latency of the task, see `get_task_delays`."""
+        from aiida_workgraph.utils import get_task_delays
+
+        return get_task_delays(self.timestamps)
+
+    def _load_pending_process(self) -> None:
+        """Load the node set by `update_state` and set the outputs from it."""
+        data, self._pending_process = self._pending_process, None
+        if data is None:
+            return
+        node = aiida.orm.load_node(data['pk'])
+        self._process = node
+        self._loaded_process = (data['pk'], data['mtime'])
+        if isinstance(node, aiida.orm.ProcessNode):
+            self.set_outputs_from_process_node(node)
+        elif isinstance(node, aiida.orm.Data):
+            self.set_outputs_from_data_node(node)
 
     def set_outputs_from_process_node(self, node: aiida.orm.ProcessNode) -> None:
         from aiida_workgraph.utils import resolve_node_link_managers
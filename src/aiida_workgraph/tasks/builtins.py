@@ -1,5 +1,7 @@
 from __future__ import annotations
-from typing import Any, Dict
+import functools
+from dataclasses import replace
+from typing import Any, Callable, Dict
 from aiida_workgraph.task import Task
 from aiida_workgraph import task, namespace, meta, dynamic
 from node_graph.tasks.builtins import _GraphIOSharedMixin
@@ -7,12 +9,14 @@ from node_graph.task import ChildTaskSet
 from node_graph.socket import BaseSocket
 from node_graph import RuntimeExecutor
 from aiida import orm
-from node_graph.task_spec import TaskSpec
+from node_graph.task_spec import BaseHandle, SchemaSource, TaskSpec
 from node_graph.socket_spec import SocketSpec, SocketMeta
 from typing import Annotated
 from aiida_workgraph.executors.builtins import update_ctx, get_context, select, return_input
 from node_graph.task import BuiltinPolicy
 from aiida_workgraph.executors.builtins import load_node, load_code
+from aiida_pythonjob.data.deserializer import deserialize_to_raw_python_data
+from aiida_pythonjob.data.serializer import general_serializer
 
 
 class GraphLevelTask(_GraphIOSharedMixin, Task):
@@ -99,8 +103,11 @@ class Map(Zone):
         catalog='Control',
         inputs=namespace(
             source=dynamic(Any),
+            chunk_size=Annotated[int, SocketSpec('workgraph.any', default=0)],
+            batch_size=Annotated[int, SocketSpec('workgraph.any', default=0)],
+            stream_size=Annotated[int, SocketSpec('workgraph.any', default=0)],
         ),
-        outputs=namespace(),
+        outputs=namespace(stream=namespace()),
         base_class_path='aiida_workgraph.tasks.builtins.Map',
     )
 
@@ -129,6 +136,8 @@ class Map(Zone):
         for name in sockets:
             gather_item.add_input_spec('workgraph.any', name=name)
             self.add_output_spec('workgraph.namespace', name=name)
+            # the results of the first items, see the `stream_size` input
+            self.add_output_spec('workgraph.namespace', name=f'stream.{name}')
         gather_item.set_inputs(sockets)
         return gather_item.outputs
 
@@ -169,6 +178,58 @@ class GatherItem(Task):
     )
 
 
+class Reduce(Task):
+    """Reduce the values of a namespace with an associative function, see `aiida_workgraph.manager.Reduce`.
+
+    The engine combines the values in a tree of partial reductions, each one is a task.
+    """
+
+    _default_spec = TaskSpec(
+        identifier='workgraph.reduce',
+        task_type='REDUCE',
+        catalog='Control',
+        inputs=namespace(
+            source=dynamic(Any),
+            fan_in=Annotated[int, SocketSpec('workgraph.any', default=2)],
+        ),
+        outputs=namespace(result=Any),
+        base_class_path='aiida_workgraph.tasks.builtins.Reduce',
+    )
+
+    def set_function(self, function: Callable) -> None:
+        """Set the function combining two values, a callable or a task created with `@task`."""
+        if isinstance(function, BaseHandle):
+            executor = function._spec.executor
+        else:
+            executor = RuntimeExecutor.from_callable(function)
+        self.spec = replace(self.spec, executor=executor, schema_source=SchemaSource.EMBEDDED)
+
+
+class ReducePartial(Task):
+    """A partial reduction of a Reduce task, it is created by the engine."""
+
+    _default_spec = TaskSpec(
+        identifier='workgraph.reduce_partial',
+        task_type='Normal',
+        catalog='Control',
+        inputs=namespace(values=Any),
+        outputs=namespace(result=Any),
+        base_class_path='aiida_workgraph.tasks.builtins.ReducePartial',
+    )
+
+    def execute(self, args=None, kwargs=None, var_kwargs=None):
+        """Combine the values in order with the function of the Reduce task, the result is stored as a data node."""
+        function = self.get_executor().callable
+        # the imported executor could be a wrapped function
+        if isinstance(function, BaseHandle) and hasattr(function, '_callable'):
+            function = function._callable
+        values = [
+            deserialize_to_raw_python_data(value) if isinstance(value, orm.Data) else value
+            for value in kwargs['values']
+        ]
+        return general_serializer(functools.reduce(function, values)), 'FINISHED'
+
+
 class SetContext(Task):
     """SetContext"""
 
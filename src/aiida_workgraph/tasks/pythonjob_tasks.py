@@ -155,7 +155,15 @@ class PyFunctionTask(BaseSerializablePythonTask):
         if isinstance(func, BaseHandle) and hasattr(func, '_callable'):
             func = func._callable
 
-        if self.spec.metadata.get('is_coroutine', False):
+        is_coroutine = self.spec.metadata.get('is_coroutine', False)
+        if is_coroutine or self.executor_mode:
+            # a sync function with an executor mode runs in a thread or process pool
+            if is_coroutine:
+                process_cls = PyFunction
+            else:
+                from aiida_workgraph.engine.executor_pool import ExecutorPyFunction
+
+                process_cls = ExecutorPyFunction
             function_inputs = self.get_function_inputs(kwargs, var_kwargs)
             inputs = prepare_pyfunction_inputs(
                 function=func,
@@ -168,18 +176,20 @@ class PyFunctionTask(BaseSerializablePythonTask):
                 serializers=kwargs.pop('serializers', None),
                 register_pickle_by_value=kwargs.pop('register_pickle_by_value', False),
             )
+            if not is_coroutine:
+                inputs['executor_mode'] = self.executor_mode
             if self.action == 'PAUSE':
                 engine_process.report(f'Task {self.name} is created and paused.')
                 process = create_and_pause_process(
                     engine_process.runner,
-                    PyFunction,
+                    process_cls,
                     inputs,
                     state_msg='Paused through WorkGraph',
                 )
                 state = 'CREATED'
                 process = process.node
             else:
-                process = engine_process.submit(PyFunction, **inputs)
+                process = engine_process.submit(process_cls, **inputs)
                 state = 'RUNNING'
 
             return process, state
@@ -202,6 +212,38 @@ class PyFunctionTask(BaseSerializablePythonTask):
 
             return process, 'FINISHED'
 
+    def execute_ephemeral(self, args=None, kwargs=None, var_kwargs=None) -> Dict[str, Any]:
+        """Call the function directly, without a process, and return its results by output name.
+
+        The function receives and returns raw Python data, nothing is stored in the database.
+        """
+        from aiida_workgraph.utils import to_raw_python_data
+
+        kwargs = kwargs or {}
+        self.get_process_metadata(kwargs)
+        function_inputs = self.get_function_inputs(kwargs, var_kwargs)
+        func = RuntimeExecutor(**self.get_executor().to_dict()).callable
+        if isinstance(func, BaseHandle) and hasattr(func, '_callable'):
+            func = func._callable
+        if hasattr(func, 'is_process_function'):
+            func = func.func
+        results = func(**to_raw_python_data(function_inputs))
+        spec = self.function_outputs_spec
+        names = list(spec.fields or {})
+        if isinstance(results, tuple):
+            if len(names) != len(results):
+                raise ValueError(f'The function returned {len(results)} values for the outputs {names}')
+            return dict(zip(names, results))
+        if len(names) == 1 and not spec.meta.dynamic:
+            if isinstance(results, dict) and names[0] in results:
+                return {names[0]: results[names[0]]}
+            return {names[0]: results}
+        if isinstance(results, dict):
+            return results
+        if not names and results is None:
+            return {}
+        raise ValueError(f'The results of the function do not match the outputs {names}')
+
 
 class MonitorFunctionTask(BaseSerializablePythonTask):
     """Monitor Function Task."""
@@ -288,13 +330,26 @@ def build_pyfunction_taskspec(
     in_spec: Optional[SocketSpec] = None,
     out_spec: Optional[SocketSpec] = None,
     error_handlers: Optional[Dict[str, ErrorHandlerSpec]] = None,
+    executor_mode: Optional[str] = None,
+    ephemeral: bool = False,
+    cache: bool = False,
 ) -> TaskSpec:
     import asyncio
+    from aiida_workgraph.engine.executor_pool import validate_executor_mode
 
     if asyncio.iscoroutinefunction(obj):
         metadata = {'is_coroutine': True}
     else:
         metadata = {}
+    if executor_mode is not None:
+        validate_executor_mode(executor_mode)
+        metadata['executor_mode'] = executor_mode
+    if ephemeral:
+        if executor_mode is not None or metadata.get('is_coroutine'):
+            raise ValueError('An ephemeral task runs inline, it can not be async or run in an executor.')
+        metadata['ephemeral'] = True
+    if cache:
+        metadata['cache'] = True
     return build_callable_TaskSpec(
         obj=obj,
         task_type='PYFUNCTION',
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import logging
-from typing import Any, Dict, Optional, Union, Callable, List
+from typing import Any, Dict, Iterable, Optional, Union, Callable, List
 from aiida.engine.processes import Process
 from aiida import orm
 from aiida.common.exceptions import NotExistent
@@ -16,7 +16,7 @@ import yaml
 from node_graph.socket import TaggedValue
 from node_graph.socket_spec import SocketSpec
 from aiida.orm.utils.serialize import serialize
-from aiida_workgraph.orm.utils import deserialize_safe
+from aiida_workgraph.orm.utils import deserialize_safe, query_task_processes
 from copy import deepcopy
 
 LOGGER = logging.getLogger(__name__)
@@ -210,8 +210,21 @@ def clean_pickled_task_executor(tdata: Dict[str, Any]) -> None:
             tdata['error_handlers'][name] = RuntimeExecutor.from_callable(UnavailableExecutor).to_dict()
 
 
+def has_pickled_executor(tdata: Dict[str, Any]) -> bool:
+    """Check if the task data has a pickled executor, which is cleaned before saving it to the database."""
+    spec = tdata.get('spec', {})
+    executor = spec.get('executor', {}) if isinstance(spec, dict) else {}
+    if executor.get('mode', '') == 'pickled_callable':
+        return True
+    if executor.get('mode', '') == 'graph':
+        if any(has_pickled_executor(task) for task in executor['graph_data']['tasks'].values()):
+            return True
+    return any(handler.get('mode', '') == 'pickled_callable' for handler in tdata.get('error_handlers', {}).values())
+
+
 def save_workgraph_data(node: Union[int, orm.Node], inputs: Dict[str, Any]) -> None:
     from aiida_workgraph.engine.workgraph import WorkGraphSpec
+    from aiida_workgraph.orm.workgraph import WorkGraphNode
 
     inputs = shallow_copy_nested_dict(inputs)
     wgdata = inputs.pop(WorkGraphSpec.WORKGRAPH_DATA_KEY, {})
@@ -221,12 +234,14 @@ def save_workgraph_data(node: Union[int, orm.Node], inputs: Dict[str, Any]) -> N
     short_wgdata = workgraph_to_short_json(wgdata)
     for name, task in wgdata['tasks'].items():
         task_states[name] = task['state']
-        task_processes[name] = task['process']
+        task_process = deserialize_safe(task['process']) if isinstance(task['process'], str) else task['process']
+        task_processes[name] = task_process.pk if task_process is not None else None
         task_actions[name] = task['action']
         # clean pickled executor before save to database
         clean_pickled_task_executor(task)
     node.task_states = task_states
     node.task_processes = task_processes
+    node.task_processes_version = WorkGraphNode.TASK_PROCESSES_VERSION
     node.task_actions = task_actions
     node.workgraph_data = wgdata
     node.workgraph_data_short = short_wgdata
@@ -251,21 +266,30 @@ def restore_workgraph_data_from_raw_inputs(raw_inputs: Dict[str, Any]) -> Dict[s
     return wgdata
 
 
-def load_workgraph_data(node: Union[int, orm.Node]) -> Optional[Dict[str, Any]]:
+def load_workgraph_data(node: Union[int, orm.Node], safe: bool = True) -> Optional[Dict[str, Any]]:
     """
     Get the workgraph data from the given process node.
+
+    :param safe: deserialize the task inputs with the safe loader, and skip them if they can not
+        be loaded. The engine restores the inputs with the full loader, as for its checkpoints.
     """
     from aiida.orm import load_node
+    from aiida.orm.utils.serialize import deserialize_unsafe
     from aiida_workgraph.engine.workgraph import WorkGraphSpec
 
     if isinstance(node, int):
         node = load_node(node)
     wgdata = node.base.attributes.get(WorkGraphSpec.WORKGRAPH_DATA_KEY)
-    try:
-        task_inputs = deserialize_safe(node.task_inputs or '')
-    except (yaml.constructor.ConstructorError, yaml.YAMLError):
-        LOGGER.info('Could not deserialize inputs. The workgraph is still loaded and tasks/outputs remain inspectable.')
-        task_inputs = {}
+    if safe:
+        try:
+            task_inputs = deserialize_safe(node.task_inputs or '')
+        except (yaml.constructor.ConstructorError, yaml.YAMLError):
+            LOGGER.info(
+                'Could not deserialize inputs. The workgraph is still loaded and tasks/outputs remain inspectable.'
+            )
+            task_inputs = {}
+    else:
+        task_inputs = deserialize_unsafe(node.task_inputs or '') or {}
 
     for name, data in task_inputs.items():
         wgdata['tasks'][name]['inputs'] = data
@@ -290,9 +314,12 @@ def get_parent_workgraphs(pk: int) -> List[List[str, int]]:
 
 
 def get_processes_latest(
-    pk: int, task_name: str = None, item_type: str = 'task'
+    pk: int, task_name: str = None, item_type: str = 'task', task_names: Optional[Iterable[str]] = None
 ) -> Dict[str, Dict[str, Union[int, str]]]:
-    """Get the latest info of all tasks from the process."""
+    """Get the latest info of all tasks from the process.
+
+    :param task_names: only get the info of these tasks, e.g. not the mapped tasks, whose processes are not queried.
+    """
     import aiida
     from aiida_workgraph.orm.workgraph import WorkGraphNode
 
@@ -316,21 +343,66 @@ def get_processes_latest(
             return tasks
         task_states = node.task_states
         task_processes = node.task_processes
-        task_names = [task_name] if task_name else task_states.keys()
+        task_timestamps = node.task_timestamps
+        if task_name:
+            task_names = [task_name]
+        elif task_names is not None:
+            task_names = [name for name in task_names if name in task_states]
+        else:
+            task_names = task_states.keys()
+        # the state of all the processes is fetched with one query, the nodes are not loaded
+        processes = query_task_processes({name: task_processes.get(name) for name in task_names})
         for name in task_names:
-            state = task_states[name]
-            task_process = deserialize_safe(task_processes.get(name, ''))
+            process = processes.get(name, {})
             tasks[name] = {
-                'pk': task_process.pk if task_process else None,
-                'process_type': task_process.process_type if task_process else '',
-                'state': state,
-                'ctime': task_process.ctime if task_process else None,
-                'mtime': task_process.mtime if task_process else None,
+                'pk': process.get('pk'),
+                'node_type': process.get('node_type', ''),
+                'process_type': process.get('process_type') or '',
+                'process_state': process.get('process_state'),
+                'state': task_states[name],
+                'ctime': process.get('ctime'),
+                'mtime': process.get('mtime'),
+                'timestamps': task_timestamps.get(name, {}),
             }
 
     return tasks
 
 
+def get_task_durations(pk: int) -> Dict[str, float]:
+    """Get the duration (in seconds) of the process of each task of a finished workgraph.
+
+    This can be used as the weights of the critical path priority policy of a similar workgraph,
+    see `WorkGraph.task_weights`.
+    """
+    durations = {}
+    for name, data in get_processes_latest(pk).items():
+        if data['state'] == 'FINISHED' and data['ctime'] is not None:
+            durations[name] = (data['mtime'] - data['ctime']).total_seconds()
+    return durations
+
+
+def get_task_delays(timestamps: Dict[str, float]) -> Dict[str, Optional[float]]:
+    """Compute the delays (in seconds) of a task from the timestamps of its lifecycle, see `Task.timestamps`.
+
+    - ``queue_wait``: from ready to submitted, e.g. the task waited for a slot of ``max_number_jobs``.
+    - ``run_time``: from submitted to finished.
+    - ``latency``: from finished to applied, the time taken by the engine to apply the results of the task.
+
+    A delay is None if one of its events was not recorded, e.g. the task is still running.
+    """
+
+    def delay(start: str, end: str) -> Optional[float]:
+        if start not in timestamps or end not in timestamps:
+            return None
+        return round(timestamps[end] - timestamps[start], 3)
+
+    return {
+        'queue_wait': delay('ready', 'submitted'),
+        'run_time': delay('submitted', 'finished'),
+        'latency': delay('finished', 'applied'),
+    }
+
+
 def get_or_create_code(
     computer: str = 'localhost',
     code_label: str = 'python3',
@@ -552,6 +624,21 @@ def serialize_graph_level_data(
     )
 
 
+def to_raw_python_data(data: Any) -> Any:
+    """Recursively deserialize the AiiDA data nodes of a value to raw Python data.
+
+    Unlike ``deserialize_to_raw_python_data``, the raw Python data, e.g. the results of an
+    ephemeral task, is kept as it is.
+    """
+    from aiida_pythonjob.data.deserializer import deserialize_to_raw_python_data
+
+    if isinstance(data, orm.Data):
+        return deserialize_to_raw_python_data(data)
+    if isinstance(data, dict):
+        return {key: to_raw_python_data(value) for key, value in data.items()}
+    return data
+
+
 def resolve_node_link_managers(data: Any) -> Any:
     """Recursively resolve all NodeLinksManagers either in a dictionary or a NodeLinksManager."""
     if isinstance(data, dict):
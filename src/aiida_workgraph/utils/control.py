@@ -23,10 +23,11 @@ def create_task_action(
 
 def get_task_runtime_info(node, name: str, key: str) -> str:
     """Get task state info from attributes."""
-    from aiida_workgraph.orm.utils import deserialize_safe
+    from aiida_workgraph.orm.utils import parse_task_process
 
     if key == 'process':
-        value = deserialize_safe(node.task_processes.get(name, ''))
+        identifier = parse_task_process(node.task_processes.get(name))
+        value = orm.load_node(identifier) if identifier is not None else None
     elif key == 'state':
         value = node.task_states.get(name, '')
     elif key == 'action':
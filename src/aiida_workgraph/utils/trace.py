@@ -0,0 +1,168 @@
+"""Export the timeline of a workgraph and its nested workgraphs in the trace event format.
+
+The trace can be opened with https://ui.perfetto.dev or ``chrome://tracing``. Every workgraph is a process
+of the trace, named after its path from the root workgraph, and every task is a thread of its workgraph. The
+slices of a task are built from its lifecycle timestamps, see ``WorkGraphNode.TASK_TIMESTAMP_EVENTS``: queued
+(ready to submitted), running (submitted to finished) and applying (finished to applied). For the workgraphs
+run by older versions, which do not record them, the running slice spans the ``ctime`` and ``mtime`` of the
+process of the task. A flow arrow links the task running a nested workgraph to the workgraph.
+
+The workgraphs are fetched level by level with bulk queries, and the events are written to the file as
+they are generated, so a trace with many tasks is never held in memory.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from aiida import orm
+from aiida_workgraph.orm.utils import query_task_processes
+from aiida_workgraph.orm.workgraph import WorkGraphNode
+
+# number of workgraphs of a level of the tree fetched in one query
+BATCH_SIZE = 500
+# the slices of a task: name suffix, start and end events
+TASK_PHASES = (
+    (' (queued)', 'ready', 'submitted'),
+    ('', 'submitted', 'finished'),
+    (' (applying)', 'finished', 'applied'),
+)
+
+
+def _query_workgraphs(pks: List[int]) -> Dict[int, Dict[str, Any]]:
+    """Fetch the label, times and task runtime info of many workgraphs with one query."""
+    keys = ('label', 'ctime', 'mtime', 'task_states', 'task_processes', 'task_timestamps')
+    project = [
+        'id',
+        'label',
+        'ctime',
+        'mtime',
+        f'attributes.{WorkGraphNode.TASK_STATES_KEY}',
+        f'attributes.{WorkGraphNode.TASK_PROCESSES_KEY}',
+        f'attributes.{WorkGraphNode.TASK_TIMESTAMPS_KEY}',
+    ]
+    query = orm.QueryBuilder().append(WorkGraphNode, filters={'id': {'in': pks}}, project=project)
+    return {pk: dict(zip(keys, row)) for pk, *row in query.iterall()}
+
+
+def _slice(name: str, pid: int, tid: int, start: float, end: float, origin: float, **args: Any) -> Dict[str, Any]:
+    """A complete event, the times are POSIX timestamps, the trace is in microseconds since ``origin``."""
+    return {
+        'name': name,
+        'ph': 'X',
+        'pid': pid,
+        'tid': tid,
+        'ts': round((start - origin) * 1e6),
+        'dur': max(round((end - start) * 1e6), 0),
+        'args': args,
+    }
+
+
+def _metadata(name: str, pid: int, tid: Optional[int], value: Any) -> Dict[str, Any]:
+    event = {'name': name, 'ph': 'M', 'pid': pid, 'args': {'name' if name.endswith('_name') else 'sort_index': value}}
+    if tid is not None:
+        event['tid'] = tid
+    return event
+
+
+def _task_slices(
+    name: str, timestamps: Dict[str, float], process: Dict[str, Any], pid: int, tid: int, origin: float, **args: Any
+) -> Iterator[Dict[str, Any]]:
+    """The slices of a task, from its timestamps or else from the times of its process."""
+    if process:
+        args = {**args, 'pk': process['pk'], 'process_type': process['process_type'] or ''}
+    if timestamps:
+        for suffix, start, end in TASK_PHASES:
+            if start in timestamps and end in timestamps:
+                yield _slice(f'{name}{suffix}', pid, tid, timestamps[start], timestamps[end], origin, **args)
+    elif process and process['ctime'] is not None:
+        yield _slice(name, pid, tid, process['ctime'].timestamp(), process['mtime'].timestamp(), origin, **args)
+
+
+def _task_start(timestamps: Dict[str, float], process: Dict[str, Any]) -> float:
+    if timestamps:
+        return min(timestamps.values())
+    if process and process['ctime'] is not None:
+        return process['ctime'].timestamp()
+    return float('inf')
+
+
+def iter_trace_events(pk: int) -> Iterator[Dict[str, Any]]:
+    """Generate the trace events of the workgraph ``pk`` and of all its nested workgraphs.
+
+    :raises ValueError: if the node is not a workgraph.
+    """
+    root = orm.load_node(pk)
+    if not isinstance(root, WorkGraphNode):
+        raise ValueError(f'Node<{pk}> is not a WorkGraph process.')
+    origin = root.ctime.timestamp()
+    pids = {pk: 1}
+    # the workgraphs of the current level: pk, path from the root, the (pid, tid) of the task that ran it
+    level: List[Tuple[int, str, Optional[Tuple[int, int]]]] = [(pk, root.label or str(pk), None)]
+    while level:
+        next_level = []
+        for index in range(0, len(level), BATCH_SIZE):
+            batch = level[index : index + BATCH_SIZE]
+            workgraphs = _query_workgraphs([item[0] for item in batch])
+            # the processes of the tasks of the whole batch are fetched with one query
+            processes = query_task_processes(
+                {
+                    (wg_pk, name): value
+                    for wg_pk, data in workgraphs.items()
+                    for name, value in (data['task_processes'] or {}).items()
+                }
+            )
+            for wg_pk, path, caller in batch:
+                if wg_pk not in workgraphs:
+                    continue
+                data = workgraphs[wg_pk]
+                pid = pids[wg_pk]
+                yield _metadata('process_name', pid, None, path)
+                yield _metadata('process_sort_index', pid, None, pid)
+                yield _metadata('thread_name', pid, 0, 'workgraph')
+                start, end = data['ctime'].timestamp(), data['mtime'].timestamp()
+                yield _slice(data['label'] or path, pid, 0, start, end, origin, pk=wg_pk)
+                if caller is not None:
+                    # a flow arrow from the slice of the task that ran the workgraph, to the workgraph
+                    flow = {'name': 'run', 'cat': 'graph', 'id': wg_pk, 'ts': round((start - origin) * 1e6)}
+                    yield {**flow, 'ph': 's', 'pid': caller[0], 'tid': caller[1]}
+                    yield {**flow, 'ph': 'f', 'bp': 'e', 'pid': pid, 'tid': 0}
+                task_states = data['task_states'] or {}
+                task_timestamps = data['task_timestamps'] or {}
+                names = sorted(
+                    task_states,
+                    key=lambda name: _task_start(task_timestamps.get(name), processes.get((wg_pk, name))),
+                )
+                for tid, name in enumerate(names, 1):
+                    timestamps = task_timestamps.get(name) or {}
+                    process = processes.get((wg_pk, name))
+                    slices = list(_task_slices(name, timestamps, process, pid, tid, origin, state=task_states[name]))
+                    if not slices:
+                        continue
+                    yield _metadata('thread_name', pid, tid, name)
+                    yield _metadata('thread_sort_index', pid, tid, tid)
+                    yield from slices
+                    if process and process['node_type'] == WorkGraphNode.class_node_type:
+                        pids[process['pk']] = len(pids) + 1
+                        next_level.append((process['pk'], f'{path}/{name}', (pid, tid)))
+        level = next_level
+
+
+def export_trace(pk: int, path: str) -> int:
+    """Write the timeline of the workgraph ``pk`` and of its nested workgraphs to a trace event JSON file.
+
+    :param pk: The pk of the workgraph process.
+    :param path: The path of the file, which can be opened with https://ui.perfetto.dev or ``chrome://tracing``.
+    :return: The number of events written.
+    """
+    count = 0
+    with open(path, 'w', encoding='utf-8') as handle:
+        handle.write('{"displayTimeUnit": "ms", "traceEvents": [\n')
+        for event in iter_trace_events(pk):
+            if count:
+                handle.write(',\n')
+            handle.write(json.dumps(event))
+            count += 1
+        handle.write('\n]}\n')
+    return count
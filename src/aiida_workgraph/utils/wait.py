@@ -0,0 +1,82 @@
+"""Wait for a workgraph, woken up by the state change broadcasts of its processes.
+
+Every process broadcasts its state changes through the communicator of the profile. Instead of
+checking the workgraph at a fixed interval, ``WorkGraph.wait`` checks it again as soon as the
+workgraph process, or the process of a task it waits for, changes its state. Without a broker,
+it polls with a backoff: first quickly, then less and less often, up to the given interval.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any, Callable, Iterator, Set
+
+LOGGER = logging.getLogger(__name__)
+
+TERMINATING_STATES = (
+    'KILLED',
+    'PAUSED',
+    'FINISHED',
+    'FAILED',
+    'CANCELLED',
+    'EXCEPTED',
+)
+
+
+def backoff(interval: float, subscribed: bool, start: float = 0.1) -> Iterator[float]:
+    """Yield the maximum delays between two checks of the workgraph.
+
+    When subscribed to the broadcasts, the workgraph is checked again when a broadcast is received,
+    or every ``interval`` seconds in case one is missed. Otherwise, the delay starts at ``start``
+    seconds and is doubled after every check, up to ``interval`` seconds.
+    """
+    delay = interval if subscribed else min(start, interval)
+    while True:
+        yield delay
+        delay = min(delay * 2, interval)
+
+
+class StateChangeListener:
+    """Call a function when one of the given processes broadcasts a state change.
+
+    The function is called on the thread of the communicator. If the profile has no broker, or it
+    can not be reached, :attr:`subscribed` is ``False`` and the caller must poll instead.
+    """
+
+    def __init__(self, notify: Callable[[], Any]):
+        """
+        :param notify: The function to call, without arguments.
+        """
+        self.notify = notify
+        # pks of the processes whose state changes are listened to
+        self.pks: Set[int] = set()
+        self._communicator = None
+        self._identifier = None
+
+    @property
+    def subscribed(self) -> bool:
+        return self._communicator is not None
+
+    def __enter__(self) -> 'StateChangeListener':
+        from aiida.manage import get_manager
+
+        try:
+            communicator = get_manager().get_communicator()
+            self._identifier = communicator.add_broadcast_subscriber(self.on_broadcast)
+            self._communicator = communicator
+        except Exception:  # pylint: disable=broad-except
+            LOGGER.debug('No communicator to listen to the state changes, polling instead.', exc_info=True)
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        if self._communicator is None:
+            return
+        try:
+            self._communicator.remove_broadcast_subscriber(self._identifier)
+        except Exception:  # pylint: disable=broad-except
+            LOGGER.debug('Failed to remove the broadcast subscriber.', exc_info=True)
+        self._communicator = None
+
+    def on_broadcast(self, _communicator: Any, _body: Any, sender: Any, subject: Any, _correlation_id: Any) -> None:
+        if sender in self.pks and str(subject).startswith('state_changed.'):
+            self.notify()
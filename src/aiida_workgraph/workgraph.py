@@ -68,6 +68,22 @@ class WorkGraph(node_graph.Graph):
         self.restart_process = None
         self.max_number_jobs = 1000000
         self.max_iteration = 1000000
+        # seconds during which the completed child processes are collected and applied in one batch,
+        # zero means that the completions are collected until the event loop is idle
+        self.coalesce_window = 0.0
+        # named pools limiting the number of tasks running at the same time, see `add_resource_pool`
+        self.resource_pools: Dict[str, Dict[str, Any]] = {}
+        # order in which the ready tasks are launched: `fifo` or `critical_path`
+        self.priority_policy = 'fifo'
+        # weights (e.g. expected durations) of the tasks for the `critical_path` policy, 1 by default
+        self.task_weights: Dict[str, float] = {}
+        # when the engine saves its checkpoints, see `set_checkpoint_policy`
+        self.checkpoint_policy: Dict[str, Any] = {
+            'policy': 'step',
+            'steps': 1,
+            'interval': 0.0,
+            'asynchronous': False,
+        }
         self._error_handlers = error_handlers or {}
         self.analyzer = GraphAnalysis(self)
 
@@ -246,6 +262,11 @@ class WorkGraph(node_graph.Graph):
                 'restart_process': self.restart_process.pk if self.restart_process else None,
                 'max_iteration': self.max_iteration,
                 'max_number_jobs': self.max_number_jobs,
+                'coalesce_window': self.coalesce_window,
+                'resource_pools': self.resource_pools,
+                'priority_policy': self.priority_policy,
+                'task_weights': self.task_weights,
+                'checkpoint_policy': self.checkpoint_policy,
             }
         )
         # save error handlers
@@ -258,50 +279,74 @@ class WorkGraph(node_graph.Graph):
 
     def wait(self, timeout: int = 600, tasks: dict = None, interval: int = 5) -> None:
         """
-        Periodically checks and waits for the AiiDA workgraph process to finish until a given timeout.
+        Waits for the AiiDA workgraph process to finish until a given timeout.
+
+        The workgraph is checked again whenever its process, or the process of one of the given tasks,
+        broadcasts a state change. Without a broker, it is checked with an increasing delay instead,
+        see `aiida_workgraph.utils.wait`.
 
         Args:
             timeout (int): The maximum time in seconds to wait for the process to finish. Defaults to 600.
             tasks (dict): Optional; specifies task states to wait for in the format {task_name: [acceptable_states]}.
-            interval (int): The time interval in seconds between checks. Defaults to 5.
+            interval (int): The maximum time interval in seconds between checks. Defaults to 5.
 
         Raises:
             TimeoutError: If the process does not finish within the given timeout.
         """
-        terminating_states = (
-            'KILLED',
-            'PAUSED',
-            'FINISHED',
-            'FAILED',
-            'CANCELLED',
-            'EXCEPTED',
-        )
-        start = time.time()
-        self.update()
-        finished = False
-
-        while not finished:
-            self.update()
-
-            if tasks is not None:
-                states = []
-                for name, value in tasks.items():
-                    flag = self.tasks[name].state in value
-                    states.append(flag)
-                finished = all(states)
-            else:
-                finished = self.state in terminating_states
-
-            if finished:
-                LOGGER.info('Process %s finished with state: %s', self.process.pk, self.state)
-                return
+        import threading
+        from aiida_workgraph.utils.wait import StateChangeListener, backoff
 
-            time.sleep(interval)
+        start = time.time()
+        event = threading.Event()
+        with StateChangeListener(event.set) as listener:
+            for delay in backoff(interval, listener.subscribed):
+                # a state change received during the check will trigger the next one
+                event.clear()
+                if self._is_wait_finished(tasks, listener):
+                    return
+                remaining = timeout - (time.time() - start)
+                if remaining <= 0:
+                    break
+                event.wait(min(delay, remaining))
+        raise TimeoutError(f'Timeout reached after {timeout} seconds while waiting for the WorkGraph: {self.pk}. ')
+
+    async def wait_async(self, timeout: int = 600, tasks: dict = None, interval: int = 5) -> None:
+        """The asynchronous version of `wait`, which does not block the event loop while waiting."""
+        import asyncio
+        from aiida_workgraph.utils.wait import StateChangeListener, backoff
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        event = asyncio.Event()
+        with StateChangeListener(lambda: loop.call_soon_threadsafe(event.set)) as listener:
+            for delay in backoff(interval, listener.subscribed):
+                event.clear()
+                if self._is_wait_finished(tasks, listener):
+                    return
+                remaining = timeout - (loop.time() - start)
+                if remaining <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(event.wait(), min(delay, remaining))
+                except asyncio.TimeoutError:
+                    pass
+        raise TimeoutError(f'Timeout reached after {timeout} seconds while waiting for the WorkGraph: {self.pk}. ')
+
+    def _is_wait_finished(self, tasks: Optional[dict], listener: Any) -> bool:
+        """Update the workgraph and check if the waiting is finished, see `wait`."""
+        from aiida_workgraph.utils.wait import TERMINATING_STATES
 
-            if time.time() - start > timeout:
-                raise TimeoutError(
-                    f'Timeout reached after {timeout} seconds while waiting for the WorkGraph: {self.process.pk}. '
-                )
+        self.update()
+        if tasks is not None:
+            # the processes of the tasks are created while the workgraph runs
+            listener.pks = {self.pk} | {self.tasks[name].pk for name in tasks if self.tasks[name].pk is not None}
+            finished = all(self.tasks[name].state in value for name, value in tasks.items())
+        else:
+            listener.pks = {self.pk}
+            finished = self.state in TERMINATING_STATES
+        if finished:
+            LOGGER.info('Process %s finished with state: %s', self.process.pk, self.state)
+        return finished
 
     def update(self) -> None:
         """
@@ -315,11 +360,9 @@ class WorkGraph(node_graph.Graph):
             return
 
         self.state = self.process.process_state.value.upper()
-        processes_data = get_processes_latest(self.pk)
+        # the mapped tasks are not in the workgraph, their processes are not queried
+        processes_data = get_processes_latest(self.pk, task_names=[task.name for task in self.tasks])
         for name, data in processes_data.items():
-            # the mapped tasks are not in the workgraph
-            if name not in self.tasks:
-                continue
             self.tasks[name].update_state(data)
 
         if self.widget is not None:
@@ -339,6 +382,11 @@ class WorkGraph(node_graph.Graph):
         for key in [
             'max_iteration',
             'max_number_jobs',
+            'coalesce_window',
+            'resource_pools',
+            'priority_policy',
+            'task_weights',
+            'checkpoint_policy',
             'connectivity',
         ]:
             if key in wgdata:
@@ -409,6 +457,21 @@ class WorkGraph(node_graph.Graph):
         wg.update()
         return wg
 
+    def export_trace(self, path: str) -> int:
+        """Write the timeline of the workgraph process and of its nested workgraphs to a trace event JSON file.
+
+        The file can be opened with https://ui.perfetto.dev or ``chrome://tracing``, see
+        :mod:`aiida_workgraph.utils.trace`.
+
+        :param path: The path of the file.
+        :return: The number of events written.
+        """
+        from aiida_workgraph.utils.trace import export_trace
+
+        if self.process is None:
+            raise ValueError('The workgraph has no process, run or submit it before exporting its trace.')
+        return export_trace(self.pk, path)
+
     def show(self) -> None:
         """
         Print the current state of the workgraph process.
@@ -539,6 +602,69 @@ class WorkGraph(node_graph.Graph):
                 continue
             self.links._append(link)
 
+    def add_resource_pool(
+        self,
+        name: str,
+        limit: int,
+        task_types: Optional[List[str]] = None,
+        computers: Optional[List[str]] = None,
+        tags: Optional[List[str]] = None,
+    ) -> None:
+        """Add a named pool limiting the number of its tasks that run at the same time.
+
+        A task belongs to the pool if it matches all the given criteria, e.g. the CALCJOB tasks
+        running on the computer `cluster`. The tasks waiting for a slot are launched as soon as
+        another task of the pool finishes.
+
+        Args:
+            name (str): The name of the pool.
+            limit (int): The maximum number of tasks of the pool running at the same time.
+            task_types (list, optional): The task types of the pool, e.g. `['CALCJOB', 'PYTHONJOB']`.
+            computers (list, optional): The labels of the computers of the pool.
+            tags (list, optional): The tasks with one of these tags belong to the pool, see `Task.tags`.
+        """
+        if not (task_types or computers or tags):
+            raise ValueError(f'Resource pool {name} must define at least one of task_types, computers or tags.')
+        if limit < 1:
+            raise ValueError(f'The limit of the resource pool {name} must be a positive integer, got {limit}.')
+        self.resource_pools[name] = {
+            'limit': limit,
+            'task_types': [task_type.upper() for task_type in task_types or []],
+            'computers': list(computers or []),
+            'tags': list(tags or []),
+        }
+
+    def set_checkpoint_policy(
+        self,
+        policy: str = 'step',
+        steps: int = 1,
+        interval: float = 0.0,
+        asynchronous: bool = False,
+    ) -> None:
+        """Set when the engine saves the checkpoints it is loaded from after a crash or a daemon restart.
+
+        A checkpoint is always saved after child processes are submitted, so that they are not submitted
+        again. The other checkpoints can be skipped, the tasks which ran inside the engine since the last
+        checkpoint run again when the process is loaded from it.
+
+        Args:
+            policy (str): `step` to save a checkpoint at every step of the engine, `steps` every `steps` steps,
+                `interval` every `interval` seconds at most, `awaitables` only after child processes are submitted.
+            steps (int): The number of steps between two checkpoints, for the `steps` policy.
+            interval (float): The minimum time in seconds between two checkpoints, for the `interval` policy.
+            asynchronous (bool): Serialize the checkpoints in a background thread instead of the event loop.
+                The checkpoints saved after child processes are submitted are always written immediately.
+        """
+        from aiida_workgraph.engine.checkpoint import validate_checkpoint_policy
+
+        validate_checkpoint_policy(policy, steps, interval)
+        self.checkpoint_policy = {
+            'policy': policy,
+            'steps': steps,
+            'interval': interval,
+            'asynchronous': asynchronous,
+        }
+
     def get_error_handlers(self) -> Dict[str, ErrorHandlerSpec]:
         """Get the error handlers."""
         return self._error_handlers
@@ -0,0 +1,185 @@
+"""In-process stand-in for the child processes of the engine, and the probes of the engine benchmarks.
+
+A CalcJob round-trip brings in transports, a scheduler and the broker, which hide the overhead of the
+engine itself. The :class:`MockProcessBackend` intercepts the submission of the given process classes:
+instead of running them, it creates their process node, and finishes it instantly or after a scripted
+delay, with outputs computed from the inputs. Everything else, e.g. the graph tasks launching a nested
+``WorkGraphEngine``, runs as usual.
+"""
+
+from __future__ import annotations
+
+import functools
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Type, Union
+
+import pytest
+from aiida import orm
+from aiida.calculations.arithmetic.add import ArithmeticAddCalculation
+from aiida.common.links import LinkType
+from aiida.engine.runners import Runner
+from aiida.manage import get_manager
+from plumpy.process_states import ProcessState
+from aiida_workgraph.engine.workgraph import WorkGraphEngine
+
+
+def add_outputs(inputs: Dict[str, Any]) -> Dict[str, orm.Data]:
+    """The outputs of a mocked ``ArithmeticAddCalculation``."""
+    return {'sum': orm.Int(inputs['x'].value + inputs['y'].value)}
+
+
+@dataclass
+class EngineMetrics:
+    """What the engine costs to run a workgraph, see :meth:`MockProcessBackend.measure`."""
+
+    # duration of every step of the engines, including the nested ones
+    step_times: List[float] = field(default_factory=list)
+    # number of INSERT, UPDATE and DELETE statements sent to the database
+    db_writes: int = 0
+    # peak of the traced memory, in bytes, None if the allocations were not traced
+    peak_memory: Optional[int] = None
+    elapsed: float = 0.0
+    child_processes: int = 0
+
+    def summary(self, label: str) -> str:
+        steps = len(self.step_times)
+        mean = sum(self.step_times) / steps if steps else 0.0
+        maximum = max(self.step_times, default=0.0)
+        memory = 'n/a' if self.peak_memory is None else f'{self.peak_memory / 1024**2:.1f} MiB'
+        return (
+            f'{label}: {self.child_processes} child processes, {steps} steps, '
+            f'step time mean {mean * 1e3:.2f} ms max {maximum * 1e3:.2f} ms, '
+            f'{self.db_writes} DB writes, peak memory {memory}, total {self.elapsed:.2f} s'
+        )
+
+
+class MockProcessBackend:
+    """Create and finish the process nodes of the intercepted process classes in the event loop of the engine.
+
+    :param process_classes: the process classes to intercept, with the function returning the output nodes
+        of a process from its inputs.
+    :param delay: the delay, in seconds, before a process finishes, or a function returning it from the name
+        of the task. By default, the processes finish as soon as the event loop is idle.
+    """
+
+    def __init__(
+        self,
+        process_classes: Dict[Type, Callable[[Dict[str, Any]], Dict[str, orm.Data]]],
+        delay: Union[float, Callable[[str], float]] = 0.0,
+    ):
+        self.process_classes = process_classes
+        self.delay = delay
+        # name, inputs and output function of the created processes which are not finished yet, indexed by pk
+        self._running: Dict[int, Tuple[str, Dict[str, Any], Callable]] = {}
+        self.launched = 0
+
+    def install(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        submit = WorkGraphEngine.submit
+        call_on_process_finish = Runner.call_on_process_finish
+        backend = self
+
+        def mock_submit(process, process_class, inputs=None, **kwargs):
+            if process_class not in backend.process_classes:
+                return submit(process, process_class, inputs, **kwargs)
+            return backend.create(process, process_class, {**(inputs or {}), **kwargs})
+
+        def mock_call_on_process_finish(runner, pk, callback):
+            if pk not in backend._running:
+                return call_on_process_finish(runner, pk, callback)
+            backend.schedule(runner, pk, callback)
+
+        monkeypatch.setattr(WorkGraphEngine, 'submit', mock_submit)
+        monkeypatch.setattr(Runner, 'call_on_process_finish', mock_call_on_process_finish)
+
+    def create(self, parent: WorkGraphEngine, process_class: Type, inputs: Dict[str, Any]) -> orm.ProcessNode:
+        """Store the node of a running process, as the submission would, without running it."""
+        label = inputs.get('metadata', {}).get('call_link_label', process_class.__name__)
+        node = orm.CalcJobNode()
+        node.process_type = process_class.build_process_type()
+        node.label = label
+        node.set_process_state(ProcessState.WAITING)
+        node.base.links.add_incoming(parent.node, LinkType.CALL_CALC, label)
+        for key, value in inputs.items():
+            if isinstance(value, orm.Data):
+                value.store()
+                node.base.links.add_incoming(value, LinkType.INPUT_CALC, key)
+        node.store()
+        self._running[node.pk] = (label, inputs, self.process_classes[process_class])
+        self.launched += 1
+        return node
+
+    def schedule(self, runner: Runner, pk: int, callback: Callable[[], Any]) -> None:
+        """Finish the process after its delay, then call the callback of the engine."""
+        name = self._running[pk][0]
+        delay = self.delay(name) if callable(self.delay) else self.delay
+        if delay > 0:
+            runner.loop.call_later(delay, self.finish, pk, callback)
+        else:
+            runner.loop.call_soon(self.finish, pk, callback)
+
+    def finish(self, pk: int, callback: Callable[[], Any]) -> None:
+        _, inputs, outputs = self._running.pop(pk)
+        node = orm.load_node(pk)
+        for label, output in outputs(inputs).items():
+            output.base.links.add_incoming(node, LinkType.CREATE, label)
+            output.store()
+        node.set_process_state(ProcessState.FINISHED)
+        node.set_exit_status(0)
+        node.seal()
+        callback()
+
+    @contextmanager
+    def measure(self, monkeypatch: pytest.MonkeyPatch, memory: bool = False) -> Iterator[EngineMetrics]:
+        """Collect the metrics of the engine while running a workgraph.
+
+        :param memory: trace the allocations to get the peak memory, this slows down the steps.
+        """
+        from sqlalchemy import event
+
+        metrics = EngineMetrics()
+        do_step = WorkGraphEngine._do_step
+
+        @functools.wraps(do_step)
+        def timed_step(process):
+            start = time.perf_counter()
+            try:
+                return do_step(process)
+            finally:
+                metrics.step_times.append(time.perf_counter() - start)
+
+        def count_writes(_conn, _cursor, statement, *args):
+            if statement.lstrip()[:6].upper() in ('INSERT', 'UPDATE', 'DELETE'):
+                metrics.db_writes += 1
+
+        monkeypatch.setattr(WorkGraphEngine, '_do_step', timed_step)
+        bind = get_manager().get_profile_storage().get_session().get_bind()
+        event.listen(bind, 'before_cursor_execute', count_writes)
+        launched = self.launched
+        if memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            yield metrics
+        finally:
+            metrics.elapsed = time.perf_counter() - start
+            if memory:
+                metrics.peak_memory = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            event.remove(bind, 'before_cursor_execute', count_writes)
+            monkeypatch.setattr(WorkGraphEngine, '_do_step', do_step)
+            metrics.child_processes = self.launched - launched
+
+
+@pytest.fixture
+def mock_backend(monkeypatch):
+    """Return a function installing a :class:`MockProcessBackend`, which mocks ``ArithmeticAddCalculation``."""
+
+    def _mock_backend(delay: Union[float, Callable[[str], float]] = 0.0) -> MockProcessBackend:
+        backend = MockProcessBackend({ArithmeticAddCalculation: add_outputs}, delay=delay)
+        backend.install(monkeypatch)
+        return backend
+
+    return _mock_backend
@@ -0,0 +1,75 @@
+"""Benchmark of the size and the time of the checkpoints against the size of the graph.
+
+The reference checkpoint keeps the workgraph data three times: in the context, and in the raw
+and the parsed inputs of the process. The engine leaves it out of the checkpoint, and rebuilds
+the graph from the process node when the checkpoint is loaded.
+
+The 100 and 1k tasks benchmarks run by default, and check that the checkpoint is several times
+smaller than the reference one. Set ``WORKGRAPH_BENCHMARK_LARGE=1`` to run the 10k tasks one.
+"""
+
+import os
+import time
+
+import plumpy
+import pytest
+from aiida.engine.processes.process import Process
+from aiida.engine.utils import instantiate_process
+from aiida.manage import get_manager
+from aiida_workgraph import WorkGraph, task
+from aiida_workgraph.engine.workgraph import WorkGraphEngine
+from aiida_workgraph.utils import restore_workgraph_data_from_raw_inputs
+
+LARGE = bool(os.environ.get('WORKGRAPH_BENCHMARK_LARGE'))
+
+
+@task
+def add(x, y):
+    return x + y
+
+
+def setup_process(n):
+    """Create the engine process of a graph with n tasks, and set it up as the first step does."""
+    wg = WorkGraph(f'checkpoint_size_{n}')
+    result = wg.add_task(add, x=0, y=1).outputs.result
+    for i in range(1, n):
+        result = wg.add_task(add, x=result, y=i).outputs.result
+    runner = get_manager().get_runner()
+    process = instantiate_process(runner, WorkGraphEngine, **wg.to_engine_inputs())
+    process.setup()
+    return process
+
+
+def save_and_load(process):
+    """Return the size of the checkpoint, and the time to save and to load it."""
+    runner = process.runner
+    start = time.perf_counter()
+    runner.persister.save_checkpoint(process)
+    save_time = time.perf_counter() - start
+    start = time.perf_counter()
+    bundle = runner.persister.load_checkpoint(process.pid)
+    loaded = bundle.unbundle(plumpy.LoadSaveContext(loop=runner.loop, runner=runner))
+    load_time = time.perf_counter() - start
+    assert len(loaded.wg.tasks) == len(process.wg.tasks)
+    return len(process.node.checkpoint), save_time, load_time
+
+
+@pytest.mark.parametrize(
+    'n',
+    [
+        100,
+        1000,
+        pytest.param(10000, marks=pytest.mark.skipif(not LARGE, reason='set WORKGRAPH_BENCHMARK_LARGE=1 to run')),
+    ],
+)
+def test_checkpoint_size(n, monkeypatch):
+    process = setup_process(n)
+    slim = save_and_load(process)
+    # the reference checkpoint, with the whole workgraph data in the context and the inputs
+    process.ctx._wgdata = restore_workgraph_data_from_raw_inputs(process.inputs)
+    monkeypatch.setattr(WorkGraphEngine, 'encode_input_args', Process.encode_input_args)
+    full = save_and_load(process)
+    print(f'\n{n} tasks: checkpoint size, save time, load time')
+    for label, (size, save_time, load_time) in (('full', full), ('slim', slim)):
+        print(f'  {label}: {size / 1024:.1f} KiB, {save_time * 1e3:.1f} ms, {load_time * 1e3:.1f} ms')
+    assert slim[0] * 3 < full[0]
@@ -0,0 +1,134 @@
+"""Benchmark of the overhead of the engine: scheduler, task states, awaitables and checkpoints.
+
+The ``ArithmeticAddCalculation`` jobs are replaced by the in-process stand-in of ``conftest.py``, which
+finishes them instantly or after a scripted delay, so that the transports and the scheduler of the jobs
+do not hide the cost of the engine. Each benchmark prints the number of steps, the step time, the number
+of database writes and the peak memory. It checks that the number of steps and of database writes grows
+linearly with the size of the graph, which catches the regressions doing some work for every task at
+every step.
+
+The benchmarks run on small graphs by default. Set ``WORKGRAPH_BENCHMARK_LARGE=1`` to run the 10k items
+Map. The peak memory is measured by tracing the allocations, which slows down the steps; set
+``WORKGRAPH_BENCHMARK_TIMING=1`` to measure the step time without tracing.
+"""
+
+import os
+from typing import Annotated
+
+import pytest
+from aiida.calculations.arithmetic.add import ArithmeticAddCalculation
+from aiida_workgraph import Map, While, WorkGraph, task
+from aiida_workgraph import socket_spec as spec
+
+LARGE = bool(os.environ.get('WORKGRAPH_BENCHMARK_LARGE'))
+TIMING = bool(os.environ.get('WORKGRAPH_BENCHMARK_TIMING'))
+
+AddJob = task(ArithmeticAddCalculation)
+
+
+@task()
+def sum_values(data: Annotated[dict, spec.dynamic(int)]):
+    return sum(data.values())
+
+
+def build_chain(n):
+    with WorkGraph(f'chain_{n}') as wg:
+        result = AddJob(x=0, y=1).sum
+        for _ in range(1, n):
+            result = AddJob(x=result, y=1).sum
+        wg.outputs.result = result
+    return wg, n
+
+
+def build_fan_out_fan_in(n):
+    with WorkGraph(f'fan_out_fan_in_{n}') as wg:
+        source = AddJob(x=0, y=1).sum
+        branches = {f'branch{i}': AddJob(x=source, y=i).sum for i in range(n)}
+        wg.outputs.result = sum_values(data=branches).result
+    return wg, n + n * (n - 1) // 2
+
+
+def build_map(n):
+    with WorkGraph(f'map_{n}') as wg:
+        with Map({f'item{i}': i for i in range(n)}) as map_zone:
+            map_zone.gather({'result': AddJob(x=map_zone.item.value, y=1).sum})
+        wg.outputs.result = sum_values(data=map_zone.outputs.result).result
+    return wg, n + n * (n - 1) // 2
+
+
+def build_nested_while(n, inner=3):
+    """n iterations of an outer While, each running an inner While of ``inner`` iterations."""
+    with WorkGraph(f'nested_while_{n}') as wg:
+        wg.ctx = {'total': 0}
+        with While(True, max_iterations=n):
+            with While(True, max_iterations=inner):
+                total = AddJob(x=wg.ctx.total, y=1).sum
+                wg.ctx.total = total
+        wg.outputs.result = total
+    return wg, n * inner
+
+
+@task.graph
+def add_chain(x, n):
+    for _ in range(int(n)):
+        x = AddJob(x=x, y=1).sum
+    return x
+
+
+def build_nested_graphs(n, inner=3):
+    """A chain of n graph tasks, each running a chain of ``inner`` jobs in a nested engine."""
+    with WorkGraph(f'nested_graphs_{n}') as wg:
+        result = 0
+        for _ in range(n):
+            result = add_chain(x=result, n=inner).result
+        wg.outputs.result = result
+    return wg, n * inner
+
+
+def run_benchmark(backend, monkeypatch, build, n):
+    wg, expected = build(n)
+    with backend.measure(monkeypatch, memory=not TIMING) as metrics:
+        wg.run()
+    assert wg.process.is_finished_ok
+    assert wg.outputs.result.value == expected
+    print(f'\n{metrics.summary(wg.name)}')
+    return metrics
+
+
+def check_linear(small, large):
+    """The size of the graph is doubled, the number of steps and of DB writes should at most double."""
+    assert len(large.step_times) < 2.5 * len(small.step_times)
+    assert large.db_writes < 2.5 * small.db_writes
+
+
+@pytest.mark.parametrize(
+    'build, n',
+    [
+        (build_chain, 20),
+        (build_fan_out_fan_in, 50),
+        (build_map, 50),
+    ],
+)
+def test_engine_overhead_scaling(mock_backend, monkeypatch, build, n):
+    backend = mock_backend()
+    small = run_benchmark(backend, monkeypatch, build, n)
+    large = run_benchmark(backend, monkeypatch, build, 2 * n)
+    check_linear(small, large)
+
+
+@pytest.mark.parametrize('build', [build_nested_while, build_nested_graphs])
+def test_engine_overhead_nested(mock_backend, monkeypatch, build):
+    metrics = run_benchmark(mock_backend(), monkeypatch, build, 4)
+    assert metrics.child_processes == 12
+
+
+def test_engine_overhead_scripted_delay(mock_backend, monkeypatch):
+    """The branches finish at different times, so the completions come in several batches."""
+    backend = mock_backend(delay=lambda name: 0.01 * (sum(name.encode()) % 5))
+    metrics = run_benchmark(backend, monkeypatch, build_fan_out_fan_in, 50)
+    assert len(metrics.step_times) < 50
+
+
+@pytest.mark.skipif(not LARGE, reason='set WORKGRAPH_BENCHMARK_LARGE=1 to run')
+def test_engine_overhead_large_map(mock_backend, monkeypatch):
+    run_benchmark(mock_backend(), monkeypatch, build_map, 10000)
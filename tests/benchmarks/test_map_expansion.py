@@ -0,0 +1,218 @@
+"""Benchmark of the expansion of the items of a Map zone.
+
+For every item, the engine clones the template tasks of the zone. The reference clone
+serializes the template with ``to_dict`` and rebuilds the task, including its spec, from
+the serialized data. The engine serializes each template only once, and builds the mapped
+tasks from the spec object of the template, which is shared by all of them.
+
+The 1k items benchmark runs by default and checks that each template is serialized once, and
+the memory per item is checked against the reference clone. Set ``WORKGRAPH_BENCHMARK_TIMING=1``
+to also compare the time per item, and ``WORKGRAPH_BENCHMARK_LARGE=1`` to run the 10k and 100k
+items ones. The memory is measured on fewer items, since tracing the allocations slows down the
+expansion.
+"""
+
+import logging
+import os
+import time
+import tracemalloc
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from aiida.common import AttributeDict
+from aiida_workgraph import Map, WorkGraph, task
+from aiida_workgraph.engine.profiler import EngineProfiler
+from aiida_workgraph.engine.runtime_state import RuntimeStateStore
+from aiida_workgraph.engine.task_manager import TaskManager
+from aiida_workgraph.task import Task
+
+LARGE = bool(os.environ.get('WORKGRAPH_BENCHMARK_LARGE'))
+TIMING = bool(os.environ.get('WORKGRAPH_BENCHMARK_TIMING'))
+
+
+@task
+def add(x, y):
+    return x + y
+
+
+def build_task_manager():
+    with WorkGraph('map_expansion') as wg:
+        with Map({'item': 0}) as map_zone:
+            result = add(x=map_zone.item.value, y=1).result
+            result = add(x=result, y=2).result
+            map_zone.gather({'result': result})
+    wg.connectivity = wg.build_connectivity()
+    # a minimal engine process, the runtime info is kept in memory
+    node = SimpleNamespace(base=SimpleNamespace(attributes=SimpleNamespace(get=lambda key, default=None: default)))
+    process = SimpleNamespace(wg=wg, node=node)
+    process.profiler = EngineProfiler(process, hooks=[])
+    process.runtime_state = RuntimeStateStore(process)
+    ctx_manager = SimpleNamespace(ctx=AttributeDict({'_task_results': {}}))
+    task_manager = TaskManager(ctx_manager, logging.getLogger(__name__), None, process, None)
+    process.task_manager = task_manager
+    task_manager.scheduler.build(
+        (
+            (task.name, task.parent.name if task.parent else None, wg.connectivity['zone'][task.name]['input_tasks'])
+            for task in wg.tasks
+        )
+    )
+    return task_manager, wg.tasks[map_zone.name]
+
+
+def full_copy_task(task_manager, name, prefix, zone):
+    """The reference clone: serialize the template and rebuild the task from the data."""
+    wg = task_manager.process.wg
+    if not wg.tasks[name].mapped_tasks:
+        wg.tasks[name].mapped_tasks = {}
+    task_data = wg.tasks[name].to_dict()
+    task_data['name'] = f'{prefix}_{name}'
+    task_data['map_data'] = {'parent': name, 'prefix': prefix, 'zone': zone}
+    task_data['uuid'] = str(uuid.uuid4())
+    task_manager.ctx._task_results[task_data['name']] = {}
+    task_manager.state_manager.set_task_runtime_info(task_data['name'], 'state', 'PLANNED')
+    task_manager.state_manager.set_task_runtime_info(task_data['name'], 'action', '')
+    new_task = wg.add_task_from_dict(task_data)
+    wg.tasks[name].mapped_tasks[prefix] = new_task
+    return new_task
+
+
+def expand(n, full_copy=False):
+    """Expand n items, return the time per item."""
+    task_manager, zone = build_task_manager()
+    number_of_tasks = len(task_manager.process.wg.tasks) + n * len(task_manager.get_all_children(zone.name))
+    if full_copy:
+        task_manager.copy_task = lambda name, prefix, zone=None, restore=False: full_copy_task(
+            task_manager, name, prefix, zone
+        )
+    start = time.perf_counter()
+    for i in range(n):
+        task_manager.generate_mapped_tasks(zone, f'item{i}')
+    elapsed = time.perf_counter() - start
+    assert len(task_manager.process.wg.tasks) == number_of_tasks
+    return elapsed / n
+
+
+def memory_per_item(n, full_copy=False):
+    tracemalloc.start()
+    expand(n, full_copy=full_copy)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return memory / n
+
+
+@pytest.mark.parametrize(
+    'n',
+    [
+        1000,
+        pytest.param(10000, marks=pytest.mark.skipif(not LARGE, reason='set WORKGRAPH_BENCHMARK_LARGE=1 to run')),
+        pytest.param(100000, marks=pytest.mark.skipif(not LARGE, reason='set WORKGRAPH_BENCHMARK_LARGE=1 to run')),
+    ],
+)
+def test_expand_items(n, monkeypatch):
+    serialized = []
+    to_dict = Task.to_dict
+
+    def counting_to_dict(self, *args, **kwargs):
+        serialized.append(self.name)
+        return to_dict(self, *args, **kwargs)
+
+    monkeypatch.setattr(Task, 'to_dict', counting_to_dict)
+    shared_time = expand(n)
+    # the templates are serialized once, whatever the number of items
+    assert sorted(serialized) == ['add', 'add1', 'gather_item', 'map_item']
+    print(f'\n{n} items, time per item: shared template {shared_time * 1e3:.2f} ms')
+    if TIMING:
+        full_time = expand(n, full_copy=True)
+        print(f'{n} items, time per item: full copy {full_time * 1e3:.2f} ms')
+        assert shared_time < full_time
+
+
+def test_expand_items_memory():
+    """The traced memory does not depend on the load of the machine, the comparison runs by default."""
+    full_memory = memory_per_item(200, full_copy=True)
+    shared_memory = memory_per_item(200)
+    print(f'\nmemory per item: full copy {full_memory / 1024:.1f} KiB, shared template {shared_memory / 1024:.1f} KiB')
+    assert shared_memory < 0.9 * full_memory
+
+
+def test_mapped_task_data_is_copied():
+    """The nested data of a mapped task is not shared with the template, the input values are."""
+    from aiida_workgraph.engine.task_manager import copy_containers
+
+    value = object()
+    data = {'inputs': {'x': {'value': value}}, 'tags': ['a']}
+    copied = copy_containers(data)
+    assert copied == data
+    assert copied['inputs']['x'] is not data['inputs']['x'] and copied['tags'] is not data['tags']
+    assert copied['inputs']['x']['value'] is value
+
+
+def test_mapped_task_shares_template_spec():
+    task_manager, zone = build_task_manager()
+    task_manager.generate_mapped_tasks(zone, 'item0')
+    task_manager.generate_mapped_tasks(zone, 'item1')
+    wg = task_manager.process.wg
+    for template in zone.children:
+        first = wg.tasks[f'item0_{template.name}']
+        second = wg.tasks[f'item1_{template.name}']
+        assert first.spec is template.spec and second.spec is template.spec
+        assert first.map_data == {'parent': template.name, 'prefix': 'item0', 'zone': zone.name}
+        assert first.uuid != second.uuid
+        assert first.inputs is not second.inputs
+    # the links are resolved to the tasks of the same item
+    assert wg.tasks['item1_add1'].inputs.x._links[0].from_task is wg.tasks['item1_add']
+
+
+def test_finished_items_are_released():
+    """The tasks of a finished item are removed once its results are gathered."""
+    task_manager, zone = build_task_manager()
+    wg = task_manager.process.wg
+    number_of_tasks, number_of_links = len(wg.tasks), len(wg.links)
+    children = task_manager.get_all_children(zone.name)
+    task_manager.map_expanded[zone.name] = {}
+    task_manager.map_pending[zone.name] = {
+        'chunk_size': 0,
+        'batched': False,
+        'source': {'item0': 0, 'item1': 1},
+        'keys': ['item0', 'item1'],
+        'next': 0,
+    }
+    task_manager.expand_map_items(zone.name)
+    assert len(wg.tasks) == number_of_tasks + 2 * len(children)
+    links_per_item = (len(wg.links) - number_of_links) // 2
+    task_manager.ctx._task_results[f'item0_{zone.gather_item_task.name}'] = {'result': 3}
+    for name in children:
+        task_manager.state_manager.set_task_runtime_info(f'item0_{name}', 'state', 'FINISHED')
+    task_manager.expand_map_zones()
+    # only the tasks of the running item are left
+    assert len(wg.tasks) == number_of_tasks + len(children)
+    assert len(wg.links) == number_of_links + links_per_item
+    assert all(f'item0_{name}' not in wg.tasks for name in children)
+    assert all(f'item0_{name}' not in task_manager.ctx._task_results for name in children)
+    assert all(f'item0_{name}' not in task_manager.scheduler._order for name in children)
+    assert list(task_manager.map_expanded[zone.name]) == ['item1']
+    assert task_manager.state_manager.map_gathered[zone.name] == {'item0': {'result': {'item0': 3}}}
+    # the states are kept to inspect the tasks
+    assert task_manager.state_manager.get_task_runtime_info(f'item0_{children[0]}', 'state') == 'FINISHED'
+
+
+def test_unfinished_mapped_tasks_are_counted():
+    """A template is checked once all its mapped tasks are finished, without scanning them."""
+    task_manager, zone = build_task_manager()
+    state_manager = task_manager.state_manager
+    task_manager.generate_mapped_tasks(zone, 'item0')
+    task_manager.generate_mapped_tasks(zone, 'item1')
+    state_manager.pop_templates_to_update()
+    children = task_manager.get_all_children(zone.name)
+    assert state_manager.unfinished_mapped == {name: 2 for name in children}
+    state_manager.set_task_runtime_info('item0_add', 'state', 'FINISHED')
+    state_manager.set_task_runtime_info('item1_add', 'state', 'RUNNING')
+    assert state_manager.unfinished_mapped['add'] == 1
+    assert 'add' not in state_manager.templates_to_update
+    state_manager.set_task_runtime_info('item1_add', 'state', 'FAILED')
+    assert state_manager.unfinished_mapped['add'] == 0
+    assert 'add' in state_manager.templates_to_update
+    # a reset task is counted again
+    state_manager.set_task_runtime_info('item1_add', 'state', 'PLANNED')
+    assert state_manager.unfinished_mapped['add'] == 1
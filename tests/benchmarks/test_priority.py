@@ -0,0 +1,107 @@
+"""Simulation benchmark of the priority policies of the scheduler under a concurrency cap.
+
+Synthetic DAGs are "executed" with a discrete-event simulation: the tasks are launched through
+the scheduler and a resource pool, and finish after their duration. With ``fifo`` the ready tasks
+are launched in the order of the graph, so a wide branch declared first can starve a long chain.
+``critical_path`` launches the tasks with the longest remaining path first.
+"""
+
+import heapq
+import random
+from types import SimpleNamespace
+from aiida_workgraph.engine.scheduler import TaskScheduler
+
+
+def simulate(tasks, durations, limit, policy):
+    """Return the makespan of the graph.
+
+    :param tasks: (name, input task names) of every task, in the order of the graph.
+    :param durations: duration of every task.
+    """
+    states = {}
+    scheduler = TaskScheduler(lambda name: states.get(name, 'PLANNED'))
+    scheduler.build((name, None, inputs) for name, inputs in tasks)
+    scheduler.set_priority_policy(policy, durations.get)
+    scheduler.resource_pools.configure({'cap': {'limit': limit, 'task_types': ['CALCJOB']}})
+    task_objects = {name: SimpleNamespace(name=name, task_type='CALCJOB', tags=[], inputs=None) for name, _ in tasks}
+
+    def set_state(name, state):
+        old_state = states.get(name, 'PLANNED')
+        states[name] = state
+        scheduler.on_state_changed(name, old_state, state)
+
+    now = 0.0
+    events = []
+    while True:
+        for name in scheduler.pop_ready():
+            task = task_objects[name]
+            pool = scheduler.resource_pools.get_full_pool(task)
+            if pool is not None:
+                scheduler.resource_pools.wait(pool, name)
+                continue
+            scheduler.mark_executed(name)
+            scheduler.resource_pools.acquire(task)
+            set_state(name, 'RUNNING')
+            heapq.heappush(events, (now + durations[name], name))
+        if not events:
+            break
+        now, name = heapq.heappop(events)
+        set_state(name, 'FINISHED')
+    assert all(states.get(name) == 'FINISHED' for name, _ in tasks)
+    return now
+
+
+def chain_behind_wide_branch(width, length):
+    """A wide branch of independent tasks declared before a long chain."""
+    tasks = [(f'wide{i}', []) for i in range(width)]
+    tasks.extend((f'chain{i}', [f'chain{i - 1}'] if i else []) for i in range(length))
+    durations = {name: 1.0 for name, _ in tasks}
+    return tasks, durations
+
+
+def random_layered_dag(seed, layers=8, width=30, max_inputs=3):
+    rng = random.Random(seed)
+    tasks, durations = [], {}
+    previous = []
+    for layer in range(layers):
+        current = []
+        for i in range(rng.randint(1, width)):
+            name = f'l{layer}_{i}'
+            inputs = rng.sample(previous, min(len(previous), rng.randint(0, max_inputs)))
+            tasks.append((name, inputs))
+            durations[name] = rng.choice([1.0, 1.0, 2.0, 5.0, 20.0])
+            current.append(name)
+        previous = current
+    return tasks, durations
+
+
+def test_chain_behind_wide_branch():
+    tasks, durations = chain_behind_wide_branch(width=40, length=10)
+    fifo = simulate(tasks, durations, limit=4, policy='fifo')
+    critical_path = simulate(tasks, durations, limit=4, policy='critical_path')
+    print(f'\nchain behind a wide branch: fifo {fifo}, critical path {critical_path}')
+    # fifo runs the chain after the wide branch: 40 / 4 + 10
+    assert fifo == 20
+    # the chain starts first and runs alongside the wide branch: ceil((40 + 10) / 4)
+    assert critical_path == 13
+
+
+def test_random_dags_benchmark():
+    fifo, critical_path = 0.0, 0.0
+    for seed in range(20):
+        tasks, durations = random_layered_dag(seed)
+        fifo += simulate(tasks, durations, limit=5, policy='fifo')
+        critical_path += simulate(tasks, durations, limit=5, policy='critical_path')
+    print(f'\ntotal makespan of 20 random DAGs: fifo {fifo}, critical path {critical_path}')
+    assert critical_path < fifo
+
+
+def test_rank():
+    states = {}
+    scheduler = TaskScheduler(lambda name: states.get(name, 'PLANNED'))
+    scheduler.build([('a', None, []), ('b', None, ['a']), ('c', None, ['a']), ('d', None, ['b'])])
+    scheduler.set_priority_policy('critical_path', {'a': 1, 'b': 2, 'c': 10, 'd': 3}.get)
+    assert scheduler.get_rank('d') == 3
+    assert scheduler.get_rank('b') == 5
+    assert scheduler.get_rank('a') == 11
+    assert sorted(['b', 'c', 'd'], key=scheduler.priority_key) == ['c', 'b', 'd']
@@ -268,3 +268,20 @@ def create_workgraph_process_node():
         return node
 
     return process_node
+
+
+@pytest.fixture
+def reload_from_checkpoint():
+    """Reload a process from its last checkpoint and run it to the end, as the daemon does after a crash."""
+
+    def reload(node):
+        import plumpy
+        from aiida.manage import get_manager
+
+        runner = get_manager().get_runner()
+        bundle = runner.persister.load_checkpoint(node.pk)
+        process = bundle.unbundle(plumpy.LoadSaveContext(loop=runner.loop, runner=runner))
+        process.execute()
+        return process.node
+
+    return reload
@@ -0,0 +1,266 @@
+import pytest
+from typing import Any
+from aiida import orm
+from aiida.orm.utils.serialize import deserialize_unsafe
+from plumpy.processes import BundleKeys
+from typing import Annotated
+from aiida_workgraph import Map, WorkGraph, task, namespace, dynamic, meta
+from aiida_workgraph.task import Task
+from node_graph import RuntimeExecutor
+from node_graph.task_spec import TaskSpec
+
+
+class Crash(BaseException):
+    """Stop the engine as if the worker was killed, it is not caught by the engine."""
+
+
+CRASHED = []
+
+
+def crash_once(x: Any, at: Any = None) -> Any:
+    """Crash the first time it is called, or the first time it is called with `x == at`."""
+    if not CRASHED and (at is None or x == at):
+        CRASHED.append(True)
+        raise Crash()
+    return x
+
+
+class CrashOnceTask(Task):
+    """A normal task that crashes the engine the first time it runs."""
+
+    _default_spec = TaskSpec(
+        identifier='test.crash_once',
+        task_type='Normal',
+        inputs=namespace(x=Any, at=Annotated[Any, meta(required=False)]),
+        outputs=namespace(result=Any),
+        executor=RuntimeExecutor.from_callable(crash_once),
+        base_class_path=f'{__name__}.CrashOnceTask',
+    )
+
+
+@task()
+def add(x, y):
+    return x + y
+
+
+@task()
+async def async_add(x, y):
+    """Awaited by the engine, which saves a checkpoint while it waits."""
+    return x + y
+
+
+@task()
+def generate_data(n: int) -> Annotated[dict, namespace(data=dynamic(int))]:
+    return {'data': {f'key_{i}': i for i in range(n)}}
+
+
+@task()
+def calc_sum(data: Annotated[dict, dynamic(orm.Int)]) -> int:
+    return sum(data.values())
+
+
+def run_until_crash(wg: WorkGraph) -> orm.ProcessNode:
+    """Run the workgraph until the engine crashes, return the process node left behind."""
+    CRASHED.clear()
+    with pytest.raises(Crash):
+        wg.run()
+    return (
+        orm.QueryBuilder()
+        .append(orm.ProcessNode, filters={'label': wg.name})
+        .order_by({orm.ProcessNode: {'id': 'desc'}})
+        .first(flat=True)
+    )
+
+
+def test_reload_after_crash(reload_from_checkpoint):
+    """The scheduler is rebuilt from the checkpoint, the finished tasks are not launched again."""
+    wg = WorkGraph('test_reload_after_crash')
+    add1 = wg.add_task(add, x=1, y=1)
+    crash = wg.add_task(CrashOnceTask, x=add1.outputs.result)
+    add2 = wg.add_task(add, x=crash.outputs.result, y=add1.outputs.result)
+    node = run_until_crash(wg)
+    assert not node.is_terminated
+    reload_from_checkpoint(node)
+    assert node.is_finished_ok
+    wg = WorkGraph.load(node.pk)
+    assert wg.tasks[add2.name].outputs.result.value == 4
+    called = node.base.links.get_outgoing(node_class=orm.ProcessNode).all()
+    assert sorted(link.link_label for link in called) == ['add', 'add1']
+
+
+def test_reload_map_after_crash(reload_from_checkpoint):
+    """The expanded items of a MAP task are mapped again, and the next items are expanded."""
+    with WorkGraph('test_reload_map_after_crash') as wg:
+        data = generate_data(n=4).data
+        with Map(data, chunk_size=2) as map_zone:
+            result = async_add(x=map_zone.item.value, y=1).result
+            crash = map_zone.add_task(CrashOnceTask, x=result, at=3)
+            map_zone.gather({'result': crash.outputs.result})
+        calc_sum(data=map_zone.outputs.result)
+    node = run_until_crash(wg)
+    assert not node.is_terminated
+    reload_from_checkpoint(node)
+    assert node.is_finished_ok
+    wg = WorkGraph.load(node.pk)
+    assert wg.tasks['calc_sum'].outputs.result.value == 10
+    called = node.base.links.get_outgoing(node_class=orm.ProcessNode).all()
+    # each item is added once
+    assert len([link for link in called if link.link_label.endswith('_add')]) == 4
+
+
+def test_slim_checkpoint(reload_from_checkpoint):
+    """The checkpoint does not keep the workgraph data, only the tasks with a pickled executor."""
+
+    @task()
+    def multiply(x, y):
+        return x * y
+
+    wg = WorkGraph('test_slim_checkpoint')
+    add1 = wg.add_task(async_add, x=1, y=1)
+    crash = wg.add_task(CrashOnceTask, x=add1.outputs.result)
+    multiply1 = wg.add_task(multiply, x=crash.outputs.result, y=3)
+    node = run_until_crash(wg)
+    checkpoint = deserialize_unsafe(node.checkpoint)
+    assert '_wgdata' not in checkpoint['CONTEXT']
+    assert list(checkpoint['CONTEXT']['_wgdata_tasks']) == [multiply1.name]
+    for key in (BundleKeys.INPUTS_RAW, BundleKeys.INPUTS_PARSED):
+        assert 'workgraph_data' not in deserialize_unsafe(checkpoint[key])
+    reload_from_checkpoint(node)
+    assert node.is_finished_ok
+    wg = WorkGraph.load(node.pk)
+    assert wg.tasks[multiply1.name].outputs.result.value == 6
+
+
+@pytest.mark.parametrize(
+    'policy',
+    [
+        {'policy': 'step'},
+        {'policy': 'steps', 'steps': 3},
+        {'policy': 'interval', 'interval': 3600},
+        {'policy': 'awaitables'},
+        {'policy': 'step', 'asynchronous': True},
+        {'policy': 'awaitables', 'asynchronous': True},
+    ],
+)
+def test_reload_with_checkpoint_policy(policy, reload_from_checkpoint):
+    """No child process is lost or submitted twice when some checkpoints are skipped before a crash."""
+    wg = WorkGraph('test_reload_with_checkpoint_policy')
+    add1 = wg.add_task(async_add, x=1, y=1)
+    add2 = wg.add_task(add, x=add1.outputs.result, y=1)
+    crash = wg.add_task(CrashOnceTask, x=add2.outputs.result)
+    add3 = wg.add_task(async_add, x=crash.outputs.result, y=1)
+    wg.set_checkpoint_policy(**policy)
+    node = run_until_crash(wg)
+    assert not node.is_terminated
+    reload_from_checkpoint(node)
+    assert node.is_finished_ok
+    wg = WorkGraph.load(node.pk)
+    assert wg.tasks[add3.name].outputs.result.value == 4
+    called = [link.link_label for link in node.base.links.get_outgoing(node_class=orm.ProcessNode).all()]
+    assert called.count(add1.name) == 1
+    assert called.count(add2.name) == 1
+    assert called.count(add3.name) == 1
+
+
+def test_checkpoint_policy_skips_checkpoints():
+    """The checkpoints are only saved after child processes are submitted."""
+
+    def run(policy):
+        wg = WorkGraph(f'test_checkpoint_policy_{policy}')
+        result = wg.add_task(async_add, x=0, y=1).outputs.result
+        for _ in range(3):
+            result = wg.add_task(async_add, x=result, y=1).outputs.result
+        wg.set_checkpoint_policy(policy)
+        wg.run()
+        assert wg.process.is_finished_ok
+        return wg.process.engine_metrics['checkpoints']['saved']
+
+    assert run('awaitables') < run('step')
+
+
+def test_checkpoint_policy_validation():
+    wg = WorkGraph('test_checkpoint_policy_validation')
+    with pytest.raises(ValueError, match='Unknown checkpoint policy'):
+        wg.set_checkpoint_policy('never')
+    with pytest.raises(ValueError, match='positive integer'):
+        wg.set_checkpoint_policy('steps', steps=0)
+    wg.set_checkpoint_policy('interval', interval=60, asynchronous=True)
+    assert WorkGraph.from_dict(wg.to_dict()).checkpoint_policy == {
+        'policy': 'interval',
+        'steps': 1,
+        'interval': 60,
+        'asynchronous': True,
+    }
+
+
+def test_release_represented_objects():
+    """The YAML tree of a checkpoint is emitted without the represented objects, as the persister serializes it."""
+    import io
+    from aiida.orm.utils.serialize import AiiDADumper, serialize
+    from aiida_workgraph.engine.checkpoint import emit_checkpoint, release_represented_objects
+
+    shared = [1, 2]
+    data = {'node': orm.Int(1).store(), 'first': shared, 'second': shared}
+    stream = io.StringIO()
+    dumper = AiiDADumper(stream)
+    tree = dumper.represent_data(data)
+    assert dumper.represented_objects
+    release_represented_objects(dumper)
+    assert (dumper.represented_objects, dumper.object_keeper, dumper.alias_key) == ({}, [], None)
+    # the objects can change while the tree is emitted
+    shared.append(3)
+    snapshot = [1, 2]
+    assert emit_checkpoint(dumper, tree, stream) == serialize({**data, 'first': snapshot, 'second': snapshot})
+
+
+def test_failed_checkpoint_forces_sync():
+    """After a checkpoint fails, the next one is saved synchronously."""
+    import logging
+    from concurrent.futures import Future
+    from types import SimpleNamespace
+    from aiida.engine.persistence import AiiDAPersister
+    from plumpy.exceptions import PersistenceError
+    from aiida_workgraph.engine.checkpoint import CheckpointWriter
+
+    saved = []
+
+    class Persister(AiiDAPersister):
+        fail = False
+
+        def save_checkpoint(self, process, tag=None):
+            if self.fail:
+                raise PersistenceError('save failed')
+            saved.append(process)
+
+    process = SimpleNamespace(
+        wg=SimpleNamespace(checkpoint_policy={'policy': 'awaitables', 'asynchronous': True}),
+        paused=False,
+        awaitable_manager=SimpleNamespace(insertions=0),
+        runner=SimpleNamespace(persister=Persister()),
+        logger=logging.getLogger(__name__),
+        has_terminated=lambda: False,
+    )
+    writer = CheckpointWriter(process)
+    assert writer.next_checkpoint() is None
+    # a child process is submitted, but its checkpoint can not be saved
+    process.awaitable_manager.insertions = 1
+    assert writer.next_checkpoint() == 'sync'
+    process.runner.persister.fail = True
+    writer.save_sync()
+    assert saved == [] and writer.metrics['saved'] == 0
+    assert writer.next_checkpoint() == 'sync'
+    process.runner.persister.fail = False
+    writer.save_sync()
+    assert saved == [process] and writer.next_checkpoint() is None
+    # an asynchronous checkpoint which can not be emitted
+    process.wg.checkpoint_policy = {'policy': 'step', 'asynchronous': True}
+    assert writer.next_checkpoint() == 'async'
+    future = Future()
+    future.set_exception(RuntimeError('emit failed'))
+    writer.on_emitted(writer.saved(), future)
+    assert writer.next_checkpoint() == 'sync'
+    writer.save_sync()
+    assert writer.next_checkpoint() == 'async'
+    # the other persisters save the checkpoints themselves
+    process.runner.persister = None
+    assert writer.next_checkpoint() == 'sync'
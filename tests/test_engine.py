@@ -1,7 +1,28 @@
 import time
 import pytest
-from aiida_workgraph import WorkGraph
+from typing import Any
+from aiida import orm
+from aiida_workgraph import WorkGraph, namespace
+from aiida_workgraph.task import Task
 from aiida.cmdline.utils.common import get_workchain_report
+from node_graph import RuntimeExecutor
+from node_graph.task_spec import TaskSpec
+
+
+def split_int(value):
+    """Return unstored data nodes, they are stored by the engine."""
+    return {'quotient': orm.Int(value.value // 2), 'remainder': orm.Int(value.value % 2)}
+
+
+class SplitIntTask(Task):
+    _default_spec = TaskSpec(
+        identifier='test.split_int',
+        task_type='Normal',
+        inputs=namespace(value=Any),
+        outputs=namespace(quotient=Any, remainder=Any),
+        executor=RuntimeExecutor.from_callable(split_int),
+        base_class_path=f'{__name__}.SplitIntTask',
+    )
 
 
 @pytest.mark.usefixtures('started_daemon_client')
@@ -51,3 +72,307 @@ def test_max_number_jobs(add_code) -> None:
     report = get_workchain_report(wg.process, 'REPORT')
     assert 'tasks ready to run: add2' in report
     wg.tasks.add2.outputs.sum.value == 2
+
+
+def test_runtime_state_write_back(decorated_normal_add) -> None:
+    """The runtime info is cached in the engine and flushed to the node at the end of each step."""
+    wg = WorkGraph(name='test_runtime_state_write_back')
+    wg.add_task(decorated_normal_add, 'add1', x=1, y=2)
+    wg.add_task(decorated_normal_add, 'add2', x=wg.tasks.add1.outputs.result, y=3)
+    wg.run()
+    assert wg.tasks.add2.outputs.result.value == 6
+    assert wg.process.task_states['add1'] == 'FINISHED'
+    assert wg.process.task_states['add2'] == 'FINISHED'
+    assert wg.process.task_actions['add2'] == ''
+
+
+def test_runtime_state_store() -> None:
+    """Only modified runtime info are written back to the node, with a single update."""
+    from unittest.mock import patch
+    from aiida_workgraph.orm.workgraph import WorkGraphNode
+    from aiida_workgraph.engine.runtime_state import RuntimeStateStore
+
+    class Process:
+        node = WorkGraphNode()
+
+    node = Process.node
+    node.task_states = {'add1': 'PLANNED'}
+    store = RuntimeStateStore(Process())
+    assert store.get('add1', 'state') == 'PLANNED'
+    assert store.get('add1', 'execution_count') == 0
+    store.set('add1', 'state', 'PLANNED')
+    assert not store.is_dirty
+    store.set('add1', 'state', 'FINISHED')
+    store.set('add2', 'state', 'RUNNING')
+    store.set('add2', 'execution_count', 1)
+    # nothing is written before the flush
+    assert node.task_states == {'add1': 'PLANNED'}
+    with patch.object(node.base.attributes, 'set_many', wraps=node.base.attributes.set_many) as set_many:
+        store.flush()
+        store.flush()
+    set_many.assert_called_once()
+    assert node.task_states == {'add1': 'FINISHED', 'add2': 'RUNNING'}
+    assert node.task_execution_counts == {'add2': 1}
+    with pytest.raises(ValueError, match='Invalid key'):
+        store.get('add1', 'unknown')
+
+
+def test_store_tracked_nodes(decorated_add, monkeypatch) -> None:
+    """The unstored nodes are stored as the tasks produce them, the whole context is only walked once."""
+    from aiida_workgraph.engine.workgraph import WorkGraphEngine
+
+    walks = []
+    store_nodes = WorkGraphEngine._store_nodes
+
+    def counting_store_nodes(self, data, *args):
+        if data is self.ctx:
+            walks.append(self.ctx)
+        return store_nodes(self, data, *args)
+
+    monkeypatch.setattr(WorkGraphEngine, '_store_nodes', counting_store_nodes)
+    wg = WorkGraph(name='test_store_tracked_nodes')
+    split1 = wg.add_task(SplitIntTask, value=7)
+    split2 = wg.add_task(SplitIntTask, value=split1.outputs.quotient)
+    add1 = wg.add_task(decorated_add, x=split2.outputs.quotient, y=split1.outputs.remainder)
+    wg.run()
+    assert add1.outputs.result.value == 2
+    # after the setup, the nodes of the results are tracked instead
+    assert len(walks) == 1
+    assert all(node.is_stored for node in wg.process.called[0].base.links.get_incoming().all_nodes())
+
+
+def test_store_untracked_nodes(monkeypatch, caplog) -> None:
+    """In debug mode, the unstored nodes missed by the tracking are still stored."""
+    import aiida_workgraph.config
+    from aiida_workgraph.engine.workgraph import WorkGraphEngine
+
+    monkeypatch.setattr(aiida_workgraph.config, 'load_config', lambda: {'debug_store_nodes': True})
+    # nothing is tracked
+    monkeypatch.setattr(WorkGraphEngine, 'track_unstored_nodes', lambda self, data=None: None)
+    wg = WorkGraph(name='test_store_untracked_nodes')
+    wg.add_task(SplitIntTask, name='split1', value=7)
+    wg.outputs.quotient = wg.tasks.split1.outputs.quotient
+    wg.run()
+    assert wg.process.outputs.quotient.value == 3
+    assert 'stored 2 unstored nodes of the context that were not tracked' in caplog.text
+
+
+def test_awaitable_manager_status(decorated_add) -> None:
+    """The process status is a bounded summary of the awaitables, the full list is queried separately."""
+    from aiida.common import AttributeDict
+    from aiida.orm import CalculationNode, WorkflowNode
+    from aiida.engine.processes.workchains.awaitable import construct_awaitable
+    from aiida_workgraph.orm.workgraph import WorkGraphNode
+    from aiida_workgraph.engine.context_manager import ContextManager
+    from aiida_workgraph.engine.awaitable_manager import AwaitableManager
+
+    wg = WorkGraph(name='test_awaitable_manager_status')
+    wg.add_task('workgraph.test_add', 'job')
+    for i in range(10):
+        wg.add_task(decorated_add, f'add{i}')
+
+    class Process:
+        node = WorkGraphNode()
+
+        def has_terminated(self):
+            return False
+
+    process = Process()
+    process.wg = wg
+    ctx_manager = ContextManager(AttributeDict(), process=process, logger=None)
+    manager = AwaitableManager({}, None, None, process, ctx_manager)
+    awaitables = []
+    for i in range(10):
+        node = (CalculationNode() if i < 8 else WorkflowNode()).store()
+        awaitable = construct_awaitable(node)
+        awaitable.key = f'add{i}' if i < 8 else 'job'
+        awaitables.append(awaitable)
+        manager.to_context(**{awaitable.key: awaitable})
+    pks = [awaitable.pk for awaitable in awaitables]
+    status = Process.node.process_status
+    assert status.startswith('Waiting for child processes: 10 (CALCFUNCTION: 8, PYFUNCTION: 2), pks: ')
+    assert status.endswith(f'{pks[4]}, ...')
+    assert str(pks[5]) not in status
+    assert [item['pk'] for item in manager.get_awaitables()] == pks
+    for awaitable in awaitables[:9]:
+        manager.resolve_awaitable(awaitable, None)
+    assert Process.node.process_status == f'Waiting for child processes: 1 (PYFUNCTION: 1), pks: {pks[9]}'
+    manager.resolve_awaitable(awaitables[9], None)
+    assert Process.node.process_status is None
+    assert manager.get_awaitables() == []
+
+
+def test_coalesce_completions(decorated_add) -> None:
+    """The completions of the child processes are applied in batches, and the batching is reported."""
+    from aiida_workgraph import task
+
+    @task.graph
+    def add_one(x):
+        return decorated_add(x=x, y=1, t=0).result
+
+    wg = WorkGraph('test_coalesce_completions')
+    for i in range(3):
+        wg.add_task(add_one, name=f'add{i}', x=i)
+    wg.coalesce_window = 0.5
+    wg.run()
+    assert [wg.tasks[f'add{i}'].outputs.result.value for i in range(3)] == [1, 2, 3]
+    metrics = wg.process.engine_metrics['awaitables']
+    assert metrics['coalesce_window'] == 0.5
+    assert metrics['completions'] == 3
+    assert WorkGraph.from_dict(wg.to_dict()).coalesce_window == 0.5
+
+
+def test_coalesce_completions_batch(decorated_add) -> None:
+    """The awaitables completed within the window are applied in one batch, which resumes the workgraph once."""
+    import logging
+    from aiida.common import AttributeDict
+    from aiida.orm import CalculationNode
+    from aiida.engine.processes.workchains.awaitable import construct_awaitable
+    from aiida_workgraph.orm.workgraph import WorkGraphNode
+    from aiida_workgraph.engine.context_manager import ContextManager
+    from aiida_workgraph.engine.awaitable_manager import AwaitableManager
+    from aiida_workgraph.engine.profiler import EngineProfiler
+
+    wg = WorkGraph(name='test_coalesce_completions_batch')
+    for i in range(3):
+        wg.add_task(decorated_add, f'add{i}')
+    wg.coalesce_window = 0.5
+    scheduled = []
+    resumed = []
+
+    class Loop:
+        def call_later(self, delay, callback, *args):
+            scheduled.append((delay, callback, args))
+            return object()
+
+    class Process:
+        node = WorkGraphNode()
+        loop = Loop()
+        runtime_state = AttributeDict({'flush': lambda: None})
+
+        def has_terminated(self):
+            return False
+
+        def call_soon(self, callback, *args):
+            callback(*args)
+
+        def resume(self):
+            resumed.append(True)
+
+    process = Process()
+    process.wg = wg
+    process.profiler = EngineProfiler(process, hooks=[])
+    ctx_manager = ContextManager(AttributeDict(), process=process, logger=None)
+    manager = AwaitableManager({}, None, logging.getLogger(__name__), process, ctx_manager)
+    applied = []
+    apply_completions = manager.apply_completions
+    manager.apply_completions = lambda: applied.append(True) or apply_completions()
+    manager.complete_awaitable = lambda awaitable: manager.resolve_awaitable(awaitable, None)
+    awaitables = []
+    for i in range(3):
+        awaitable = construct_awaitable(CalculationNode().store())
+        awaitable.key = f'add{i}'
+        awaitables.append(awaitable)
+        manager.to_context(**{awaitable.key: awaitable})
+    for awaitable in awaitables:
+        manager.on_awaitable_finished(awaitable)
+    # a single application is scheduled at the end of the window
+    assert len(scheduled) == 1 and scheduled[0][0] == 0.5
+    assert applied == [] and resumed == []
+    _, callback, args = scheduled[0]
+    callback(*args)
+    assert applied == [True] and resumed == [True]
+    assert all(awaitable.resolved for awaitable in awaitables)
+    assert manager.metrics == {'coalesce_window': 0.5, 'completions': 3, 'batches': 1, 'max_batch_size': 3}
+
+
+def test_task_timestamps(decorated_add) -> None:
+    """The lifecycle of the tasks is recorded, a task throttled by `max_number_jobs` waits in the queue."""
+    from aiida_workgraph import task
+    from aiida_workgraph.orm.workgraph import WorkGraphNode
+
+    @task.graph
+    def add_one(x):
+        return decorated_add(x=x, y=1, t=0).result
+
+    wg = WorkGraph('test_task_timestamps')
+    wg.add_task(add_one, name='add0', x=0)
+    wg.add_task(add_one, name='add1', x=1)
+    wg.max_number_jobs = 1
+    wg.run()
+    timestamps = wg.process.task_timestamps
+    for name in ('add0', 'add1'):
+        events = [timestamps[name][event] for event in WorkGraphNode.TASK_TIMESTAMP_EVENTS]
+        assert events == sorted(events)
+        assert wg.tasks[name].timestamps == timestamps[name]
+    first, second = sorted(('add0', 'add1'), key=lambda name: timestamps[name]['submitted'])
+    # the second task is ready from the start, but submitted once the first one finished
+    assert timestamps[second]['submitted'] >= timestamps[first]['finished']
+    assert wg.tasks[second].delays['queue_wait'] > 0
+    assert wg.tasks[second].delays['latency'] >= 0
+
+
+def test_engine_profiler(decorated_add, monkeypatch, tmp_path) -> None:
+    """The sections of the engine are passed to the hooks, the collector writes them to the node and a file."""
+    import aiida_workgraph.config
+    from aiida_workgraph import task
+    from aiida_workgraph.engine.profiler import PROFILE_EXTRA_KEY, ProfilerHook, register_hook, unregister_hook
+
+    @task.graph
+    def add_one(x):
+        return decorated_add(x=x, y=1, t=0).result
+
+    class RecordingHook(ProfilerHook):
+        def __init__(self):
+            self.sections = {}
+            self.counts = {}
+            self.terminated = []
+
+        def on_section(self, process, name, elapsed):
+            self.sections.setdefault(name, []).append(elapsed)
+
+        def on_count(self, process, name, value):
+            self.counts[name] = self.counts.get(name, 0) + value
+
+        def on_terminated(self, process):
+            self.terminated.append(process.node.pk)
+
+    path = tmp_path / 'workgraph_{pid}.prom'
+    monkeypatch.setattr(aiida_workgraph.config, 'load_config', lambda: {'profiler': {'prometheus': str(path)}})
+    hook = RecordingHook()
+    register_hook(hook)
+    try:
+        wg = WorkGraph('test_engine_profiler')
+        wg.add_task(add_one, name='add0', x=0)
+        wg.add_task(add_one, name='add1', x=1)
+        wg.run()
+    finally:
+        unregister_hook(hook)
+    assert wg.process.is_finished_ok
+    # the workgraph and its two nested workgraphs
+    assert len(hook.terminated) == 3
+    assert wg.process.pk in hook.terminated
+    for section in ('step', 'continue_workgraph', 'run_tasks', 'get_inputs', 'submit', 'update_task_state'):
+        assert section in hook.sections
+    assert hook.counts['tasks_launched'] == 4
+    assert hook.counts['attribute_writes'] > 0
+    profile = wg.process.base.extras.get(PROFILE_EXTRA_KEY)
+    assert profile['counters']['tasks_launched'] == 2
+    assert profile['sections']['submit']['count'] == 2
+    assert len(profile['sections']['step']['counts']) == len(profile['buckets']) + 1
+    text = next(tmp_path.glob('workgraph_*.prom')).read_text()
+    assert '# TYPE aiida_workgraph_section_seconds histogram' in text
+    assert 'aiida_workgraph_section_seconds_bucket{section="submit",le="+Inf"}' in text
+    assert 'aiida_workgraph_work_total{counter="tasks_launched"}' in text
+
+
+def test_critical_path_priority(decorated_normal_add) -> None:
+    """The ready tasks on the longest path are launched first."""
+    wg = WorkGraph('test_critical_path_priority')
+    wg.add_task(decorated_normal_add, 'wide', x=1, y=1)
+    wg.add_task(decorated_normal_add, 'chain1', x=1, y=1)
+    wg.add_task(decorated_normal_add, 'chain2', x=wg.tasks.chain1.outputs.result, y=1)
+    wg.priority_policy = 'critical_path'
+    wg.run()
+    report = get_workchain_report(wg.process, 'REPORT')
+    assert 'tasks ready to run: chain1,wide' in report
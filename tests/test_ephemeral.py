@@ -0,0 +1,74 @@
+import pytest
+from typing import Any
+from aiida import orm
+from aiida_workgraph import WorkGraph, Map, task, namespace
+
+
+@task(ephemeral=True)
+def add(x, y):
+    return x + y
+
+
+@task(ephemeral=True, outputs=namespace(quotient=Any, remainder=Any))
+def divmod_(x, y):
+    return divmod(x, y)
+
+
+@task.calcfunction()
+def multiply(x, y):
+    return x * y
+
+
+def test_ephemeral_chain():
+    """The results of the ephemeral tasks are only stored at the outputs of the graph."""
+    with WorkGraph('test_ephemeral_chain') as wg:
+        total = add(x=1, y=2).result
+        total = add(x=total, y=3).result
+        wg.outputs.total = total
+        wg.run()
+    assert wg.process.outputs.total.value == 6
+    # no process is launched for the ephemeral tasks
+    assert wg.process.called == []
+    assert wg.process.outputs.total.is_stored
+    assert wg.tasks.add.ephemeral
+
+
+def test_ephemeral_to_process():
+    """The results of an ephemeral task are serialized when they are passed to an AiiDA process."""
+    with WorkGraph('test_ephemeral_to_process') as wg:
+        outputs = divmod_(x=7, y=2)
+        wg.outputs.product = multiply(x=outputs.quotient, y=outputs.remainder).result
+        wg.run()
+    assert wg.process.outputs.product.value == 3
+    (calcfunction,) = wg.process.called
+    assert isinstance(calcfunction.inputs.x, orm.Int)
+    assert (calcfunction.inputs.x.value, calcfunction.inputs.y.value) == (3, 1)
+
+
+def test_ephemeral_map():
+    with WorkGraph('test_ephemeral_map') as wg:
+        with Map({'a': 1, 'b': 2}) as map_zone:
+            map_zone.gather({'result': add(x=map_zone.item.value, y=1).result})
+        wg.outputs.results = map_zone.outputs.result
+        wg.run()
+    assert {key: node.value for key, node in wg.process.outputs.results.items()} == {'a': 2, 'b': 3}
+    assert wg.process.called == []
+
+
+def test_ephemeral_validation():
+    with pytest.raises(ValueError, match='can not be async'):
+
+        @task(ephemeral=True)
+        async def async_add(x, y):
+            return x + y
+
+    with pytest.raises(ValueError, match='plain Python functions'):
+        task(ephemeral=True)(multiply._callable)
+
+    wg = WorkGraph('test_ephemeral_validation')
+    add_task = wg.add_task(add, x=1, y=2)
+    with pytest.raises(ValueError, match='does not support an executor mode'):
+        add_task.executor_mode = 'thread'
+    multiply_task = wg.add_task(multiply, x=1, y=2)
+    with pytest.raises(ValueError, match='Only normal and pyfunction tasks'):
+        multiply_task.ephemeral = True
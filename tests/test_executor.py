@@ -0,0 +1,117 @@
+import time
+import pytest
+from typing import Any
+from aiida_workgraph import WorkGraph, task, namespace
+from aiida_workgraph.task import Task
+from aiida_workgraph.engine.executor_pool import ExecutorPyFunction
+from node_graph import RuntimeExecutor
+from node_graph.task_spec import TaskSpec
+
+
+def wait_and_return(value: Any, seconds: float = 1) -> Any:
+    time.sleep(seconds)
+    return value
+
+
+def get_type_name(value: Any) -> str:
+    return type(value).__name__
+
+
+class TypeNameTask(Task):
+    _default_spec = TaskSpec(
+        identifier='test.type_name',
+        task_type='Normal',
+        inputs=namespace(value=Any),
+        outputs=namespace(result=Any),
+        executor=RuntimeExecutor.from_callable(get_type_name),
+        base_class_path=f'{__name__}.TypeNameTask',
+    )
+
+
+class WaitTask(Task):
+    """A normal task, its function is not wrapped in a process."""
+
+    _default_spec = TaskSpec(
+        identifier='test.wait',
+        task_type='Normal',
+        inputs=namespace(value=Any, seconds=(float, 1.0)),
+        outputs=namespace(result=Any),
+        executor=RuntimeExecutor.from_callable(wait_and_return),
+        base_class_path=f'{__name__}.WaitTask',
+    )
+
+
+@task
+def echo(value: Any) -> Any:
+    return value
+
+
+@task(executor_mode='thread')
+def sleep_and_time(seconds: float) -> dict:
+    start = time.time()
+    time.sleep(seconds)
+    return {'start': start, 'end': time.time()}
+
+
+@task(executor_mode='process')
+def sum_squares(n: int) -> int:
+    return sum(i * i for i in range(n))
+
+
+def test_executor_mode_thread(decorated_add):
+    """The sync functions run in the thread pool, thus independent branches overlap."""
+    wg = WorkGraph(name='test_executor_mode_thread')
+    sleep1 = wg.add_task(sleep_and_time, seconds=2)
+    sleep2 = wg.add_task(sleep_and_time, seconds=2)
+    add1 = wg.add_task(decorated_add, x=1, y=2)
+    wg.run()
+    assert wg.process.is_finished_ok
+    result1 = sleep1.outputs.result.value.value
+    result2 = sleep2.outputs.result.value.value
+    assert result1['start'] < result2['end'] and result2['start'] < result1['end']
+    # the provenance is recorded as for a normal pyfunction
+    assert sleep1.process.process_class is ExecutorPyFunction
+    assert sleep1.process.outputs.result.value == result1
+    assert add1.outputs.result.value == 3
+
+
+def test_executor_mode_process():
+    wg = WorkGraph(name='test_executor_mode_process')
+    sum1 = wg.add_task(sum_squares, n=10)
+    wg.run()
+    assert sum1.outputs.result.value == 285
+
+
+def test_executor_mode_normal_task(decorated_add):
+    wg = WorkGraph(name='test_executor_mode_normal_task')
+    wait1 = wg.add_task(WaitTask, value=1)
+    wait1.executor_mode = 'thread'
+    add1 = wg.add_task(decorated_add, x=wait1.outputs.result, y=2)
+    wg.run()
+    assert add1.outputs.result.value == 3
+    # the normal tasks only support the thread pool
+    with pytest.raises(ValueError, match='must be `thread`'):
+        wait1.executor_mode = 'process'
+
+
+def test_executor_mode_normal_task_inputs(decorated_add):
+    """In the thread pool, a normal task receives the raw Python data instead of the nodes."""
+    wg = WorkGraph(name='test_executor_mode_normal_task_inputs')
+    add1 = wg.add_task(decorated_add, x=1, y=2)
+    inline = wg.add_task(TypeNameTask, value=add1.outputs.result)
+    thread = wg.add_task(TypeNameTask, value=add1.outputs.result)
+    thread.executor_mode = 'thread'
+    # the results of the normal tasks are only stored by the downstream tasks
+    echo1 = wg.add_task(echo, value=inline.outputs.result)
+    echo2 = wg.add_task(echo, value=thread.outputs.result)
+    wg.run()
+    assert echo1.outputs.result.value == 'Int'
+    assert echo2.outputs.result.value == 'int'
+
+
+def test_executor_mode_validation():
+    with pytest.raises(ValueError, match='Unknown executor mode'):
+
+        @task(executor_mode='gpu')
+        def add(x, y):
+            return x + y
@@ -1,7 +1,10 @@
+import operator
+
 from aiida_workgraph import (
     WorkGraph,
     task,
     Map,
+    Reduce,
     namespace,
     dynamic,
 )
@@ -43,3 +46,115 @@ def test_map_zone():
         wg.run()
         assert out3.value == 6
         assert out4.value == 9
+
+
+@task()
+async def async_add(x, y):
+    import asyncio
+
+    await asyncio.sleep(1)
+    return x + y
+
+
+def test_map_zone_chunk_size():
+    """Only `chunk_size` items are expanded at the same time."""
+    n = 4
+    with WorkGraph('test_map_zone_chunk_size') as wg:
+        data = generate_data(n=n).data
+        with Map(data, chunk_size=2) as map_zone:
+            out1 = async_add(x=map_zone.item.value, y=1).result
+            map_zone.gather({'sum1': out1})
+        out2 = calc_sum(data=map_zone.outputs.sum1).result
+        wg.run()
+    assert out2.value == 10
+    adds = sorted(
+        (link.node for link in wg.process.base.links.get_outgoing() if link.link_label.endswith('async_add')),
+        key=lambda node: node.ctime,
+    )
+    assert len(adds) == n
+    # the third item is expanded once one of the first two items is finished
+    assert adds[2].ctime >= min(adds[0].mtime, adds[1].mtime)
+
+
+@task()
+def square_all(values: list) -> list:
+    return [value**2 for value in values]
+
+
+def test_map_zone_batch_size():
+    """The tasks run once per batch, and their results are scattered back to the items."""
+    n = 5
+    with WorkGraph('test_map_zone_batch_size') as wg:
+        data = generate_data(n=n).data
+        with Map(data, batch_size=2) as map_zone:
+            out1 = square_all(values=map_zone.item.value).result
+            map_zone.gather({'square': out1})
+        out2 = calc_sum(data=map_zone.outputs.square).result
+        wg.run()
+    assert out2.value == 30
+    squares = [link for link in wg.process.base.links.get_outgoing() if link.link_label.endswith('square_all')]
+    assert len(squares) == 3
+
+
+def test_map_zone_batch_size_graph_outputs():
+    """The scattered results are data nodes, thus they can be exposed as outputs of the graph."""
+    with WorkGraph('test_map_zone_batch_size_graph_outputs') as wg:
+        data = generate_data(n=3).data
+        with Map(data, batch_size=2) as map_zone:
+            map_zone.gather({'square': square_all(values=map_zone.item.value).result})
+        wg.outputs.square = map_zone.outputs.square
+        wg.run()
+    square = wg.process.outputs.square
+    assert {key: square[key].value for key in square} == {'key_0': 0, 'key_1': 1, 'key_2': 4}
+
+
+def test_map_zone_stream_size():
+    """The tasks reading the `stream` outputs start once the first items are finished."""
+    n = 4
+    with WorkGraph('test_map_zone_stream_size') as wg:
+        data = generate_data(n=n).data
+        with Map(data, chunk_size=1, stream_size=2) as map_zone:
+            out1 = add(x=map_zone.item.value, y=1).result
+            map_zone.gather({'sum1': out1})
+        out2 = calc_sum(data=map_zone.outputs.stream.sum1).result
+        out3 = calc_sum(data=map_zone.outputs.sum1).result
+        wg.run()
+    assert out2.value == 3
+    assert out3.value == 10
+    links = sorted(wg.process.base.links.get_outgoing(), key=lambda link: link.node.ctime)
+    labels = [link.link_label for link in links]
+    # the first two items are expanded one after the other, then the stream is opened
+    assert labels.index('calc_sum') < labels.index('key_2_add')
+
+
+def concat(x, y):
+    return f'{x}{y}'
+
+
+def test_map_zone_reduce():
+    """The results of the items are reduced in a tree, while the other items are running."""
+    with WorkGraph('test_map_zone_reduce') as wg:
+        data = generate_data(n=5).data
+        with Map(data, chunk_size=1) as map_zone:
+            out1 = add(x=map_zone.item.value, y=1).result
+            map_zone.gather({'sum1': out1})
+        wg.outputs.total = Reduce(map_zone.outputs.sum1, operator.add).result
+        wg.outputs.values = Reduce(map_zone.outputs.sum1, concat, fan_in=3).result
+        wg.run()
+    assert wg.process.outputs.total.value == 15
+    # the values are combined in the order of the source
+    assert wg.process.outputs.values.value == '12345'
+    # the first partial reduction finished before the last items were run
+    messages = [log.message for log in orm.Log.collection.get_logs_for(wg.process)]
+    reduced = next(i for i, message in enumerate(messages) if 'Task: reduce_level0_0 finished' in message)
+    added = next(i for i, message in enumerate(messages) if 'Task: key_2_add, type: PYFUNCTION, finished' in message)
+    assert reduced < added
+
+
+def test_reduce_namespace():
+    """A namespace that is not gathered by a Map zone is reduced at once."""
+    with WorkGraph('test_reduce_namespace') as wg:
+        data = generate_data(n=4).data
+        wg.outputs.total = Reduce(data, operator.add, fan_in=3).result
+        wg.run()
+    assert wg.process.outputs.total.value == 6
@@ -0,0 +1,58 @@
+import pytest
+from aiida_workgraph import WorkGraph, task
+from aiida.cmdline.utils.common import get_workchain_report
+
+
+def test_resource_pool_by_tag(decorated_add) -> None:
+    """The tasks of a full pool wait in its queue and are launched once a slot is free."""
+
+    @task.graph
+    def add_one(x):
+        return decorated_add(x=x, y=1, t=0).result
+
+    wg = WorkGraph('test_resource_pool_by_tag')
+    for i in range(3):
+        wg.add_task(add_one, name=f'add{i}', x=i)
+        wg.tasks[f'add{i}'].tags = ['heavy']
+    wg.add_task(add_one, name='light', x=10)
+    wg.add_resource_pool('heavy', limit=1, tags=['heavy'])
+    wg.run()
+    assert [wg.tasks[f'add{i}'].outputs.result.value for i in range(3)] == [1, 2, 3]
+    report = get_workchain_report(wg.process, 'REPORT')
+    assert 'tasks ready to run: add0,add1,add2,light' in report
+    assert 'tasks ready to run: add1' in report
+    assert 'tasks ready to run: add2' in report
+    # the blocked tasks are reported once, not on every step
+    assert report.count('The resource pool heavy is full: 1. Cannot launch the job: add2.') == 1
+
+
+def test_max_number_jobs_pool(decorated_add) -> None:
+    @task.graph
+    def add_one(x):
+        return decorated_add(x=x, y=1, t=0).result
+
+    wg = WorkGraph('test_max_number_jobs_pool')
+    for i in range(3):
+        wg.add_task(add_one, name=f'add{i}', x=i)
+    wg.max_number_jobs = 2
+    wg.run()
+    report = get_workchain_report(wg.process, 'REPORT')
+    assert 'tasks ready to run: add2' in report
+    assert report.count('The maximum number of subprocesses has been reached: 2. Cannot launch the job: add2.') == 1
+
+
+def test_resource_pool_match(add_code) -> None:
+    from aiida.orm import Int
+    from aiida.calculations.arithmetic.add import ArithmeticAddCalculation
+    from aiida_workgraph.engine.resource_pools import ResourcePool
+
+    wg = WorkGraph('test_resource_pool_match')
+    wg.add_task(ArithmeticAddCalculation, name='add', x=Int(1), y=Int(1), code=add_code)
+    wg.add_resource_pool('localhost', limit=2, task_types=['calcjob'], computers=['localhost'])
+    wg.add_resource_pool('cluster', limit=2, task_types=['calcjob'], computers=['cluster'])
+    wg.add_resource_pool('graph', limit=2, task_types=['graph'])
+    wg = WorkGraph.from_dict(wg.to_dict())
+    pools = {name: ResourcePool(name, **data) for name, data in wg.resource_pools.items()}
+    assert [name for name, pool in pools.items() if pool.matches(wg.tasks.add)] == ['localhost']
+    with pytest.raises(ValueError, match='must define at least one'):
+        wg.add_resource_pool('empty', limit=1)
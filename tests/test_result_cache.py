@@ -0,0 +1,142 @@
+import pytest
+from aiida_workgraph import WorkGraph, task
+from aiida_workgraph.engine.result_cache import RESULT_KEY_EXTRA, LRUCache, clear_result_cache
+
+calls = []
+
+
+@task(cache=True)
+def add(x, y):
+    return x + y
+
+
+@task(ephemeral=True, cache=True)
+def scale(x, factor):
+    calls.append((x, factor))
+    return x * factor
+
+
+@pytest.fixture(autouse=True)
+def empty_result_cache():
+    clear_result_cache()
+    calls.clear()
+    yield
+    clear_result_cache()
+
+
+def run_add(name, x, y):
+    with WorkGraph(name) as wg:
+        wg.outputs.result = add(x=x, y=y).result
+        wg.run()
+    assert wg.process.is_finished_ok
+    return wg
+
+
+def test_reuse_process_across_workgraphs():
+    """The second workgraph reuses the process of the first one, instead of executing the function."""
+    wg1 = run_add('test_reuse_process_1', 1, 2)
+    node = wg1.tasks.add.process
+    assert node.base.extras.get(RESULT_KEY_EXTRA)
+    wg2 = run_add('test_reuse_process_2', 1, 2)
+    assert wg2.process.outputs.result.value == 3
+    assert wg2.process.called == []
+    assert wg2.tasks.add.process.pk == node.pk
+    # the fingerprint depends on the input values
+    wg3 = run_add('test_reuse_process_3', 2, 2)
+    assert wg3.tasks.add.process.pk != node.pk
+
+
+def test_clear_result_cache():
+    run_add('test_clear_result_cache_1', 1, 2)
+    assert clear_result_cache() == 1
+    wg = run_add('test_clear_result_cache_2', 1, 2)
+    assert len(wg.process.called) == 1
+
+
+def test_reuse_inline_results():
+    """The results of a task running inline are kept in memory."""
+    for i in range(2):
+        with WorkGraph(f'test_reuse_inline_results_{i}') as wg:
+            wg.outputs.result = scale(x=2, factor=3).result
+            wg.run()
+        assert wg.process.outputs.result.value == 6
+    assert calls == [(2, 3)]
+
+
+def test_workgraph_scope(monkeypatch):
+    """With the `workgraph` scope, the results are not reused by another workgraph."""
+    import aiida_workgraph.config
+
+    monkeypatch.setattr(aiida_workgraph.config, 'load_config', lambda: {'result_cache': {'scope': 'workgraph'}})
+    with WorkGraph('test_workgraph_scope_1') as wg:
+        first = scale(x=2, factor=3).result
+        wg.outputs.result = scale(x=2, factor=3).result
+        wg.outputs.first = first
+        wg.run()
+    assert wg.process.outputs.result.value == 6
+    assert calls == [(2, 3)]
+    with WorkGraph('test_workgraph_scope_2') as wg:
+        wg.outputs.result = scale(x=2, factor=3).result
+        wg.run()
+    assert calls == [(2, 3), (2, 3)]
+
+
+def test_lru_cache():
+    cache = LRUCache(2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    # `b` is the least recently used entry
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c'), len(cache)) == (1, 3, 2)
+
+
+def test_cache_task_type():
+    @task.calcfunction()
+    def multiply(x, y):
+        return x * y
+
+    wg = WorkGraph('test_cache_task_type')
+    wg.add_task(multiply, name='multiply')
+    with pytest.raises(ValueError, match='Only the results of normal and pyfunction tasks can be cached'):
+        wg.tasks.multiply.cache = True
+
+
+def test_inline_results_are_copied():
+    """The cached results of a task running inline are not shared between workgraphs, and record their origin."""
+    import logging
+    from types import SimpleNamespace
+    from aiida import orm
+    from aiida_workgraph.engine.result_cache import TaskResultCache
+
+    process = SimpleNamespace(node=SimpleNamespace(uuid='origin-uuid'), logger=logging.getLogger(__name__))
+    result_cache = TaskResultCache(process)
+    stored = orm.Int(1).store()
+    results = {'values': [1, 2], 'stored': stored, 'unstored': orm.Int(2)}
+    result_cache.record_submission('scale', 'key')
+    result_cache.record_results('scale', results=results)
+    results['values'].append(3)
+    task = SimpleNamespace(task_type='NORMAL', ephemeral=False)
+    first, second = result_cache.lookup(task, 'key'), result_cache.lookup(task, 'key')
+    assert (first.task, first.workgraph) == ('scale', 'origin-uuid')
+    assert first.results['values'] == [1, 2] and first.results['values'] is not second.results['values']
+    # the stored nodes are reused, the unstored ones are copied
+    assert first.results['stored'].pk == stored.pk
+    assert first.results['unstored'] is not results['unstored'] and first.results['unstored'].value == 2
+
+
+def test_inline_results_profile_scope():
+    """In the profile scope, the results of a task running inline are only kept in memory, as in the worker one."""
+    from aiida_workgraph.engine.result_cache import get_memory_cache
+
+    with WorkGraph('test_inline_results_profile_scope_1') as wg:
+        wg.outputs.result = scale(x=2, factor=4).result
+        wg.run()
+    # e.g. another daemon worker, or a restart
+    get_memory_cache().clear()
+    with WorkGraph('test_inline_results_profile_scope_2') as wg:
+        wg.outputs.result = scale(x=2, factor=4).result
+        wg.run()
+    assert wg.process.outputs.result.value == 8
+    assert calls == [(2, 4), (2, 4)]
@@ -0,0 +1,187 @@
+from types import SimpleNamespace
+
+import pytest
+from aiida_workgraph.engine.scheduler import TaskScheduler
+
+
+class States(dict):
+    def get_state(self, name):
+        return self.get(name, 'PLANNED')
+
+
+def build_fan_out_fan_in(states, n):
+    scheduler = TaskScheduler(states.get_state)
+    tasks = [('source', None, [])]
+    tasks.extend((f'task{i}', None, ['source']) for i in range(n))
+    tasks.append(('sink', None, [f'task{i}' for i in range(n)]))
+    scheduler.build(tasks)
+    return scheduler
+
+
+def set_state(scheduler, states, name, state):
+    old_state = states.get(name, 'PLANNED')
+    states[name] = state
+    scheduler.on_state_changed(name, old_state, state)
+
+
+def launch(scheduler, states, names):
+    """Launch the tasks as the engine does, the tasks of a full pool wait for a free slot."""
+    launched = []
+    for name in names:
+        task = SimpleNamespace(name=name, task_type='PYFUNCTION')
+        pool = scheduler.resource_pools.get_full_pool(task)
+        if pool is not None:
+            scheduler.resource_pools.wait(pool, name)
+            continue
+        scheduler.mark_executed(name)
+        scheduler.resource_pools.acquire(task)
+        set_state(scheduler, states, name, 'RUNNING')
+        launched.append(name)
+    return launched
+
+
+@pytest.mark.parametrize('policy', ['fifo', 'critical_path'])
+def test_throttled_tasks_are_woken_up(policy):
+    states = States()
+    scheduler = build_fan_out_fan_in(states, 3)
+    scheduler.set_priority_policy(policy)
+    scheduler.resource_pools.configure({'pool': {'limit': 1}})
+    set_state(scheduler, states, 'source', 'FINISHED')
+    assert launch(scheduler, states, scheduler.pop_ready()) == ['task0']
+    assert list(scheduler.resource_pools.pools['pool'].waiting) == ['task1', 'task2']
+    # the waiting tasks are not checked again until a slot is free
+    assert scheduler.pop_ready() == []
+    set_state(scheduler, states, 'task0', 'FINISHED')
+    assert launch(scheduler, states, scheduler.pop_ready()) == ['task1']
+    set_state(scheduler, states, 'task1', 'FINISHED')
+    assert launch(scheduler, states, scheduler.pop_ready()) == ['task2']
+
+
+@pytest.mark.parametrize('policy', ['fifo', 'critical_path'])
+def test_stale_waiting_tasks_do_not_take_a_slot(policy):
+    states = States()
+    scheduler = build_fan_out_fan_in(states, 3)
+    scheduler.set_priority_policy(policy)
+    scheduler.resource_pools.configure({'pool': {'limit': 1}})
+    set_state(scheduler, states, 'source', 'FINISHED')
+    launch(scheduler, states, scheduler.pop_ready())
+    # task1 is skipped while it waits, it leaves the waiting queue
+    set_state(scheduler, states, 'task1', 'SKIPPED')
+    assert list(scheduler.resource_pools.pools['pool'].waiting) == ['task2']
+    # the source is reset while task2 waits, task2 is no longer ready and leaves the queue when popped
+    scheduler.unmark_executed('source')
+    set_state(scheduler, states, 'source', 'PLANNED')
+    set_state(scheduler, states, 'task0', 'FINISHED')
+    assert scheduler.pop_ready() == ['source']
+    assert not scheduler.resource_pools.pools['pool'].waiting
+    # task2 is queued again once the source is finished
+    set_state(scheduler, states, 'source', 'FINISHED')
+    assert launch(scheduler, states, scheduler.pop_ready()) == ['task2']
+
+
+def test_reset_task_requeues_dependents():
+    states = States()
+    scheduler = build_fan_out_fan_in(states, 2)
+    for name in ['source', 'task0', 'task1']:
+        scheduler.mark_executed(name)
+        set_state(scheduler, states, name, 'FINISHED')
+    assert scheduler.pop_ready() == ['sink']
+    # reset task0, the sink is blocked again until task0 is finished
+    set_state(scheduler, states, 'task0', 'PLANNED')
+    scheduler.unmark_executed('task0')
+    assert scheduler.pop_ready() == ['task0']
+    assert scheduler.is_task_ready_to_run('sink') == (False, [False, True])
+    set_state(scheduler, states, 'task0', 'FINISHED')
+    assert scheduler.pop_ready() == ['sink']
+
+
+def test_release_dependent_of_running_task():
+    states = States()
+    scheduler = build_fan_out_fan_in(states, 1)
+    scheduler.mark_executed('source')
+    set_state(scheduler, states, 'source', 'RUNNING')
+    assert scheduler.pop_ready() == []
+    # e.g. the stream of a running MAP task is opened, task0 starts before the source finishes
+    scheduler.release_dependent('source', 'task0')
+    scheduler.release_dependent('source', 'task0')
+    assert scheduler.pop_ready() == ['task0']
+    # the source is reset before it finishes, task0 waits on it again
+    set_state(scheduler, states, 'source', 'PLANNED')
+    assert scheduler.is_task_ready_to_run('task0') == (False, [False, True])
+    set_state(scheduler, states, 'source', 'RUNNING')
+    scheduler.release_dependent('source', 'task0')
+    # the released task is not counted twice when the source finishes
+    set_state(scheduler, states, 'source', 'FINISHED')
+    assert scheduler.is_task_ready_to_run('task0') == (True, [True, True])
+    set_state(scheduler, states, 'source', 'PLANNED')
+    assert scheduler.is_task_ready_to_run('task0') == (False, [False, True])
+
+
+def test_unmark_executed_labels():
+    states = States()
+    scheduler = build_fan_out_fan_in(states, 1)
+    scheduler.mark_executed('source')
+    scheduler.mark_executed('source.child')
+    scheduler.mark_executed('task0')
+    assert scheduler.is_executed('source')
+    # the labels of the parts of the task are removed with the task
+    assert scheduler.unmark_executed('source') == {'source', 'source.child'}
+    assert not scheduler.is_executed('source')
+    assert scheduler.unmark_executed('source') == set()
+    assert scheduler.is_executed('task0')
+
+
+def test_zone_children_wait_for_parent():
+    states = States()
+    scheduler = TaskScheduler(states.get_state)
+    scheduler.build([('zone', None, []), ('child', 'zone', [])])
+    assert scheduler.pop_ready() == ['zone']
+    set_state(scheduler, states, 'zone', 'RUNNING')
+    assert scheduler.pop_ready() == ['child']
+
+
+def test_state_counts():
+    states = States()
+    scheduler = build_fan_out_fan_in(states, 2)
+    assert scheduler.count('PLANNED') == 4
+    set_state(scheduler, states, 'source', 'FINISHED')
+    set_state(scheduler, states, 'task0', 'RUNNING')
+    set_state(scheduler, states, 'task1', 'FAILED')
+    assert scheduler.count('RUNNING', 'PLANNED') == 2
+    assert scheduler.count('FAILED') == 1
+    assert scheduler.tasks_in_state('FAILED') == ['task1']
+    # the state of an unknown task does not change the counts
+    set_state(scheduler, states, 'unknown', 'FINISHED')
+    assert scheduler.count('FINISHED') == 1
+
+
+def test_rebuild_from_states():
+    """The scheduler is not persisted, it is rebuilt from the task states and the launched tasks."""
+    states = States()
+    scheduler = build_fan_out_fan_in(states, 3)
+    scheduler.pop_ready()
+    for name in ['source', 'task0', 'task1']:
+        scheduler.mark_executed(name)
+    set_state(scheduler, states, 'source', 'FINISHED')
+    set_state(scheduler, states, 'task0', 'FINISHED')
+    set_state(scheduler, states, 'task1', 'RUNNING')
+    assert scheduler.pop_ready() == ['task2']
+    # the checkpoint holds the states and the labels of the launched tasks
+    restored_states = States(states)
+    restored = TaskScheduler(restored_states.get_state)
+    restored.build(
+        [
+            ('source', None, []),
+            *((f'task{i}', None, ['source']) for i in range(3)),
+            ('sink', None, ['task0', 'task1', 'task2']),
+        ],
+        executed=['source', 'task0', 'task1'],
+    )
+    assert restored.pop_ready() == ['task2']
+    assert restored.count('RUNNING') == 1 and restored.count('FINISHED') == 2
+    for name in ['source', 'task0', 'task1', 'task2', 'sink']:
+        assert restored.is_task_ready_to_run(name) == scheduler.is_task_ready_to_run(name)
+    restored.mark_executed('task2')
+    set_state(restored, restored_states, 'task1', 'FINISHED')
+    set_state(restored, restored_states, 'task2', 'FINISHED')
+    assert restored.pop_ready() == ['sink']
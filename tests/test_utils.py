@@ -65,3 +65,82 @@ def test_workgraph_generate_provenance_graph():
     graph = wg.generate_provenance_graph()
     assert isinstance(graph, IFrame)
     assert os.path.isfile(f'html/node_graph_{wg.pk}.html')
+
+
+def test_load_task_processes():
+    """The task processes are loaded in one query, whether they are stored as pks or as YAML (older versions)."""
+    from unittest.mock import patch
+    from aiida.orm.utils.serialize import serialize
+    from aiida_workgraph.orm.utils import load_task_processes, parse_task_process
+    from aiida_workgraph.orm.workgraph import WorkGraphNode
+
+    process1 = orm.CalculationNode().store()
+    process2 = orm.CalculationNode().store()
+    legacy = {'add1': serialize(process1), 'add2': serialize(process2), 'add3': serialize(None)}
+    assert parse_task_process(legacy['add1']) == process1.uuid
+    assert parse_task_process(legacy['add3']) is None
+    assert parse_task_process(process1.pk) == process1.pk
+    with patch.object(orm.QueryBuilder, 'iterall', autospec=True, side_effect=orm.QueryBuilder.iterall) as iterall:
+        nodes = load_task_processes({'add1': process1.pk, 'add2': legacy['add2'], 'add3': None})
+    iterall.assert_called_once()
+    assert {name: node.pk for name, node in nodes.items()} == {'add1': process1.pk, 'add2': process2.pk}
+    # the older nodes are migrated to the pks
+    node = WorkGraphNode()
+    node.task_processes = legacy
+    node.migrate_task_processes()
+    assert node.task_processes == {'add1': process1.pk, 'add2': process2.pk, 'add3': None}
+    assert node.task_processes_version == WorkGraphNode.TASK_PROCESSES_VERSION
+
+
+def test_get_processes_latest_task_names():
+    """Only the processes of the given tasks are queried, e.g. not the ones of the mapped tasks."""
+    from unittest.mock import patch
+    from aiida_workgraph import utils
+    from aiida_workgraph.orm.workgraph import WorkGraphNode
+
+    process = orm.CalculationNode().store()
+    mapped = orm.CalculationNode().store()
+    node = WorkGraphNode()
+    node.task_states = {'add': 'FINISHED', 'item0_add': 'FINISHED'}
+    node.task_processes = {'add': process.pk, 'item0_add': mapped.pk}
+    node.store()
+    with patch.object(utils, 'query_task_processes', side_effect=utils.query_task_processes) as query:
+        data = utils.get_processes_latest(node.pk, task_names=['add', 'missing'])
+    query.assert_called_once_with({'add': process.pk})
+    assert list(data) == ['add'] and data['add']['pk'] == process.pk
+
+
+def test_get_task_delays():
+    from aiida_workgraph.utils import get_task_delays
+
+    timestamps = {'ready': 10.0, 'submitted': 12.5, 'running': 12.5, 'finished': 20.0, 'applied': 20.25}
+    assert get_task_delays(timestamps) == {'queue_wait': 2.5, 'run_time': 7.5, 'latency': 0.25}
+    # the task is still running
+    assert get_task_delays({'ready': 10.0, 'submitted': 10.0}) == {'queue_wait': 0.0, 'run_time': None, 'latency': None}
+
+
+def test_export_trace(decorated_add, tmp_path):
+    """The trace has a process per workgraph, a thread per task, and a flow to the nested workgraph."""
+    import json
+    from aiida_workgraph import WorkGraph, task
+
+    @task.graph
+    def add_one(x):
+        return decorated_add(x=x, y=1, t=0).result
+
+    wg = WorkGraph('test_export_trace')
+    wg.add_task(decorated_add, name='add', x=1, y=1, t=0)
+    wg.add_task(add_one, name='nested', x=wg.tasks.add.outputs.result)
+    wg.run()
+    path = tmp_path / 'trace.json'
+    count = wg.export_trace(str(path))
+    events = json.loads(path.read_text())['traceEvents']
+    assert len(events) == count
+    processes = {event['pid']: event['args']['name'] for event in events if event['name'] == 'process_name'}
+    assert sorted(processes.values()) == ['test_export_trace', 'test_export_trace/nested']
+    slices = {(processes[event['pid']], event['name']) for event in events if event['ph'] == 'X'}
+    assert ('test_export_trace', 'add') in slices
+    assert ('test_export_trace', 'nested (queued)') in slices
+    assert ('test_export_trace/nested', 'add') in slices
+    assert sorted(event['ph'] for event in events if event.get('cat') == 'graph') == ['f', 's']
+    assert all(event['dur'] >= 0 for event in events if event['ph'] == 'X')
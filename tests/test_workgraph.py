@@ -304,6 +304,37 @@ def test_run_workgraph_builder():
     assert wg.tasks.add.outputs.result.value == 3
 
 
+def test_update_loads_outputs_lazily(monkeypatch):
+    """The task processes are fetched with one query, their nodes are loaded when the outputs are accessed."""
+    from unittest.mock import Mock
+    from aiida.engine import run_get_node
+    from aiida_workgraph.engine.workgraph import WorkGraphEngine
+
+    @task
+    def add(x, y):
+        return x + y
+
+    wg = WorkGraph('test_update_loads_outputs_lazily')
+    for i in range(3):
+        wg.add_task(add, name=f'add{i}', x=i, y=1)
+    builder = WorkGraphEngine.get_builder()
+    builder._update(wg.to_engine_inputs())
+    _, node = run_get_node(builder)
+    wg.process = node
+    load_node = Mock(wraps=orm.load_node)
+    monkeypatch.setattr(orm, 'load_node', load_node)
+    wg.update()
+    # only the workgraph node is loaded
+    assert load_node.call_count == 1
+    assert [wg.tasks[f'add{i}'].state for i in range(3)] == ['FINISHED'] * 3
+    assert wg.tasks.add1.outputs.result.value == 2
+    assert load_node.call_count == 2
+    # the process did not change, it is not loaded again
+    wg.update()
+    assert wg.tasks.add1.outputs.result.value == 2
+    assert load_node.call_count == 3
+
+
 def test_calling_workgraph_in_context_manager():
     """Test calling a `WorkGraph` in a context manager."""
 
@@ -397,3 +428,47 @@ def test_update_outputs():
     assert wg.outputs.x.value == 0
     assert wg.outputs.nested.y.value == 1
     assert wg.outputs.nested.z.value == 2
+
+
+def test_wait_without_broker(monkeypatch):
+    """Without a communicator, the workgraph is polled with an increasing delay."""
+    import asyncio
+    from aiida.common import ConfigurationError
+    from aiida.manage import get_manager
+    from aiida_workgraph.utils.wait import StateChangeListener, backoff
+
+    def get_communicator():
+        raise ConfigurationError('no broker')
+
+    monkeypatch.setattr(get_manager(), 'get_communicator', get_communicator)
+    with StateChangeListener(lambda: None) as listener:
+        assert not listener.subscribed
+    delays = backoff(1, subscribed=False)
+    assert [next(delays) for _ in range(6)] == [0.1, 0.2, 0.4, 0.8, 1, 1]
+    delays = backoff(1, subscribed=True)
+    assert next(delays) == 1
+
+    @task
+    def add(x, y):
+        return x + y
+
+    wg = WorkGraph('test_wait_without_broker')
+    wg.add_task(add, x=1, y=2)
+    wg.run()
+    wg.wait(timeout=10)
+    asyncio.run(wg.wait_async(timeout=10, tasks={'add': ['FINISHED']}))
+    assert wg.tasks.add.outputs.result.value == 3
+
+
+def test_state_change_listener():
+    """Only the state changes of the given processes are notified."""
+    from aiida_workgraph.utils.wait import StateChangeListener
+
+    notified = []
+    listener = StateChangeListener(lambda: notified.append(True))
+    listener.pks = {1, 2}
+    listener.on_broadcast(None, None, 3, 'state_changed.running.waiting', None)
+    listener.on_broadcast(None, None, 1, 'other', None)
+    assert not notified
+    listener.on_broadcast(None, None, 2, 'state_changed.running.waiting', None)
+    assert notified == [True]